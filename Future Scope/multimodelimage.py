@@ -1,11 +1,16 @@
 import streamlit as st
 import snowflake.connector
+import functools
 import json
+import re
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 import os
+import io
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import tempfile
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Load environment variables
 load_dotenv()
@@ -20,138 +25,171 @@ SNOWFLAKE_CONFIG = {
     "password": os.getenv("SNOWFLAKE_PASSWORD"),
 }
 
+# Weight conversions to grams
+_WEIGHT = {
+    'g': (1, 'gm'),
+    'gm': (1, 'gm'),
+    'gram': (1, 'gm'),
+    'grams': (1, 'gm'),
+    'kg': (1000, 'gm'),
+    'kilogram': (1000, 'gm'),
+    'kilograms': (1000, 'gm'),
+    'oz': (28.35, 'gm'),
+    'ounce': (28.35, 'gm'),
+    'ounces': (28.35, 'gm'),
+    'lb': (453.592, 'gm'),
+    'lbs': (453.592, 'gm'),
+    'pound': (453.592, 'gm'),
+    'pounds': (453.592, 'gm'),
+}
+
+# Volume conversions to ml
+_VOLUME = {
+    'ml': (1, 'ml'),
+    'milliliter': (1, 'ml'),
+    'milliliters': (1, 'ml'),
+    'l': (1000, 'ml'),
+    'liter': (1000, 'ml'),
+    'liters': (1000, 'ml'),
+    'litre': (1000, 'ml'),
+    'litres': (1000, 'ml'),
+    'fl oz': (29.5735, 'ml'),
+    'fluid ounce': (29.5735, 'ml'),
+    'cup': (236.588, 'ml'),
+    'cups': (236.588, 'ml'),
+    'pint': (473.176, 'ml'),
+    'pints': (473.176, 'ml'),
+    'gallon': (3785.41, 'ml'),
+    'gallons': (3785.41, 'ml'),
+    'tbsp': (14.787, 'ml'),
+    'tablespoon': (14.787, 'ml'),
+    'tablespoons': (14.787, 'ml'),
+    'tsp': (4.929, 'ml'),
+    'teaspoon': (4.929, 'ml'),
+    'teaspoons': (4.929, 'ml'),
+}
+
+# Single lookup table: unit -> (multiplier, standard unit)
+_UNIT_TABLE = {**_WEIGHT, **_VOLUME}
+
+# Container types that typically hold liquids (convert to ml)
+_LIQUID_CONTAINERS = ('carton', 'bottle', 'can', 'glass', 'cup', 'jug', 'pitcher')
+
+# Assume standard volumes for common containers
+_CONTAINER_DEFAULTS = {
+    'carton': 946,  # 1 quart in ml (typical milk carton)
+    'bottle': 500,  # 500ml (typical bottle)
+    'can': 355,     # 355ml (typical can)
+    'glass': 240,   # 240ml (typical glass)
+}
+
+# Count units that should never be treated as a liquid container
+_EXCLUDE_CONTAINER_UNITS = ('pieces', 'items', 'box', 'bunch')
+
+# One compiled scan each instead of a Python-level substring loop per container
+_LIQUID_CONTAINER_RE = re.compile('|'.join(_LIQUID_CONTAINERS))
+_EXCLUDE_CONTAINER_RE = re.compile('|'.join(_EXCLUDE_CONTAINER_UNITS))
+
+# Item keywords that indicate liquid/weight-based products
+_LIQUID_KEYWORDS = frozenset(['milk', 'juice', 'kombucha', 'water', 'beverage', 'drink', 'oil', 'sauce', 'syrup', 'yogurt', 'cream', 'almond'])
+_WEIGHT_KEYWORDS = frozenset(['supplement', 'vitamin', 'powder', 'flour', 'sugar', 'salt', 'coffee', 'tea'])
+
+# Matches outer quotes and markdown code fences around the AI_COMPLETE response
+_FENCE_RE = re.compile(r'^\s*"?\s*(?:```(?:json)?)?\s*|\s*(?:```)?\s*"?\s*$')
+
+# Extraction prompt sent to AI_COMPLETE alongside the staged image
+_EXTRACTION_PROMPT = "Analyze this refrigerator/inventory image and extract all items visible. For each item, provide: item_name, quantity (as number), unit (pieces/boxes/kg/liters/etc), and category. Return ONLY a valid JSON array with no markdown. Example: [{\"item_name\": \"Lettuce\", \"quantity\": 1, \"unit\": \"pieces\", \"category\": \"Produce\"}]"
+
 st.set_page_config(page_title="Inventory Image Upload", layout="wide")
 st.title("📦 Inventory Management - Snowflake Cortex Multimodal")
 
-def standardize_unit(quantity, unit, item_name=""):
-    """Convert quantity to standardized metric units (gm, kg, ml, l)"""
-    unit_lower = unit.lower().strip()
-    item_lower = item_name.lower()
-    
-    # Weight conversions to grams
-    weight_conversions = {
-        'g': (1, 'gm'),
-        'gm': (1, 'gm'),
-        'gram': (1, 'gm'),
-        'grams': (1, 'gm'),
-        'kg': (1000, 'gm'),
-        'kilogram': (1000, 'gm'),
-        'kilograms': (1000, 'gm'),
-        'oz': (28.35, 'gm'),
-        'ounce': (28.35, 'gm'),
-        'ounces': (28.35, 'gm'),
-        'lb': (453.592, 'gm'),
-        'lbs': (453.592, 'gm'),
-        'pound': (453.592, 'gm'),
-        'pounds': (453.592, 'gm'),
-    }
-    
-    # Volume conversions to ml
-    volume_conversions = {
-        'ml': (1, 'ml'),
-        'milliliter': (1, 'ml'),
-        'milliliters': (1, 'ml'),
-        'l': (1000, 'ml'),
-        'liter': (1000, 'ml'),
-        'liters': (1000, 'ml'),
-        'litre': (1000, 'ml'),
-        'litres': (1000, 'ml'),
-        'fl oz': (29.5735, 'ml'),
-        'fluid ounce': (29.5735, 'ml'),
-        'cup': (236.588, 'ml'),
-        'cups': (236.588, 'ml'),
-        'pint': (473.176, 'ml'),
-        'pints': (473.176, 'ml'),
-        'gallon': (3785.41, 'ml'),
-        'gallons': (3785.41, 'ml'),
-        'tbsp': (14.787, 'ml'),
-        'tablespoon': (14.787, 'ml'),
-        'tablespoons': (14.787, 'ml'),
-        'tsp': (4.929, 'ml'),
-        'teaspoon': (4.929, 'ml'),
-        'teaspoons': (4.929, 'ml'),
-    }
-    
-    # Container types that typically hold liquids (convert to ml)
-    liquid_containers = ['carton', 'bottle', 'can', 'glass', 'cup', 'jug', 'pitcher']
+@functools.lru_cache(maxsize=512)
+def _resolve_unit(unit_lower, item_lower):
+    """Resolve a unit/item pair to (multiplier, standard unit); multiplier None means count-based"""
+    # Exact unit match is the common case
+    hit = _UNIT_TABLE.get(unit_lower)
+    is_liquid_container = _LIQUID_CONTAINER_RE.search(unit_lower) is not None
+    if hit and not is_liquid_container:
+        return hit
     
-    # Item keywords that indicate liquid/weight-based products
-    liquid_keywords = ['milk', 'juice', 'kombucha', 'water', 'beverage', 'drink', 'oil', 'sauce', 'syrup', 'yogurt', 'cream', 'almond']
-    weight_keywords = ['supplement', 'vitamin', 'powder', 'flour', 'sugar', 'salt', 'coffee', 'tea']
-    
-    # Check if it's a liquid/volume item based on item name
-    is_liquid_item = any(keyword in item_lower for keyword in liquid_keywords)
-    is_weight_item = any(keyword in item_lower for keyword in weight_keywords)
-    is_liquid_container = any(container in unit_lower for container in liquid_containers)
-    
-    # If it's a liquid container (carton, bottle, can) but not a count unit, convert to ml
-    if is_liquid_container and not any(c in unit_lower for c in ['pieces', 'items', 'box', 'bunch']):
-        # Assume standard volumes for common containers
-        container_defaults = {
-            'carton': 946,  # 1 quart in ml (typical milk carton)
-            'bottle': 500,  # 500ml (typical bottle)
-            'can': 355,     # 355ml (typical can)
-            'glass': 240,   # 240ml (typical glass)
-        }
+    if is_liquid_container:
+        # If it's a liquid container (carton, bottle, can) but not a count unit, convert to ml
+        if not _EXCLUDE_CONTAINER_RE.search(unit_lower):
+            # First hit in table order wins ("glass bottle" -> bottle)
+            for container, volume in _CONTAINER_DEFAULTS.items():
+                if container in unit_lower:
+                    return volume, 'ml'
         
-        for container, default_ml in container_defaults.items():
-            if container in unit_lower:
-                return round(quantity * default_ml, 2), 'ml'
+        # If it's explicitly a liquid item, prefer ml
+        if any(keyword in item_lower for keyword in _LIQUID_KEYWORDS):
+            return 500, 'ml'  # Default to 500ml per container
     
-    # If it's explicitly a liquid item, prefer ml
-    if is_liquid_item and is_liquid_container:
-        return round(quantity * 500, 2), 'ml'  # Default to 500ml per container
+    if hit:
+        return hit
     
-    # Try to find conversion in standard tables
-    if unit_lower in weight_conversions:
-        multiplier, std_unit = weight_conversions[unit_lower]
-        return round(quantity * multiplier, 2), std_unit
-    elif unit_lower in volume_conversions:
-        multiplier, std_unit = volume_conversions[unit_lower]
-        return round(quantity * multiplier, 2), std_unit
-    else:
-        # Default: treat as pieces (count-based)
-        return quantity, 'pieces'
+    # Default: treat as pieces (count-based)
+    return None, 'pieces'
 
-def get_existing_users():
-    """Fetch list of existing users from Snowflake"""
+def standardize_unit(quantity, unit, item_name=""):
+    """Convert quantity to standardized metric units (gm, kg, ml, l)"""
+    multiplier, std_unit = _resolve_unit(unit.lower().strip(), item_name.lower())
+    if multiplier is None:
+        return quantity, std_unit
+    return round(quantity * multiplier, 2), std_unit
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_existing_users():
+    """Query USER_IDs; raises on failure so errors are never cached"""
     conn = get_snowflake_connection()
     if not conn:
-        return []
+        raise RuntimeError("no Snowflake connection")
     
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor()
         cursor.execute("SELECT USER_ID FROM MEAL_MIND_COMBINED.RAW_SCHEMA.USERS ORDER BY USER_ID")
-        users = [row[0] for row in cursor.fetchall()]
+        return [row[0] for row in cursor.fetchall()]
+    finally:
         cursor.close()
-        conn.close()
-        return users
+
+def get_existing_users():
+    """Fetch list of existing users from Snowflake"""
+    try:
+        return _fetch_existing_users()
     except Exception as e:
         st.warning(f"Could not fetch users: {e}")
         return []
 
+@st.cache_resource(ttl=3600)
+def _connect():
+    """Open the shared Snowflake connection (cached across reruns)"""
+    conn = snowflake.connector.connect(
+        account=SNOWFLAKE_CONFIG["account"],
+        warehouse=SNOWFLAKE_CONFIG["warehouse"],
+        database=SNOWFLAKE_CONFIG["database"],
+        schema=SNOWFLAKE_CONFIG["schema"],
+        user=SNOWFLAKE_CONFIG["user"],
+        password=SNOWFLAKE_CONFIG["password"],
+        client_session_keep_alive=True,
+    )
+    # Stage DDL runs once per connection rather than on every upload
+    setup_image_stage(conn)
+    return conn
+
 def get_snowflake_connection():
     """Establish Snowflake connection"""
     try:
-        conn = snowflake.connector.connect(
-            account=SNOWFLAKE_CONFIG["account"],
-            warehouse=SNOWFLAKE_CONFIG["warehouse"],
-            database=SNOWFLAKE_CONFIG["database"],
-            schema=SNOWFLAKE_CONFIG["schema"],
-            user=SNOWFLAKE_CONFIG["user"],
-            password=SNOWFLAKE_CONFIG["password"],
-        )
-        return conn
+        # Failures raise inside _connect, so they are never cached
+        return _connect()
     except Exception as e:
         st.error(f"Connection error: {e}")
         return None
 
 def setup_image_stage(conn):
-    """Create or verify image stage exists"""
+    """Create image stage if it doesn't exist"""
     try:
         cursor = conn.cursor()
         cursor.execute("""
-            CREATE OR REPLACE STAGE inventory_images
+            CREATE STAGE IF NOT EXISTS inventory_images
             DIRECTORY = ( ENABLE = true )
             ENCRYPTION = ( TYPE = 'SNOWFLAKE_SSE' )
         """)
@@ -167,89 +205,50 @@ def extract_inventory_multimodal(image_data: bytes, user_id: str):
     if not conn:
         return None
     
-    # Setup stage
-    if not setup_image_stage(conn):
-        return None
-    
     cursor = conn.cursor()
     
-    # Save image temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-        tmp.write(image_data)
-        tmp_path = tmp.name
-    
     try:
-        # Generate unique filename
-        filename = f"inventory_{int(datetime.utcnow().timestamp())}.jpg"
-        
-        # Upload image to stage using PUT command
-        put_cmd = f"PUT 'file://{tmp_path}' @inventory_images AUTO_COMPRESS=FALSE OVERWRITE=TRUE"
-        st.write(f"Executing: {put_cmd}")
-        cursor.execute(put_cmd)
+        # Generate unique filename (suffix keeps parallel uploads in the same second apart)
+        filename = f"inventory_{int(datetime.now(timezone.utc).timestamp())}_{uuid.uuid4().hex[:8]}.jpg"
         
-        # Verify file was uploaded by listing stage
-        cursor.execute("LIST @inventory_images")
-        files = cursor.fetchall()
-        st.write(f"Files in stage: {files}")
+        # Upload image to stage straight from memory; the PUT path only names the staged file
+        put_cmd = f"PUT 'file://{filename}' @inventory_images AUTO_COMPRESS=FALSE OVERWRITE=TRUE"
+        put_result = cursor.execute(put_cmd, file_stream=io.BytesIO(image_data)).fetchall()
         
-        if not files:
-            st.error("Upload failed - no files in stage")
+        # PUT returns one row per file; column 6 is the upload status
+        if not put_result or put_result[0][6] != 'UPLOADED':
+            st.error("Upload failed - image was not staged")
             cursor.close()
-            conn.close()
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
             return None
         
         st.success(f"✅ Uploaded image: {filename}")
         
-        # Define the prompt
-        prompt = "Analyze this refrigerator/inventory image and extract all items visible. For each item, provide: item_name, quantity (as number), unit (pieces/boxes/kg/liters/etc), and category. Return ONLY a valid JSON array with no markdown. Example: [{\"item_name\": \"Lettuce\", \"quantity\": 1, \"unit\": \"pieces\", \"category\": \"Produce\"}]"
-        
         # Use AI_COMPLETE with TO_FILE - this is the correct syntax
         st.info("🔄 Processing image with Snowflake Cortex Claude 3.5 Sonnet...")
         
-        # Get the actual filename from the uploaded file
-        actual_filename = files[0][0].split('/')[-1]
-        st.write(f"Using file: {actual_filename}")
-        
-        query = f"""SELECT AI_COMPLETE('claude-3-5-sonnet', 
-            '{prompt}',
-            TO_FILE('@inventory_images', '{actual_filename}')
+        query = """SELECT AI_COMPLETE('claude-3-5-sonnet', 
+            %s,
+            TO_FILE('@inventory_images', %s)
         ) as extraction_result"""
         
-        cursor.execute(query)
+        cursor.execute(query, (_EXTRACTION_PROMPT, filename))
         result = cursor.fetchone()
         
-        # Clean up temp file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-        
         if result:
             response_text = result[0]
             st.write("**Raw Response:**")
             st.code(response_text, language="json")
             
             try:
-                # The response might be a JSON string wrapped in another string
-                # First, unescape it if needed
-                cleaned = response_text.strip()
-                
-                # If it's a string that starts with quotes, it's double-encoded
-                if cleaned.startswith('"') and cleaned.endswith('"'):
-                    cleaned = cleaned[1:-1]  # Remove outer quotes
-                    cleaned = cleaned.replace('\\n', '\n')  # Unescape newlines
-                    cleaned = cleaned.replace('\\\"', '"')  # Unescape quotes
-                
-                # Remove markdown code blocks if present
-                if cleaned.startswith("```"):
-                    cleaned = cleaned.split("```")[1]
-                    if cleaned.startswith("json"):
-                        cleaned = cleaned[4:]
-                
-                cleaned = cleaned.strip()
+                # Strip outer quotes and markdown code fences in one pass
+                cleaned = _FENCE_RE.sub('', response_text)
                 
                 # Parse JSON
-                items = json.loads(cleaned)
+                try:
+                    items = json.loads(cleaned)
+                except json.JSONDecodeError:
+                    # The response might be a JSON string wrapped in another string
+                    items = json.loads(cleaned.replace('\\n', '\n').replace('\\"', '"'))
                 
                 # Ensure items is a list
                 if isinstance(items, dict):
@@ -260,7 +259,6 @@ def extract_inventory_multimodal(image_data: bytes, user_id: str):
                     return None
                 
                 cursor.close()
-                conn.close()
                 return items
                 
             except json.JSONDecodeError as je:
@@ -268,97 +266,90 @@ def extract_inventory_multimodal(image_data: bytes, user_id: str):
                 return None
         
         cursor.close()
-        conn.close()
         return None
         
     except Exception as e:
         st.error(f"Error during extraction: {e}")
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
         cursor.close()
-        conn.close()
         return None
 
+def extract_inventory_batch(images, user_id: str):
+    """Extract inventory from several images, overlapping their uploads and Cortex calls"""
+    if len(images) == 1:
+        return extract_inventory_multimodal(images[0], user_id)
+    
+    # Worker threads share the cached connection (one cursor each) and this script's
+    # run context so their status messages still render
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=4, initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        results = list(executor.map(lambda image_data: extract_inventory_multimodal(image_data, user_id), images))
+    
+    items = [item for result in results if result for item in result]
+    return items or None
+
 def add_inventory_to_snowflake(user_id, items):
-    """Add extracted items to Snowflake inventory table with standardized units"""
+    """Add extracted (item, std_quantity, std_unit) tuples to Snowflake inventory table"""
     conn = get_snowflake_connection()
     if not conn:
         return 0
     
     try:
         cursor = conn.cursor()
-        inserted_count = 0
+        now = datetime.now(timezone.utc).isoformat()
         
-        for item in items:
-            inventory_id = str(uuid.uuid4())
-            now = datetime.utcnow().isoformat()
-            
-            # Standardize the unit and quantity
-            quantity = item.get("quantity", 0)
-            unit = item.get("unit", "pieces")
-            item_name = item.get("item_name", "")
-            std_quantity, std_unit = standardize_unit(quantity, unit, item_name)
-            
-            insert_query = """
-            INSERT INTO INVENTORY (INVENTORY_ID, USER_ID, ITEM_NAME, QUANTITY, UNIT, CATEGORY, CREATED_AT, UPDATED_AT)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor.execute(
-                insert_query,
-                (
-                    inventory_id,
-                    user_id,
-                    item.get("item_name", "Unknown"),
-                    std_quantity,
-                    std_unit,
-                    item.get("category", "Uncategorized"),
-                    now,
-                    now,
-                ),
+        rows = [
+            (
+                uuid.uuid4().hex,
+                user_id,
+                item.get("item_name", "Unknown"),
+                std_quantity,
+                std_unit,
+                item.get("category", "Uncategorized"),
+                now,
+                now,
             )
-            inserted_count += 1
+            for item, std_quantity, std_unit in items
+        ]
+        
+        if not rows:
+            cursor.close()
+            return 0
+        
+        insert_query = """
+        INSERT INTO INVENTORY (INVENTORY_ID, USER_ID, ITEM_NAME, QUANTITY, UNIT, CATEGORY, CREATED_AT, UPDATED_AT)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        
+        # One batched statement instead of a round-trip per item
+        cursor.executemany(insert_query, rows)
+        inserted_count = len(rows)
         
         conn.commit()
         cursor.close()
-        conn.close()
         return inserted_count
     except Exception as e:
         st.error(f"Error updating Snowflake: {e}")
         return 0
 
-def get_existing_users():
-    """Fetch list of existing users from Snowflake"""
-    conn = get_snowflake_connection()
-    if not conn:
-        return []
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT USER_ID FROM MEAL_MIND_COMBINED.RAW_SCHEMA.USERS ORDER BY USER_ID")
-        users = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
-        return users
-    except Exception as e:
-        st.warning(f"Could not fetch users: {e}")
-        return []
-
 # Sidebar for configuration
 with st.sidebar:
     st.header("⚙️ Configuration")
     st.subheader("Snowflake Settings")
     
-    account = st.text_input("Account ID", value=SNOWFLAKE_CONFIG["account"] or "", key="account_input")
-    warehouse = st.text_input("Warehouse", value=SNOWFLAKE_CONFIG["warehouse"] or "", key="warehouse_input")
-    username = st.text_input("Username", value=SNOWFLAKE_CONFIG["user"] or "", key="user_input")
-    password = st.text_input("Password", type="password", value=SNOWFLAKE_CONFIG["password"] or "", key="pass_input")
+    # Inside a form, typing doesn't rerun the script until Apply is pressed
+    with st.form("snowflake_creds"):
+        account = st.text_input("Account ID", value=SNOWFLAKE_CONFIG["account"] or "", key="account_input")
+        warehouse = st.text_input("Warehouse", value=SNOWFLAKE_CONFIG["warehouse"] or "", key="warehouse_input")
+        username = st.text_input("Username", value=SNOWFLAKE_CONFIG["user"] or "", key="user_input")
+        password = st.text_input("Password", type="password", value=SNOWFLAKE_CONFIG["password"] or "", key="pass_input")
+        st.form_submit_button("Apply")
     
     if st.button("Test Connection"):
+        # Drop the cached connection so the test performs a fresh handshake
+        _connect.clear()
         conn = get_snowflake_connection()
         if conn:
             st.success("✅ Connection successful!")
-            conn.close()
         else:
             st.error("❌ Connection failed!")
 
@@ -369,6 +360,9 @@ with col1:
     st.subheader("📸 Upload Inventory Image")
     
     existing_users = get_existing_users()
+    if st.button("🔄 Refresh users"):
+        _fetch_existing_users.clear()
+        st.rerun()
     
     # User ID input
     user_input_type = st.radio("Select USER_ID:", ["Choose from existing", "Enter manually"])
@@ -383,20 +377,25 @@ with col1:
         user_id = st.text_input("Enter USER_ID:")
     
     # Image upload
-    uploaded_file = st.file_uploader("Upload inventory image", type=["jpg", "jpeg", "png"])
+    uploaded_files = st.file_uploader("Upload inventory images", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
     
-    if uploaded_file and user_id:
-        image_data = uploaded_file.read()
+    if uploaded_files and user_id:
+        images = [uploaded_file.getvalue() for uploaded_file in uploaded_files]
         
-        # Display uploaded image
-        st.image(image_data, caption="Uploaded Image", use_container_width=True)
+        # Display uploaded images
+        for uploaded_file, image_data in zip(uploaded_files, images):
+            st.image(image_data, caption=uploaded_file.name, use_container_width=True)
         
         if st.button("🔍 Extract Inventory with Cortex", use_container_width=True):
             with st.spinner("Analyzing with Snowflake Cortex..."):
-                items = extract_inventory_multimodal(image_data, user_id)
+                items = extract_inventory_batch(images, user_id)
             
             if items:
-                st.session_state.extracted_items = items
+                # Standardize once here so reruns and the save path only read the results
+                st.session_state.extracted_items = [
+                    (item, *standardize_unit(item.get("quantity", 0), item.get("unit", "pieces"), item.get("item_name", "")))
+                    for item in items
+                ]
                 st.session_state.current_user_id = user_id
                 st.success(f"✅ Successfully extracted {len(items)} items!")
     elif not user_id:
@@ -412,20 +411,18 @@ with col2:
         st.write(f"**Will be saved for USER_ID: `{st.session_state.current_user_id}`**")
         st.divider()
         
-        # Display items with standardized units
-        for idx, item in enumerate(items):
-            quantity = item.get("quantity", 0)
-            unit = item.get("unit", "pieces")
-            item_name = item.get("item_name", "")
-            std_quantity, std_unit = standardize_unit(quantity, unit, item_name)
-            
-            col1_item, col2_item = st.columns(2)
-            with col1_item:
-                st.write(f"**{idx + 1}. {item.get('item_name', 'N/A')}**")
-                st.write(f"📊 Qty: {quantity} {unit} → **{std_quantity} {std_unit}**")
-            with col2_item:
-                st.write(f"🏷️ {item.get('category', 'N/A')}")
-            st.divider()
+        # Display items with standardized units as one table
+        display_df = pd.DataFrame([
+            {
+                "#": idx + 1,
+                "Item": item.get("item_name", "N/A"),
+                "Raw": f"{item.get('quantity', 0)} {item.get('unit', 'pieces')}",
+                "Standardized": f"{std_quantity} {std_unit}",
+                "Category": item.get("category", "N/A"),
+            }
+            for idx, (item, std_quantity, std_unit) in enumerate(items)
+        ])
+        st.dataframe(display_df, hide_index=True, use_container_width=True)
         
         # Save to inventory button
         if st.button("✅ Save to Inventory", use_container_width=True):
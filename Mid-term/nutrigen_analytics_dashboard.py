@@ -47,11 +47,23 @@ st.markdown("""
 # DATA LOADING - WITH ERROR HANDLING
 # ============================================================
 
+# Explicit dtypes skip pandas type inference on the largest CSV
+RESULTS_DTYPES = {
+    'Model': 'category',
+    'Profile': 'int16',  # integer ids; a category dtype would turn them into strings
+    'Success': 'bool',
+    'Error_Percent': 'float32',
+    'Error_kcal': 'float32',
+    'Processing_Time': 'float32',
+    'Target_Calories': 'int32',
+    'Actual_Calories': 'float32',  # may be empty for failed runs
+}
+
 @st.cache_data
 def load_data():
     """Load all CSV files with comprehensive error handling"""
     try:
-        df_results = pd.read_csv('nutrigen_multimodel_results.csv')
+        df_results = pd.read_csv('nutrigen_multimodel_results.csv', dtype=RESULTS_DTYPES)
         df_summary = pd.read_csv('nutrigen_multimodel_summary.csv')
         df_profiles = pd.read_csv('nutrigen_test_profiles.csv')
         df_comparison = pd.read_csv('nutrigen_paper_comparison.csv')
@@ -61,8 +73,211 @@ def load_data():
         st.info("Ensure all CSV files are in the same directory as this script")
         st.stop()
 
+@st.cache_data
+def format_summary(df):
+    """Format the static summary table for display"""
+    out = df.copy()
+    out['MAE_Percent'] = df['MAE_Percent'].map('{:.2f}%'.format)
+    out['MAE_kcal'] = df['MAE_kcal'].map('{:.2f}'.format)
+    out['Avg_Time_s'] = df['Avg_Time_s'].map('{:.2f}s'.format)
+    return out
+
+@st.cache_data
+def get_filter_options(df):
+    """Sorted unique models and profiles for the sidebar filters"""
+    return sorted(df['Model'].unique().tolist()), sorted(df['Profile'].unique().tolist())
+
+@st.cache_data
+def filter_results(_df, models, profiles, show_failures):
+    """Apply the sidebar filters; cached on the selection"""
+    mask = _df['Model'].isin(set(models)) & _df['Profile'].isin(set(profiles))
+    if not show_failures:
+        mask &= _df['Success'] == True
+    return _df[mask]
+
+@st.cache_data
+def make_box(_filtered, y, title, models, profiles, show_failures):
+    """Per-model box plot of one metric; cached on the filter selection"""
+    fig = px.box(
+        _filtered,
+        x='Model',
+        y=y,
+        color='Model',
+        title=title
+    )
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
+@st.cache_data
+def make_calorie_scatter(_filtered, models, profiles, show_failures):
+    """Target vs actual scatter; cached on the filter selection, not the frame"""
+    fig = px.scatter(
+        _filtered,
+        x='Target_Calories',
+        y='Actual_Calories',
+        color='Model',
+        size='Error_Percent',
+        hover_data=['Profile', 'Error_Percent'],
+        title='Target vs Actual'
+    )
+
+    if len(_filtered) > 0:
+        # One reduction over both columns instead of four column scans
+        cal_values = _filtered[['Target_Calories', 'Actual_Calories']].to_numpy()
+        min_cal = float(cal_values.min())
+        max_cal = float(cal_values.max())
+        fig.add_trace(
+            go.Scatter(
+                x=[min_cal, max_cal],
+                y=[min_cal, max_cal],
+                mode='lines',
+                name='Perfect',
+                line=dict(dash='dash', color='gray')
+            )
+        )
+
+    fig.update_layout(height=500)
+    return fig
+
+@st.cache_data
+def make_mae_bar(_df_summary):
+    """MAE % per model; the summary is static so this builds once"""
+    fig = px.bar(
+        _df_summary,
+        x='Model',
+        y='MAE_Percent',
+        color='MAE_Percent',
+        color_continuous_scale='RdYlGn_r',
+        title='Mean Absolute Error %',
+        text='MAE_Percent'
+    )
+    fig.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
+@st.cache_data
+def make_success_bar(_df, models):
+    """Stacked success/failure counts; cached on the model selection"""
+    selected = list(models)
+    df_success = (
+        _df[_df['Model'].isin(selected)]
+        .groupby('Model')['Success']
+        .agg(Success='sum', Total='count')
+        .reindex(selected, fill_value=0)
+        .rename_axis('Model')
+        .reset_index()
+    )
+    df_success['Failed'] = df_success['Total'] - df_success['Success']
+    df_success = df_success[['Model', 'Success', 'Failed']]
+    fig = px.bar(
+        df_success,
+        x='Model',
+        y=['Success', 'Failed'],
+        barmode='stack',
+        color_discrete_map={'Success': '#2ecc71', 'Failed': '#e74c3c'},
+        title='Test Results'
+    )
+    fig.update_layout(height=400)
+    return fig
+
+@st.cache_data
+def make_time_bar(_df_summary):
+    """Average processing time per model"""
+    fig = px.bar(
+        _df_summary,
+        x='Model',
+        y='Avg_Time_s',
+        color='Avg_Time_s',
+        color_continuous_scale='Viridis',
+        title='Average Time (seconds)',
+        text='Avg_Time_s'
+    )
+    fig.update_traces(texttemplate='%{text:.2f}s', textposition='outside')
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
+@st.cache_data
+def make_tradeoff_scatter(_df_summary):
+    """Speed vs accuracy scatter"""
+    fig = px.scatter(
+        _df_summary,
+        x='Avg_Time_s',
+        y='MAE_Percent',
+        size='MAE_kcal',
+        color='Model',
+        title='Speed vs Accuracy',
+        labels={
+            'Avg_Time_s': 'Time (seconds)',
+            'MAE_Percent': 'MAE (%)'
+        }
+    )
+    fig.update_layout(height=500)
+    return fig
+
+@st.cache_data
+def make_profile_error_bar(_profile_data, selected_profile):
+    """Error % per model for one profile; cached on the profile"""
+    fig = px.bar(
+        _profile_data,
+        x='Model',
+        y='Error_Percent',
+        color='Error_Percent',
+        color_continuous_scale='RdYlGn_r',
+        title=f'Error % - Profile {selected_profile}',
+        text='Error_Percent'
+    )
+    fig.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
+@st.cache_data
+def make_profile_calories_bar(_profile_data, selected_profile):
+    """Actual calories per model against the profile target"""
+    fig = px.bar(
+        _profile_data,
+        x='Model',
+        y='Actual_Calories',
+        color='Model',
+        title=f'Actual Calories - Profile {selected_profile}',
+        text='Actual_Calories'
+    )
+    target = _profile_data['Target_Calories'].iloc[0]
+    fig.add_hline(y=target, line_dash="dash", line_color="red")
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
+@st.cache_data
+def make_comparison_bar(_comp_clean):
+    """Our MAE vs published MAE"""
+    fig = px.bar(
+        _comp_clean,
+        x='Model',
+        y=['Our_MAE_Percent', 'Paper_MAE_Percent'],
+        barmode='group',
+        title='MAE Comparison'
+    )
+    fig.update_layout(height=400)
+    return fig
+
+@st.cache_data
+def make_difference_bar(_comp_diff):
+    """Error difference vs published results"""
+    fig = px.bar(
+        _comp_diff,
+        x='Model',
+        y='Difference',
+        color='Difference',
+        color_continuous_scale='Reds',
+        title='Error Difference',
+        text='Difference'
+    )
+    fig.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+    fig.update_layout(showlegend=False, height=400)
+    return fig
+
 # Load all data
 df_results, df_summary, df_profiles, df_comparison = load_data()
+all_models, all_profiles = get_filter_options(df_results)
 
 # ============================================================
 # TITLE & INTRO
@@ -86,14 +301,12 @@ st.markdown("""
 st.sidebar.markdown("## 🔍 Filters")
 st.sidebar.markdown("---")
 
-all_models = sorted(df_results['Model'].unique().tolist())
 selected_models = st.sidebar.multiselect(
     "Select Models:",
     options=all_models,
     default=all_models
 )
 
-all_profiles = sorted(df_results['Profile'].unique().tolist())
 selected_profiles = st.sidebar.multiselect(
     "Select Profiles:",
     options=all_profiles,
@@ -102,14 +315,9 @@ selected_profiles = st.sidebar.multiselect(
 
 show_failures = st.sidebar.checkbox("Include Failed Tests", value=True)
 
-# Filter data
-filtered_results = df_results[
-    (df_results['Model'].isin(selected_models)) &
-    (df_results['Profile'].isin(selected_profiles))
-]
-
-if not show_failures:
-    filtered_results = filtered_results[filtered_results['Success'] == True]
+# Filter data once; every tab reuses this view
+filter_key = (tuple(selected_models), tuple(selected_profiles), show_failures)
+filtered_results = filter_results(df_results, *filter_key)
 
 # ============================================================
 # KEY METRICS - WITH PROPER TYPE HANDLING
@@ -119,12 +327,12 @@ st.markdown('<div class="subheader-accent">📈 Key Performance Indicators</div>
 
 # CRITICAL: Safely calculate metrics with type conversion
 total_tests = len(filtered_results)
-successful_tests = int(filtered_results['Success'].sum()) if len(filtered_results) > 0 else 0
+successful_tests = int(filtered_results['Success'].sum()) if total_tests > 0 else 0
 success_rate = (successful_tests / total_tests * 100) if total_tests > 0 else 0.0
 
 # Safe calculations for averages
-avg_error = float(filtered_results['Error_Percent'].mean()) if len(filtered_results) > 0 else 0.0
-avg_time = float(filtered_results['Processing_Time'].mean()) if len(filtered_results) > 0 else 0.0
+avg_error = float(filtered_results['Error_Percent'].mean()) if total_tests > 0 else 0.0
+avg_time = float(filtered_results['Processing_Time'].mean()) if total_tests > 0 else 0.0
 
 # Best model metrics
 best_idx = df_summary['MAE_Percent'].idxmin()
@@ -193,48 +401,16 @@ with tab1:
 
     with col1:
         st.markdown("#### Accuracy by Model")
-        fig_mae = px.bar(
-            df_summary,
-            x='Model',
-            y='MAE_Percent',
-            color='MAE_Percent',
-            color_continuous_scale='RdYlGn_r',
-            title='Mean Absolute Error %',
-            text='MAE_Percent'
-        )
-        fig_mae.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-        fig_mae.update_layout(showlegend=False, height=400)
+        fig_mae = make_mae_bar(df_summary)
         st.plotly_chart(fig_mae, use_container_width=True)
 
     with col2:
         st.markdown("#### Success Distribution")
-        success_data = []
-        for model in selected_models:
-            model_tests = df_results[df_results['Model'] == model]
-            success_data.append({
-                'Model': model,
-                'Success': int(model_tests['Success'].sum()),
-                'Failed': int(len(model_tests) - model_tests['Success'].sum())
-            })
-
-        df_success = pd.DataFrame(success_data)
-        fig_success = px.bar(
-            df_success,
-            x='Model',
-            y=['Success', 'Failed'],
-            barmode='stack',
-            color_discrete_map={'Success': '#2ecc71', 'Failed': '#e74c3c'},
-            title='Test Results'
-        )
-        fig_success.update_layout(height=400)
+        fig_success = make_success_bar(df_results, tuple(selected_models))
         st.plotly_chart(fig_success, use_container_width=True)
 
     st.markdown("#### Model Statistics Table")
-    summary_copy = df_summary.copy()
-    summary_copy['MAE_Percent'] = summary_copy['MAE_Percent'].apply(lambda x: f"{x:.2f}%")
-    summary_copy['MAE_kcal'] = summary_copy['MAE_kcal'].apply(lambda x: f"{x:.2f}")
-    summary_copy['Avg_Time_s'] = summary_copy['Avg_Time_s'].apply(lambda x: f"{x:.2f}s")
-    st.dataframe(summary_copy, use_container_width=True, hide_index=True)
+    st.dataframe(format_summary(df_summary), use_container_width=True, hide_index=True)
 
 # ============================================================
 # TAB 2: ERROR ANALYSIS
@@ -247,53 +423,16 @@ with tab2:
 
     with col1:
         st.markdown("#### Error % Distribution")
-        fig_error_box = px.box(
-            filtered_results,
-            x='Model',
-            y='Error_Percent',
-            color='Model',
-            title='Error Percentage'
-        )
-        fig_error_box.update_layout(showlegend=False, height=400)
+        fig_error_box = make_box(filtered_results, 'Error_Percent', 'Error Percentage', *filter_key)
         st.plotly_chart(fig_error_box, use_container_width=True)
 
     with col2:
         st.markdown("#### Calorie Error Distribution")
-        fig_error_kcal = px.box(
-            filtered_results,
-            x='Model',
-            y='Error_kcal',
-            color='Model',
-            title='Calorie Error (kcal)'
-        )
-        fig_error_kcal.update_layout(showlegend=False, height=400)
+        fig_error_kcal = make_box(filtered_results, 'Error_kcal', 'Calorie Error (kcal)', *filter_key)
         st.plotly_chart(fig_error_kcal, use_container_width=True)
 
     st.markdown("#### Target vs Actual Calories")
-    fig_scatter = px.scatter(
-        filtered_results,
-        x='Target_Calories',
-        y='Actual_Calories',
-        color='Model',
-        size='Error_Percent',
-        hover_data=['Profile', 'Error_Percent'],
-        title='Target vs Actual'
-    )
-
-    if len(filtered_results) > 0:
-        min_cal = min(filtered_results['Target_Calories'].min(), filtered_results['Actual_Calories'].min())
-        max_cal = max(filtered_results['Target_Calories'].max(), filtered_results['Actual_Calories'].max())
-        fig_scatter.add_trace(
-            go.Scatter(
-                x=[min_cal, max_cal],
-                y=[min_cal, max_cal],
-                mode='lines',
-                name='Perfect',
-                line=dict(dash='dash', color='gray')
-            )
-        )
-
-    fig_scatter.update_layout(height=500)
+    fig_scatter = make_calorie_scatter(filtered_results, *filter_key)
     st.plotly_chart(fig_scatter, use_container_width=True)
 
 # ============================================================
@@ -307,45 +446,16 @@ with tab3:
 
     with col1:
         st.markdown("#### Avg Processing Time")
-        fig_time = px.bar(
-            df_summary,
-            x='Model',
-            y='Avg_Time_s',
-            color='Avg_Time_s',
-            color_continuous_scale='Viridis',
-            title='Average Time (seconds)',
-            text='Avg_Time_s'
-        )
-        fig_time.update_traces(texttemplate='%{text:.2f}s', textposition='outside')
-        fig_time.update_layout(showlegend=False, height=400)
+        fig_time = make_time_bar(df_summary)
         st.plotly_chart(fig_time, use_container_width=True)
 
     with col2:
         st.markdown("#### Time Distribution")
-        fig_time_box = px.box(
-            filtered_results,
-            x='Model',
-            y='Processing_Time',
-            color='Model',
-            title='Processing Time Distribution'
-        )
-        fig_time_box.update_layout(showlegend=False, height=400)
+        fig_time_box = make_box(filtered_results, 'Processing_Time', 'Processing Time Distribution', *filter_key)
         st.plotly_chart(fig_time_box, use_container_width=True)
 
     st.markdown("#### Speed vs Accuracy Trade-off")
-    fig_tradeoff = px.scatter(
-        df_summary,
-        x='Avg_Time_s',
-        y='MAE_Percent',
-        size='MAE_kcal',
-        color='Model',
-        title='Speed vs Accuracy',
-        labels={
-            'Avg_Time_s': 'Time (seconds)',
-            'MAE_Percent': 'MAE (%)'
-        }
-    )
-    fig_tradeoff.update_layout(height=500)
+    fig_tradeoff = make_tradeoff_scatter(df_summary)
     st.plotly_chart(fig_tradeoff, use_container_width=True)
 
 # ============================================================
@@ -357,7 +467,7 @@ with tab4:
 
     selected_profile = st.selectbox(
         "Select Profile:",
-        options=sorted(df_results['Profile'].unique())
+        options=all_profiles
     )
 
     profile_data = df_results[df_results['Profile'] == selected_profile]
@@ -383,31 +493,11 @@ with tab4:
         col1, col2 = st.columns(2)
 
         with col1:
-            fig_prof_error = px.bar(
-                profile_data,
-                x='Model',
-                y='Error_Percent',
-                color='Error_Percent',
-                color_continuous_scale='RdYlGn_r',
-                title=f'Error % - Profile {selected_profile}',
-                text='Error_Percent'
-            )
-            fig_prof_error.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-            fig_prof_error.update_layout(showlegend=False, height=400)
+            fig_prof_error = make_profile_error_bar(profile_data, selected_profile)
             st.plotly_chart(fig_prof_error, use_container_width=True)
 
         with col2:
-            fig_prof_cal = px.bar(
-                profile_data,
-                x='Model',
-                y='Actual_Calories',
-                color='Model',
-                title=f'Actual Calories - Profile {selected_profile}',
-                text='Actual_Calories'
-            )
-            target = profile_data['Target_Calories'].iloc[0]
-            fig_prof_cal.add_hline(y=target, line_dash="dash", line_color="red")
-            fig_prof_cal.update_layout(showlegend=False, height=400)
+            fig_prof_cal = make_profile_calories_bar(profile_data, selected_profile)
             st.plotly_chart(fig_prof_cal, use_container_width=True)
 
         st.dataframe(profile_data, use_container_width=True, hide_index=True)
@@ -427,30 +517,13 @@ with tab5:
         col1, col2 = st.columns(2)
 
         with col1:
-            fig_comp = px.bar(
-                comp_clean,
-                x='Model',
-                y=['Our_MAE_Percent', 'Paper_MAE_Percent'],
-                barmode='group',
-                title='MAE Comparison'
-            )
-            fig_comp.update_layout(height=400)
+            fig_comp = make_comparison_bar(comp_clean)
             st.plotly_chart(fig_comp, use_container_width=True)
 
         with col2:
             comp_diff = df_comparison.dropna(subset=['Difference'])
             if len(comp_diff) > 0:
-                fig_diff = px.bar(
-                    comp_diff,
-                    x='Model',
-                    y='Difference',
-                    color='Difference',
-                    color_continuous_scale='Reds',
-                    title='Error Difference',
-                    text='Difference'
-                )
-                fig_diff.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-                fig_diff.update_layout(showlegend=False, height=400)
+                fig_diff = make_difference_bar(comp_diff)
                 st.plotly_chart(fig_diff, use_container_width=True)
 
         st.dataframe(df_comparison, use_container_width=True, hide_index=True)
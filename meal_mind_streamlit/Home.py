@@ -1,10 +1,12 @@
 import streamlit as st
+import os
 import re
 from dotenv import load_dotenv
 from utils.db import get_snowflake_connection
 from utils.auth import authenticate_user, create_user_account
 from utils.ui import apply_custom_css
 from utils.onboarding import profile_setup_wizard
+from utils.agent import get_llm_cache_stats
 
 # Import views
 from views.dashboard import render_dashboard
@@ -129,6 +131,12 @@ def main():
             # Main Dashboard with Tabs
             st.title(f"🍽️ Welcome, {st.session_state.username}!")
             
+            # Debug: agent response cache effectiveness
+            if os.getenv("MEALMIND_DEBUG"):
+                with st.sidebar:
+                    stats = get_llm_cache_stats()
+                    st.caption(f"LLM cache: {stats['hits']} hits / {stats['misses']} misses ({stats['size']} entries)")
+
             if st.button("Logout", key="logout_btn"):
                 for key in list(st.session_state.keys()):
                     del st.session_state[key]
@@ -17,7 +17,7 @@ def test_context_retrieval():
     
     # 1. Test get_latest_meal_plan
     print("\n--- Latest Meal Plan ---")
-    plan = get_latest_meal_plan(conn, user_id)
+    plan = get_latest_meal_plan(user_id)
     if plan:
         print(f"Plan Name: {plan.get('plan_name')}")
         print(f"Dates: {plan.get('start_date')} to {plan.get('end_date')}")
@@ -16,9 +16,9 @@ def test_parallel_loading(conn, user_id):
     start_time = time.time()
     
     with ThreadPoolExecutor(max_workers=3) as executor:
-        future_profile = executor.submit(get_user_profile, conn, user_id)
-        future_inventory = executor.submit(get_user_inventory, conn, user_id)
-        future_meal_plan = executor.submit(get_latest_meal_plan, conn, user_id)
+        future_profile = executor.submit(get_user_profile, user_id)
+        future_inventory = executor.submit(get_user_inventory, user_id)
+        future_meal_plan = executor.submit(get_latest_meal_plan, user_id)
         
         user_profile = future_profile.result()
         inventory_df = future_inventory.result()
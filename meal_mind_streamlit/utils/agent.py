@@ -1,12 +1,31 @@
 import streamlit as st
 import json
 import re
-from typing import Dict, Any, Optional, List, TypedDict
+import ast
+import hashlib
+import random
+import textwrap
+import threading
+from cachetools import TTLCache
+from typing import Dict, Any, Optional, List, Tuple, Callable, TypedDict
 from langchain_community.chat_models import ChatSnowflakeCortex
 from langchain_snowflake.agents import SnowflakeCortexAgent
 from langchain.schema import HumanMessage, SystemMessage
-from langgraph.graph import StateGraph, END
-from datetime import datetime, timedelta
+from langgraph.graph import StateGraph, START, END
+from datetime import datetime
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps_sorted(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+except ImportError:  # stdlib fallback
+    _loads = json.loads
+
+    def _dumps_sorted(obj: Any) -> bytes:
+        return json.dumps(obj, sort_keys=True, default=str).encode()
 
 # ==================== LANGGRAPH STATE ====================
 class MealPlanState(TypedDict):
@@ -16,6 +35,194 @@ class MealPlanState(TypedDict):
     meal_plan_json: Optional[Dict]
     suggestions_json: Optional[List]
     error: Optional[str]
+    use_cache: bool # False for explicit regenerate / retry runs
+
+
+# ==================== RESPONSE PARSING PATTERNS ====================
+_RE_JSON_FENCE = re.compile(r'```json\s*')
+_RE_FENCE = re.compile(r'```\s*')
+_RE_THINKING = re.compile(r"\['thinking'.*?\]", re.DOTALL)
+_CLOSERS = {'[': ']', '{': '}'}
+# Agent trace steps we never surface (only the final answer is wanted)
+_SKIP_KEYS = frozenset({'thinking', 'tool_use', 'tool_result'})
+# Where an agent result keeps its payload (message, AgentFinish, dict), tried in order
+_ACCESSORS = (
+    lambda r: r.content,
+    lambda r: r.return_values.get('output', str(r)),
+    lambda r: r['output'],
+)
+
+
+def _extract_balanced_json(text: str, start: int) -> Optional[str]:
+    """Return the balanced [...] / {...} slice opening at text[start], respecting strings and escapes"""
+    stack = []
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch == ']' or ch == '}':
+            if not stack or stack.pop() != ch:
+                return None
+            if not stack:
+                return text[start:i + 1]
+    return None
+
+
+def _parse_json_block(block: str) -> Optional[Any]:
+    """Parse a JSON block, accepting python-style literals as a fallback"""
+    try:
+        return _loads(block)
+    except ValueError:
+        pass
+    try:
+        parsed = ast.literal_eval(block)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return parsed if isinstance(parsed, (list, dict)) else None
+
+
+def _try_parse_listlike(data: str) -> Optional[list]:
+    """Parse a string that is entirely a JSON / python-style list, else None"""
+    stripped = data.strip()
+    if stripped[:1] != '[' or stripped[-1:] != ']':
+        return None
+    parsed = _parse_json_block(stripped)
+    return parsed if isinstance(parsed, list) else None
+
+
+# ==================== MEAL PLAN VALIDATION ====================
+_REQUIRED_KEYS = ('user_summary', 'meal_plan', 'recommendations', 'metadata')
+
+
+def _is_suggestions_payload(data: Any) -> bool:
+    """True for a suggestions list, bare or under 'future_suggestions'"""
+    return isinstance(data, list) or (isinstance(data, dict) and isinstance(data.get('future_suggestions'), list))
+
+
+# ==================== DAY NAMES ====================
+# Indexed by date.weekday()
+_DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+# ==================== MOCK PLAN TEMPLATES ====================
+_MEAL_TEMPLATES = {
+    "breakfast": (
+        {"name": "Protein Oatmeal Bowl", "prep": 5, "cook": 10, "calories": 0.25, "protein": 0.25},
+        {"name": "Spinach & Feta Omelet", "prep": 10, "cook": 10, "calories": 0.25, "protein": 0.25},
+        {"name": "Greek Yogurt Parfait", "prep": 5, "cook": 0, "calories": 0.25, "protein": 0.25},
+        {"name": "Avocado Toast with Eggs", "prep": 5, "cook": 5, "calories": 0.25, "protein": 0.25}
+    ),
+    "lunch": (
+        {"name": "Grilled Chicken Salad", "prep": 15, "cook": 15, "calories": 0.35, "protein": 0.35},
+        {"name": "Turkey Wrap", "prep": 10, "cook": 0, "calories": 0.35, "protein": 0.35},
+        {"name": "Quinoa & Black Bean Bowl", "prep": 15, "cook": 20, "calories": 0.35, "protein": 0.35},
+        {"name": "Tuna Salad Sandwich", "prep": 10, "cook": 0, "calories": 0.35, "protein": 0.35}
+    ),
+    "snacks": (
+        {"name": "Greek Yogurt with Berries", "prep": 2, "cook": 0, "calories": 0.10, "protein": 0.10},
+        {"name": "Apple slices with Almond Butter", "prep": 2, "cook": 0, "calories": 0.10, "protein": 0.10},
+        {"name": "Protein Shake", "prep": 2, "cook": 0, "calories": 0.10, "protein": 0.10},
+        {"name": "Handful of Almonds", "prep": 0, "cook": 0, "calories": 0.10, "protein": 0.10}
+    ),
+    "dinner": (
+        {"name": "Baked Salmon with Vegetables", "prep": 15, "cook": 25, "calories": 0.30, "protein": 0.30},
+        {"name": "Lean Beef Stir-Fry", "prep": 20, "cook": 15, "calories": 0.30, "protein": 0.30},
+        {"name": "Chicken Breast with Sweet Potato", "prep": 10, "cook": 30, "calories": 0.30, "protein": 0.30},
+        {"name": "Vegetable Curry with Tofu", "prep": 20, "cook": 20, "calories": 0.30, "protein": 0.30}
+    )
+}
+
+# Shared recipe scaffolding; copied into each sample meal so plans never alias it
+_SAMPLE_INGREDIENTS = (
+    {"ingredient": "Main protein", "quantity": 150, "unit": "g", "from_inventory": False,
+     "inventory_item_id": None},
+    {"ingredient": "Vegetables", "quantity": 200, "unit": "g", "from_inventory": True,
+     "inventory_item_id": "inv_123"},
+    {"ingredient": "Grains/Carbs", "quantity": 100, "unit": "g", "from_inventory": False,
+     "inventory_item_id": None}
+)
+_SAMPLE_PREP_STEPS = ("Gather all ingredients", "Wash and chop vegetables", "Season proteins")
+_SAMPLE_COOKING_STEPS = (
+    "Preheat cooking surface",
+    "Cook protein to safe temperature",
+    "Prepare sides",
+    "Plate and serve"
+)
+_SAMPLE_EQUIPMENT = ("Pan", "Cutting board", "Knife")
+_SAMPLE_TIPS = ("Prep ahead for faster cooking", "Season to taste")
+# Profile fields the mock plan reads; only these go into its cache key
+_MOCK_PROFILE_FIELDS = (
+    'user_id', 'health_goal', 'dietary_restrictions', 'food_allergies', 'weight_kg',
+    'daily_calories', 'daily_protein', 'daily_carbohydrate', 'daily_fat', 'daily_fiber'
+)
+
+
+# ==================== LLM RESPONSE CACHE ====================
+# Processed agent responses keyed by prompt hash, shared across agent instances
+_RESPONSE_CACHE = TTLCache(maxsize=256, ttl=3600)
+_RESPONSE_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def _hash_key(prompt: str, user_profile: Optional[Dict] = None) -> str:
+    """Stable cache key for a prompt and the profile it was built from"""
+    key_data = {"prompt": prompt, "user_profile": user_profile}
+    return hashlib.sha256(_dumps_sorted(key_data)).hexdigest()
+
+
+def get_llm_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for the agent response cache"""
+    with _RESPONSE_CACHE_LOCK:
+        return {**_CACHE_STATS, "size": len(_RESPONSE_CACHE)}
+
+
+# ==================== PROMPT CANONICALIZATION ====================
+# List-like profile fields whose ordering/case shouldn't change the prompt bytes
+_LIST_PROFILE_FIELDS = ('dietary_restrictions', 'food_allergies')
+
+_SUGGESTIONS_PROMPT = textwrap.dedent("""
+    Based on the user's profile and their current meal plan, suggest 5-10 inventory items for NEXT week.
+    
+    USER PROFILE:
+    - Goal: {health_goal}
+    - Activity: {activity_level}
+    - Restrictions: {dietary_restrictions}
+    - Allergies: {food_allergies}
+    
+    CURRENT PLAN SUMMARY:
+    {current_plan_summary}
+    
+    TASK:
+    Generate a list of 5-10 items to buy for NEXT week to improve variety and hit their goals.
+    - Ensure these items are NOT currently in inventory (assume current plan uses most of it).
+    - Strictly respect allergies/restrictions.
+    - EXPLICITLY link each suggestion to the user's health goal.
+    
+    Return ONLY a JSON list of objects with this format:
+    [{{"item": "Name", "reason": "Why (linking to goal)", "category": "Category", "suggested_quantity": 0, "unit": "unit"}}]
+    """)
+
+
+def canonicalize_profile(user_profile: Dict) -> Dict:
+    """Return a copy of the profile with list-like fields normalized (sorted, lowercased, single-spaced)"""
+    profile = dict(user_profile)
+    for field in _LIST_PROFILE_FIELDS:
+        value = profile.get(field)
+        if isinstance(value, str):
+            parts = {" ".join(part.split()).lower() for part in value.split(",")}
+            profile[field] = ", ".join(sorted(part for part in parts if part))
+    return profile
 
 
 # ==================== MEAL PLAN AGENT WITH JSON EXTRACTION ====================
@@ -38,17 +245,52 @@ class MealPlanAgentWithExtraction:
             st.warning(f"Agent initialization failed: {e}. Using fallback mode.")
             self.agent = None
 
+        # Compiled workflow, built once per agent
+        self.app = self.build_graph()
+
+    def invoke_cached(
+        self,
+        prompt: str,
+        user_profile: Optional[Dict] = None,
+        is_valid: Optional[Callable[[Any], bool]] = None,
+        use_cache: bool = True,
+    ) -> Tuple[str, Any]:
+        """Invoke the agent and return (processed response, parsed JSON), reusing cached results
+
+        Only responses whose parsed JSON passes is_valid are cached, so a malformed reply
+        is never served again. use_cache=False skips the lookup for regenerate / retry calls.
+        """
+        key = _hash_key(prompt, user_profile)
+        if use_cache:
+            with _RESPONSE_CACHE_LOCK:
+                cached = _RESPONSE_CACHE.get(key)
+                if cached is not None:
+                    _CACHE_STATS["hits"] += 1
+                    # Parse afresh: callers mutate the returned structure
+                    return cached, self.extract_json_from_response(cached)
+                _CACHE_STATS["misses"] += 1
+
+        agent_response = self.agent.invoke({"input": prompt})
+        raw_response = self.process_agent_response(agent_response)
+        data = self.extract_json_from_response(raw_response)
+
+        if data is not None and (is_valid is None or is_valid(data)):
+            with _RESPONSE_CACHE_LOCK:
+                _RESPONSE_CACHE[key] = raw_response
+        return raw_response, data
+
     def process_agent_response(self, response: Any) -> str:
         """Process agent response to get clean output"""
         
         # 1. Extract raw content/data
-        data = response
-        if hasattr(response, 'content'):
-            data = response.content
-        elif hasattr(response, 'return_values'):
-            data = response.return_values.get('output', str(response))
-        elif isinstance(response, dict) and 'output' in response:
-            data = response['output']
+        for accessor in _ACCESSORS:
+            try:
+                data = accessor(response)
+                break
+            except (AttributeError, KeyError, TypeError):
+                continue
+        else:
+            data = response
             
         # 2. If data is already a list, process it
         if isinstance(data, list):
@@ -56,20 +298,9 @@ class MealPlanAgentWithExtraction:
             
         # 3. If data is a string, it might be a JSON string of a list
         if isinstance(data, str):
-            try:
-                # Try to parse string as JSON
-                parsed = json.loads(data)
-                if isinstance(parsed, list):
-                    return self._process_list_response(parsed)
-            except:
-                # Not valid JSON, try ast.literal_eval for python-style lists
-                try:
-                    import ast
-                    parsed = ast.literal_eval(data)
-                    if isinstance(parsed, list):
-                        return self._process_list_response(parsed)
-                except:
-                    pass
+            parsed = _try_parse_listlike(data)
+            if parsed is not None:
+                return self._process_list_response(parsed)
                 
         # 4. Fallback: treat as string and clean it
         return self._clean_string_response(str(data))
@@ -78,32 +309,23 @@ class MealPlanAgentWithExtraction:
         """Process list response (agent steps)"""
         results = []
         for item in data:
-            if isinstance(item, dict):
-                # Handle thinking blocks - SKIP THEM
-                if 'thinking' in item:
-                    continue
-                
-                # Handle tool_use blocks - SKIP THEM
-                elif 'tool_use' in item:
-                    continue
-
-                # Handle tool_result blocks - SKIP THEM (we only want final answer)
-                elif 'tool_result' in item:
-                    continue
-
-                # Handle direct content
-                elif 'content' in item:
-                    content = item['content']
-                    if isinstance(content, list):
-                        for content_item in content:
-                            if isinstance(content_item, dict) and 'text' in content_item:
-                                results.append(content_item['text'])
-                            elif isinstance(content_item, str):
-                                results.append(content_item)
-                    elif isinstance(content, str):
-                        results.append(content)
-                elif 'text' in item:
-                    results.append(item['text'])
+            # Skip non-dict items and thinking / tool_use / tool_result blocks
+            if not isinstance(item, dict) or not _SKIP_KEYS.isdisjoint(item):
+                continue
+
+            # Handle direct content
+            if 'content' in item:
+                content = item['content']
+                if isinstance(content, list):
+                    for content_item in content:
+                        if isinstance(content_item, dict) and 'text' in content_item:
+                            results.append(content_item['text'])
+                        elif isinstance(content_item, str):
+                            results.append(content_item)
+                elif isinstance(content, str):
+                    results.append(content)
+            elif 'text' in item:
+                results.append(item['text'])
 
         combined_text = '\n\n'.join(results) if results else "No clear response found"
         return self._clean_string_response(combined_text)
@@ -111,11 +333,11 @@ class MealPlanAgentWithExtraction:
     def _clean_string_response(self, content: str) -> str:
         """Clean string response"""
         # Remove markdown code blocks
-        content = re.sub(r'```json\s*', '', content)
-        content = re.sub(r'```\s*', '', content)
+        content = _RE_JSON_FENCE.sub('', content)
+        content = _RE_FENCE.sub('', content)
         
         # Remove any remaining thinking blocks if they leaked into string
-        content = re.sub(r'\[\'thinking\'.*?\]', '', content, flags=re.DOTALL)
+        content = _RE_THINKING.sub('', content)
         
         return content.strip()
 
@@ -125,27 +347,21 @@ class MealPlanAgentWithExtraction:
             # Clean up the string first
             cleaned = raw_response.strip()
             
-            # Try parsing the whole string first
-            try:
-                return json.loads(cleaned)
-            except:
-                pass
-
-            # Try to find a list block [...]
-            list_match = re.search(r'\[.*\]', cleaned, re.DOTALL)
-            if list_match:
+            # Only a response that opens with [ / { can be a JSON document on its own
+            if cleaned[:1] in _CLOSERS:
                 try:
-                    return json.loads(list_match.group())
-                except:
+                    return _loads(cleaned)
+                except ValueError:
                     pass
 
-            # Try to find an object block {...}
-            obj_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-            if obj_match:
-                try:
-                    return json.loads(obj_match.group())
-                except:
-                    pass
+            # Scan for the first balanced block, trying whichever of [ / { appears first
+            openers = sorted(i for i in (cleaned.find('['), cleaned.find('{')) if i != -1)
+            for start in openers:
+                block = _extract_balanced_json(cleaned, start)
+                if block:
+                    parsed = _parse_json_block(block)
+                    if parsed is not None:
+                        return parsed
             
             return None
         except Exception as e:
@@ -155,52 +371,37 @@ class MealPlanAgentWithExtraction:
 
     def validate_meal_plan_structure(self, meal_plan_data: Dict[str, Any]) -> bool:
         """Validate meal plan structure"""
-        required_keys = ['user_summary', 'meal_plan', 'recommendations', 'metadata']
-
-        for key in required_keys:
-            if key not in meal_plan_data:
-                return False
-
-        if 'days' not in meal_plan_data.get('meal_plan', {}):
+        if not isinstance(meal_plan_data, dict) or not all(key in meal_plan_data for key in _REQUIRED_KEYS):
             return False
 
-        days = meal_plan_data['meal_plan'].get('days', [])
-        if len(days) < 1:
-            return False
-
-        return True
+        meal_plan = meal_plan_data['meal_plan']
+        return isinstance(meal_plan, dict) and isinstance(meal_plan.get('days'), list) and len(meal_plan['days']) >= 1
 
     def fix_day_names_in_plan(self, meal_plan_data: Dict[str, Any]) -> Dict[str, Any]:
         """Fix day names in meal plan to match actual dates starting from today"""
         try:
             days = meal_plan_data.get('meal_plan', {}).get('days', [])
+            start_weekday = datetime.now().weekday()
             for i, day_data in enumerate(days):
-                # Calculate the actual date for this day
-                current_date = datetime.now().date() + timedelta(days=i)
-                # Get the correct day name from the date
-                correct_day_name = current_date.strftime('%A')
-                # Update the day_name in the data
-                day_data['day_name'] = correct_day_name
+                # Day i falls i days after today
+                day_data['day_name'] = _DAY_NAMES[(start_weekday + i) % 7]
                 day_data['day'] = i + 1
             return meal_plan_data
         except Exception as e:
             st.warning(f"Could not fix day names: {e}")
             return meal_plan_data
 
-    def generate_meal_plan(self, prompt: str, user_profile: Dict) -> Optional[Dict[str, Any]]:
+    def generate_meal_plan(self, prompt: str, user_profile: Dict, use_cache: bool = True) -> Optional[Dict[str, Any]]:
         """Main method to generate meal plan with JSON extraction"""
 
         try:
             # Try agent if available
             if self.agent:
                 with st.spinner("🤖 Consulting the meal planning agent..."):
-                    agent_response = self.agent.invoke({"input": prompt})
-                    
-                    # Process response to get clean text
-                    raw_response = self.process_agent_response(agent_response)
-
-                    with st.spinner("📝 Parsing meal plan data..."):
-                        meal_plan_data = self.extract_json_from_response(raw_response)
+                    # Process response to get clean text and parsed JSON
+                    raw_response, meal_plan_data = self.invoke_cached(
+                        prompt, user_profile, self.validate_meal_plan_structure, use_cache
+                    )
 
                     if meal_plan_data and self.validate_meal_plan_structure(meal_plan_data):
                         # Post-process to fix day names to match actual dates
@@ -219,35 +420,14 @@ class MealPlanAgentWithExtraction:
             st.error(f"Error in meal plan generation: {e}")
             return self.generate_mock_meal_plan(user_profile)
 
-    def generate_standalone_suggestions(self, user_profile: Dict, current_plan_summary: str) -> List[Dict]:
+    def generate_standalone_suggestions(self, user_profile: Dict, current_plan_summary: str, use_cache: bool = True) -> List[Dict]:
         """Generate suggestions for an existing plan"""
-        prompt = f"""
-        Based on the user's profile and their current meal plan, suggest 5-10 inventory items for NEXT week.
-        
-        USER PROFILE:
-        - Goal: {user_profile['health_goal']}
-        - Activity: {user_profile['activity_level']}
-        - Restrictions: {user_profile['dietary_restrictions']}
-        - Allergies: {user_profile['food_allergies']}
-        
-        CURRENT PLAN SUMMARY:
-        {current_plan_summary}
-        
-        TASK:
-        Generate a list of 5-10 items to buy for NEXT week to improve variety and hit their goals.
-        - Ensure these items are NOT currently in inventory (assume current plan uses most of it).
-        - Strictly respect allergies/restrictions.
-        - EXPLICITLY link each suggestion to the user's health goal.
-        
-        Return ONLY a JSON list of objects with this format:
-        [{{"item": "Name", "reason": "Why (linking to goal)", "category": "Category", "suggested_quantity": 0, "unit": "unit"}}]
-        """
+        profile = canonicalize_profile(user_profile)
+        prompt = _SUGGESTIONS_PROMPT.format_map({**profile, 'current_plan_summary': current_plan_summary})
         
         try:
             if self.agent:
-                response = self.agent.invoke({"input": prompt})
-                raw_response = self.process_agent_response(response)
-                data = self.extract_json_from_response(raw_response)
+                _, data = self.invoke_cached(prompt, profile, _is_suggestions_payload, use_cache)
                 if isinstance(data, list):
                     return data
                 elif isinstance(data, dict) and 'future_suggestions' in data:
@@ -295,13 +475,14 @@ class MealPlanAgentWithExtraction:
             return shopping_list
 
     # ==================== LANGGRAPH NODES ====================
-    def node_generate_plan(self, state: MealPlanState) -> MealPlanState:
+    def node_generate_plan(self, state: MealPlanState) -> Dict[str, Any]:
         """Node 1: Generate the core meal plan using batched generation"""
         print("--- Node: Generate Meal Plan (Batched) ---")
         try:
             # We ignore state['prompt'] here because we generate new prompts for batches
             user_profile = state['user_profile']
             inventory_df = state['inventory_df']
+            use_cache = state.get('use_cache', True)
             
             from utils.helpers import generate_comprehensive_meal_plan_prompt
             
@@ -309,10 +490,8 @@ class MealPlanAgentWithExtraction:
                 # Batch 1: Days 1-4
                 print("Generating Batch 1 (Days 1-4)...")
                 prompt_1 = generate_comprehensive_meal_plan_prompt(user_profile, inventory_df, start_day=1, num_days=4)
-                response_1 = self.agent.invoke({"input": prompt_1})
-                raw_1 = self.process_agent_response(response_1)
+                raw_1, data_1 = self.invoke_cached(prompt_1, user_profile, self.validate_meal_plan_structure, use_cache)
                 print(f"DEBUG: Batch 1 Raw Response:\n{raw_1[:500]}...") # Print first 500 chars
-                data_1 = self.extract_json_from_response(raw_1)
                 print(f"DEBUG: Batch 1 Parsed Data: {json.dumps(data_1, indent=2) if data_1 else 'None'}")
                 
                 # Extract context from Batch 1
@@ -341,10 +520,8 @@ class MealPlanAgentWithExtraction:
                     num_days=3, 
                     previous_plan_context=context_str
                 )
-                response_2 = self.agent.invoke({"input": prompt_2})
-                raw_2 = self.process_agent_response(response_2)
+                raw_2, data_2 = self.invoke_cached(prompt_2, user_profile, self.validate_meal_plan_structure, use_cache)
                 print(f"DEBUG: Batch 2 Raw Response:\n{raw_2[:500]}...") # Print first 500 chars
-                data_2 = self.extract_json_from_response(raw_2)
                 print(f"DEBUG: Batch 2 Parsed Data: {json.dumps(data_2, indent=2) if data_2 else 'None'}")
                 
                 # Merge Results
@@ -406,16 +583,18 @@ class MealPlanAgentWithExtraction:
                         
                     # Recalculate Week Summary (Averages & Utilization)
                     try:
-                        all_days = merged_plan.get('meal_plan', {}).get('days', [])
-                        week_summary = merged_plan.get('meal_plan', {}).get('week_summary', {})
+                        plan_section = merged_plan.get('meal_plan', {})
+                        all_days = plan_section.get('days', [])
+                        week_summary = plan_section.get('week_summary', {})
                         
                         if all_days:
                             # Recalculate Nutritional Averages
-                            total_cals = sum(float(d.get('total_nutrition', {}).get('calories', 0)) for d in all_days)
-                            total_prot = sum(float(d.get('total_nutrition', {}).get('protein_g', 0)) for d in all_days)
-                            total_carbs = sum(float(d.get('total_nutrition', {}).get('carbohydrates_g', 0)) for d in all_days)
-                            total_fat = sum(float(d.get('total_nutrition', {}).get('fat_g', 0)) for d in all_days)
-                            total_fiber = sum(float(d.get('total_nutrition', {}).get('fiber_g', 0)) for d in all_days)
+                            nutrition = [d.get('total_nutrition', {}) for d in all_days]
+                            total_cals = sum(float(n.get('calories', 0)) for n in nutrition)
+                            total_prot = sum(float(n.get('protein_g', 0)) for n in nutrition)
+                            total_carbs = sum(float(n.get('carbohydrates_g', 0)) for n in nutrition)
+                            total_fat = sum(float(n.get('fat_g', 0)) for n in nutrition)
+                            total_fiber = sum(float(n.get('fiber_g', 0)) for n in nutrition)
                             
                             num_days = len(all_days)
                             week_summary['average_daily_calories'] = int(total_cals / num_days)
@@ -462,40 +641,39 @@ class MealPlanAgentWithExtraction:
             state['error'] = str(e)
             state['meal_plan_json'] = self.generate_mock_meal_plan(state['user_profile'])
             
-        return state
+        # Runs alongside the suggestions node, so only hand back the keys this node owns
+        return {'meal_plan_json': state.get('meal_plan_json'), 'error': state.get('error')}
 
-    def node_generate_suggestions(self, state: MealPlanState) -> MealPlanState:
-        """Node 2: Generate suggestions based on the plan"""
+    def node_generate_suggestions(self, state: MealPlanState) -> Dict[str, Any]:
+        """Node 2: Generate suggestions from the profile and inventory (runs in parallel with the plan)"""
         print("--- Node: Generate Suggestions ---")
-        
-        # If plan generation failed or we are using mock, we might skip or use mock suggestions
-        if state.get('error') or not state.get('meal_plan_json'):
-            # If mock plan was generated in previous step, we can still generate suggestions or mock them
-            pass
 
         try:
             user_profile = state['user_profile']
-            meal_plan = state['meal_plan_json']
+            inventory_df = state.get('inventory_df')
             
-            if not meal_plan:
-                print("No meal plan generated, skipping suggestions.")
-                state['suggestions_json'] = []
-                return state
-            
-            # Create a summary of the generated plan
-            week_summary = meal_plan.get('meal_plan', {}).get('week_summary', {})
-            utilization = week_summary.get('inventory_utilization_rate', 0)
-            plan_summary = f"Current Plan Inventory Utilization: {utilization}%. The plan covers 7 days."
+            # The plan isn't available yet, so summarise what it will be built from
+            inventory_count = len(inventory_df) if inventory_df is not None else 0
+            plan_summary = f"Current inventory: {inventory_count} items on hand. The plan covers 7 days."
             
             # Reuse the standalone logic
-            suggestions = self.generate_standalone_suggestions(user_profile, plan_summary)
-            state['suggestions_json'] = suggestions
+            suggestions = self.generate_standalone_suggestions(user_profile, plan_summary, state.get('use_cache', True))
             
         except Exception as e:
             print(f"Error in suggestion node: {e}")
-            state['suggestions_json'] = []
+            suggestions = []
             
-        return state
+        return {'suggestions_json': suggestions}
+
+    def node_merge_results(self, state: MealPlanState) -> Dict[str, Any]:
+        """Node 3: Join the plan and suggestion branches"""
+        print("--- Node: Merge Results ---")
+        
+        if not state.get('meal_plan_json'):
+            print("No meal plan generated, dropping suggestions.")
+            return {'suggestions_json': []}
+        
+        return {'suggestions_json': state.get('suggestions_json') or []}
 
     def build_graph(self):
         """Build the LangGraph workflow"""
@@ -504,22 +682,29 @@ class MealPlanAgentWithExtraction:
         # Add nodes
         workflow.add_node("generate_plan", self.node_generate_plan)
         workflow.add_node("generate_suggestions", self.node_generate_suggestions)
+        workflow.add_node("merge_results", self.node_merge_results)
         
-        # Add edges
-        workflow.set_entry_point("generate_plan")
-        workflow.add_edge("generate_plan", "generate_suggestions")
-        workflow.add_edge("generate_suggestions", END)
+        # Add edges: plan and suggestions fan out from START and run in the same step
+        workflow.add_edge(START, "generate_plan")
+        workflow.add_edge(START, "generate_suggestions")
+        workflow.add_edge(["generate_plan", "generate_suggestions"], "merge_results")
+        workflow.add_edge("merge_results", END)
         
         return workflow.compile()
 
     def generate_mock_meal_plan(self, user_profile: Dict) -> Dict[str, Any]:
-        """Generate a realistic mock meal plan"""
+        """Generate a realistic mock meal plan (cached per profile and day)"""
+        profile = {field: user_profile[field] for field in _MOCK_PROFILE_FIELDS if field in user_profile}
+        return _cached_mock_meal_plan(self, profile, datetime.now().date().isoformat())
+
+    def _build_mock_meal_plan(self, user_profile: Dict) -> Dict[str, Any]:
+        """Build the mock meal plan"""
         days = []
+        start_weekday = datetime.now().weekday()
         
         # Calculate day names based on actual dates starting from today
         for i in range(7):
-            current_date = datetime.now().date() + timedelta(days=i)
-            day_name = current_date.strftime('%A')  # Get the actual day name (Monday, Tuesday, etc.)
+            day_name = _DAY_NAMES[(start_weekday + i) % 7]
             
             days.append({
                 "day": i + 1,
@@ -636,36 +821,7 @@ class MealPlanAgentWithExtraction:
 
     def create_sample_meal(self, meal_type: str, user_profile: Dict) -> Dict:
         """Create a sample meal based on type"""
-        import random
-        
-        meal_templates = {
-            "breakfast": [
-                {"name": "Protein Oatmeal Bowl", "prep": 5, "cook": 10, "calories": 0.25, "protein": 0.25},
-                {"name": "Spinach & Feta Omelet", "prep": 10, "cook": 10, "calories": 0.25, "protein": 0.25},
-                {"name": "Greek Yogurt Parfait", "prep": 5, "cook": 0, "calories": 0.25, "protein": 0.25},
-                {"name": "Avocado Toast with Eggs", "prep": 5, "cook": 5, "calories": 0.25, "protein": 0.25}
-            ],
-            "lunch": [
-                {"name": "Grilled Chicken Salad", "prep": 15, "cook": 15, "calories": 0.35, "protein": 0.35},
-                {"name": "Turkey Wrap", "prep": 10, "cook": 0, "calories": 0.35, "protein": 0.35},
-                {"name": "Quinoa & Black Bean Bowl", "prep": 15, "cook": 20, "calories": 0.35, "protein": 0.35},
-                {"name": "Tuna Salad Sandwich", "prep": 10, "cook": 0, "calories": 0.35, "protein": 0.35}
-            ],
-            "snacks": [
-                {"name": "Greek Yogurt with Berries", "prep": 2, "cook": 0, "calories": 0.10, "protein": 0.10},
-                {"name": "Apple slices with Almond Butter", "prep": 2, "cook": 0, "calories": 0.10, "protein": 0.10},
-                {"name": "Protein Shake", "prep": 2, "cook": 0, "calories": 0.10, "protein": 0.10},
-                {"name": "Handful of Almonds", "prep": 0, "cook": 0, "calories": 0.10, "protein": 0.10}
-            ],
-            "dinner": [
-                {"name": "Baked Salmon with Vegetables", "prep": 15, "cook": 25, "calories": 0.30, "protein": 0.30},
-                {"name": "Lean Beef Stir-Fry", "prep": 20, "cook": 15, "calories": 0.30, "protein": 0.30},
-                {"name": "Chicken Breast with Sweet Potato", "prep": 10, "cook": 30, "calories": 0.30, "protein": 0.30},
-                {"name": "Vegetable Curry with Tofu", "prep": 20, "cook": 20, "calories": 0.30, "protein": 0.30}
-            ]
-        }
-
-        options = meal_templates.get(meal_type, meal_templates["lunch"])
+        options = _MEAL_TEMPLATES.get(meal_type, _MEAL_TEMPLATES["lunch"])
         template = random.choice(options)
         
         # Calculate actual values
@@ -675,14 +831,7 @@ class MealPlanAgentWithExtraction:
         return {
             "meal_name": template["name"],
             "meal_id": "mock_meal_id",
-            "ingredients_with_quantities": [
-                {"ingredient": "Main protein", "quantity": 150, "unit": "g", "from_inventory": False,
-                 "inventory_item_id": None},
-                {"ingredient": "Vegetables", "quantity": 200, "unit": "g", "from_inventory": True,
-                 "inventory_item_id": "inv_123"},
-                {"ingredient": "Grains/Carbs", "quantity": 100, "unit": "g", "from_inventory": False,
-                 "inventory_item_id": None}
-            ],
+            "ingredients_with_quantities": [dict(ingredient) for ingredient in _SAMPLE_INGREDIENTS],
             "preparation_time": template["prep"],
             "cooking_time": template["cook"],
             "nutrition": {
@@ -695,19 +844,50 @@ class MealPlanAgentWithExtraction:
             "serving_size": "1 serving",
             "servings": 1,
             "recipe": {
-                "prep_steps": [
-                    "Gather all ingredients",
-                    "Wash and chop vegetables",
-                    "Season proteins"
-                ],
-                "cooking_instructions": [
-                    "Preheat cooking surface",
-                    "Cook protein to safe temperature",
-                    "Prepare sides",
-                    "Plate and serve"
-                ],
-                "equipment_needed": ["Pan", "Cutting board", "Knife"],
+                "prep_steps": list(_SAMPLE_PREP_STEPS),
+                "cooking_instructions": list(_SAMPLE_COOKING_STEPS),
+                "equipment_needed": list(_SAMPLE_EQUIPMENT),
                 "difficulty_level": "easy",
-                "tips": ["Prep ahead for faster cooking", "Season to taste"]
+                "tips": list(_SAMPLE_TIPS)
             }
         }
+
+
+# ==================== CACHED AGENT RESOURCES ====================
+# Heavy Cortex handles live in st.cache_resource rather than st.session_state so
+# every session and rerun shares them
+@st.cache_resource(show_spinner=False)
+def get_cortex_chat_model(_session, model: str) -> ChatSnowflakeCortex:
+    """Shared ChatSnowflakeCortex handle for the cached Snowpark session"""
+    return ChatSnowflakeCortex(session=_session, model=model)
+
+
+class _DegradedAgentError(Exception):
+    """Raised from the cached factory so a fallback-mode agent is never cached"""
+
+    def __init__(self, agent: MealPlanAgentWithExtraction):
+        super().__init__("Cortex agent unavailable, running in fallback mode")
+        self.agent = agent
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_meal_plan_agent(_session) -> MealPlanAgentWithExtraction:
+    """Agent (and its compiled graph) shared across reruns for the cached Snowpark session"""
+    agent = MealPlanAgentWithExtraction(_session)
+    if agent.agent is None:
+        raise _DegradedAgentError(agent)
+    return agent
+
+
+def get_meal_plan_agent(_session) -> MealPlanAgentWithExtraction:
+    """Shared agent, or an uncached fallback-mode one so the next call retries Cortex"""
+    try:
+        return _shared_meal_plan_agent(_session)
+    except _DegradedAgentError as e:
+        return e.agent
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_mock_meal_plan(_agent: MealPlanAgentWithExtraction, profile: Dict, plan_date: str) -> Dict[str, Any]:
+    """Mock plan keyed on the profile fields it uses and the start date (day names depend on it)"""
+    return _agent._build_mock_meal_plan(profile)
@@ -1,12 +1,16 @@
 import streamlit as st
-from typing import Dict, Any, List, TypedDict, Optional
-from langchain_community.chat_models import ChatSnowflakeCortex
+from typing import Dict, Any, List, TypedDict, Optional, Tuple
 from langchain.schema import HumanMessage, SystemMessage, AIMessage, BaseMessage
 from langgraph.graph import StateGraph, END
+import functools
 import json
 import os
 import re
+import threading
+from datetime import date
+from cachetools import TTLCache
 from utils.mcp_client import MealMindMCPClient
+from utils.agent import get_cortex_chat_model
 
 # ==================== LANGGRAPH STATE ====================
 class ChatState(TypedDict):
@@ -17,129 +21,47 @@ class ChatState(TypedDict):
     context: str
     tool_calls: List[Dict] # To track pending tool calls
     tool_outputs: List[Dict] # To track tool results
+    skip_llm_synthesis: bool # Tools found nothing new; answer with _NO_DATA_MESSAGE
 
-# ==================== CHAT AGENT ====================
-class ChatAgent:
-    """Agent for handling user chat interactions about meal plans and inventory"""
+# Each tool round is two graph steps; LangGraph's default recursion limit is 25
+_MAX_TOOL_ROUNDS = 12
+_TOOL_LIMIT_MESSAGE = "I'm sorry, I couldn't find that information. Please try rephrasing your question."
+# Canned reply when a tool round only produced empty results / duplicate-search notices
+_NO_DATA_MESSAGE = "I couldn't find data for that. Could you rephrase?"
+_NO_MATCH_RESULT = "No matching foods found."
+# Messages sent verbatim (8 user/assistant turns); older ones are summarised
+_HISTORY_WINDOW = 16
+_EARLIER_QUESTION_CHARS = 120
+# Tool calls open with this (whitespace ignored), per the FORMAT line in the system prompt
+_TOOL_PREFIX = '{"tool"'
+# A flat {"tool": "search_foods", ...} object anywhere in the response
+_TOOL_RE = re.compile(r'\{\s*"tool"\s*:\s*"search_foods"[^{}]*\}')
 
-    def __init__(self, session):
-        self.session = session
-        try:
-            # Initialize Cortex Chat Model
-            self.chat_model = ChatSnowflakeCortex(
-                session=self.session,
-                model="openai-gpt-4.1" 
-            )
-            
-            # Initialize MCP Client for Context Retrieval
-            try:
-                account = os.getenv("SNOWFLAKE_ACCOUNT")
-                db = os.getenv("SNOWFLAKE_DATABASE")
-                schema = os.getenv("SNOWFLAKE_SCHEMA")
-                token = self.session.connection.rest.token
-                
-                if all([account, token, db, schema]):
-                    self.mcp_client = MealMindMCPClient(account, token, db, schema)
-                else:
-                    print("DEBUG: Missing credentials for MCP client in ChatAgent")
-                    self.mcp_client = None
-            except Exception as e:
-                print(f"DEBUG: Failed to init MCP client in ChatAgent: {e}")
-                self.mcp_client = None
-                
-        except Exception as e:
-            st.warning(f"Chat Agent initialization failed: {e}")
-            self.chat_model = None
-
-    def _retrieve_context(self, query: str) -> str:
-        """Retrieve relevant context using MCP"""
-        if not self.mcp_client:
-            return "Error: MCP Client not available."
-            
-        try:
-            # Request specific columns for better context
-            columns = [
-                "FOOD_NAME", "ENERGY_KCAL", "PROTEIN_G", "CARBOHYDRATE_G", 
-                "TOTAL_FAT_G", "FIBER_TOTAL_G", "PRIMARY_INGREDIENT"
-            ]
-            
-            response = self.mcp_client.search_foods(query, columns=columns, limit=5)
-            
-            if "error" in response:
-                return f"Error retrieving data: {response['error']}"
-                
-            result_content = response.get("result", {}).get("content", [])
-            context_parts = []
-            
-            for item in result_content:
-                if item.get("type") == "text":
-                    text = item.get("text")
-                    try:
-                        data = json.loads(text)
-                        
-                        def format_record(record):
-                            if isinstance(record, str): return record
-                            parts = []
-                            if "FOOD_NAME" in record: parts.append(f"Food: {record['FOOD_NAME']}")
-                            nutrients = []
-                            if "ENERGY_KCAL" in record: nutrients.append(f"{record['ENERGY_KCAL']} kcal")
-                            if "PROTEIN_G" in record: nutrients.append(f"P: {record['PROTEIN_G']}g")
-                            if "CARBOHYDRATE_G" in record: nutrients.append(f"C: {record['CARBOHYDRATE_G']}g")
-                            if "TOTAL_FAT_G" in record: nutrients.append(f"F: {record['TOTAL_FAT_G']}g")
-                            if nutrients: parts.append(" | ".join(nutrients))
-                            return "\n".join(parts)
-
-                        if isinstance(data, list):
-                            for chunk in data: context_parts.append(format_record(chunk))
-                        elif isinstance(data, dict):
-                             context_parts.append(format_record(data))
-                        else:
-                            context_parts.append(str(data))
-                    except:
-                        context_parts.append(text)
-                        
-            return "\n\n".join(context_parts) if context_parts else "No matching foods found."
-        except Exception as e:
-            return f"Error executing search: {str(e)}"
 
-    def get_system_prompt(self, state: ChatState) -> str:
-        """Construct the system prompt with context"""
-        profile = state.get('user_profile', {})
-        inventory = state.get('inventory_summary', 'No inventory data available.')
-        meal_plan = state.get('meal_plan_summary', 'No meal plan generated yet.')
-        
-        from datetime import datetime
-        current_date_str = datetime.now().strftime('%A, %B %d, %Y')
+def _tool_prefix_state(head: str) -> Optional[bool]:
+    """True if head opens a tool call, False if it can't, None if too short to tell"""
+    compact = "".join(head.split())[:len(_TOOL_PREFIX)]
+    if not _TOOL_PREFIX.startswith(compact):
+        return False
+    return True if len(compact) == len(_TOOL_PREFIX) else None
 
-        system_prompt = f"""
+# ==================== SYSTEM PROMPT ====================
+# Static instructions go first so every turn shares the same prompt prefix;
+# per-user context is appended after them
+_SYSTEM_PROMPT_HEADER = """
         You are Meal Mind AI, a helpful nutrition and meal planning assistant.
         
-        TODAY'S DATE: {current_date_str}
-        
-        USER PROFILE:
-        - Name: {profile.get('username', 'User')}
-        - Goal: {profile.get('health_goal', 'General Health')}
-        - Dietary Restrictions: {profile.get('dietary_restrictions', 'None')}
-        - Allergies: {profile.get('food_allergies', 'None')}
-        
-        CURRENT INVENTORY SUMMARY:
-        {inventory}
-        
-        CURRENT MEAL PLAN SUMMARY:
-        {meal_plan}
-        
         TOOLS AVAILABLE:
         1. search_foods(query: str): Search for nutritional information about specific foods. Use this when you need to know calories, macros, or ingredients for a food item that is not in the context.
         
         INSTRUCTIONS:
         - If you need to search for food data to answer the user's question, output a JSON object with the tool call.
-        - FORMAT: {{"tool": "search_foods", "query": "apple pie"}}
+        - FORMAT: {"tool": "search_foods", "query": "apple pie"}
         - Do NOT output anything else if you are calling a tool.
         - If you have enough information, answer the user directly.
         - HANDLING SEARCH RESULTS:
           - If multiple variations are returned (e.g., raw, boiled, fried), choose the most relevant one based on the user's description.
           - If the user didn't specify preparation, present the most common form (e.g., "cooked" or "raw") or briefly summarize the options (e.g., "Raw: 33 kcal, Cooked: 59 kcal").
-          - If the user didn't specify preparation, present the most common form (e.g., "cooked" or "raw") or briefly summarize the options (e.g., "Raw: 33 kcal, Cooked: 59 kcal").
           - Do NOT simply list the raw database records. Synthesize the information into a helpful response.
         - FINAL OUTPUT FORMAT:
           - Do NOT mention "search_foods", "tools", "database", or "I used a tool" in your final response.
@@ -147,44 +69,292 @@ class ChatAgent:
         - If the user asks about their meal plan or inventory, use the provided summaries.
         - Be encouraging and supportive.
         """
-        return system_prompt
 
-    def node_process_message(self, state: ChatState) -> ChatState:
-        """Process the user message and generate a response"""
+# Used when the question can be answered from the context summaries alone
+_SYSTEM_PROMPT_HEADER_NO_TOOLS = """
+        You are Meal Mind AI, a helpful nutrition and meal planning assistant.
+        
+        INSTRUCTIONS:
+        - Answer using the user profile, inventory and meal plan summaries below.
+        - Be encouraging and supportive.
+        """
+
+_SYSTEM_PROMPT_CONTEXT = """
+        TODAY'S DATE: {current_date}
+        
+        USER PROFILE:
+        - Name: {username}
+        - Goal: {health_goal}
+        - Dietary Restrictions: {dietary_restrictions}
+        - Allergies: {food_allergies}
+        
+        CURRENT INVENTORY SUMMARY:
+        {inventory}
+        
+        CURRENT MEAL PLAN SUMMARY:
+        {meal_plan}
+        """
+
+# (field, default) pairs read from the profile, in template order
+_PROMPT_PROFILE_FIELDS = (
+    ('username', 'User'),
+    ('health_goal', 'General Health'),
+    ('dietary_restrictions', 'None'),
+    ('food_allergies', 'None'),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _format_prompt_date(day: date) -> str:
+    """TODAY'S DATE line value; only re-formatted when the day changes"""
+    return day.strftime('%A, %B %d, %Y')
+
+
+@functools.lru_cache(maxsize=128)
+def _render_system_prompt(profile_fields: tuple, inventory: str, meal_plan: str, current_date: str,
+                          use_tools: bool = True) -> str:
+    """Render the full system prompt; identical turns hit the cache"""
+    username, health_goal, dietary_restrictions, food_allergies = profile_fields
+    header = _SYSTEM_PROMPT_HEADER if use_tools else _SYSTEM_PROMPT_HEADER_NO_TOOLS
+    return header + _SYSTEM_PROMPT_CONTEXT.format(
+        current_date=current_date,
+        username=username,
+        health_goal=health_goal,
+        dietary_restrictions=dietary_restrictions,
+        food_allergies=food_allergies,
+        inventory=inventory,
+        meal_plan=meal_plan,
+    )
+
+# ==================== SEARCH RESULT CACHE ====================
+# Request specific columns for better context
+_SEARCH_COLUMNS = (
+    "FOOD_NAME", "ENERGY_KCAL", "PROTEIN_G", "CARBOHYDRATE_G",
+    "TOTAL_FAT_G", "FIBER_TOTAL_G", "PRIMARY_INGREDIENT"
+)
+_SEARCH_LIMIT = 5
+# (column, template) for the nutrient line of each search result
+_NUTRIENT_FORMATS = (
+    ("ENERGY_KCAL", "{} kcal"),
+    ("PROTEIN_G", "P: {}g"),
+    ("CARBOHYDRATE_G", "C: {}g"),
+    ("TOTAL_FAT_G", "F: {}g"),
+)
+# Formatted search_foods results, shared across agents, sessions and turns
+_SEARCH_CACHE = TTLCache(maxsize=2048, ttl=600)
+_SEARCH_CACHE_LOCK = threading.Lock()
+
+
+def _format_record(record) -> str:
+    """One search result as a 'Food: ...' line plus a 'kcal | P | C | F' line"""
+    if isinstance(record, str):
+        return record
+    parts = []
+    if "FOOD_NAME" in record:
+        parts.append(f"Food: {record['FOOD_NAME']}")
+    nutrients = " | ".join(template.format(record[column]) for column, template in _NUTRIENT_FORMATS if column in record)
+    if nutrients:
+        parts.append(nutrients)
+    return "\n".join(parts)
+
+
+def _format_search_response(response: Dict) -> Tuple[str, bool]:
+    """Format one search_foods response; the flag says whether it is safe to cache"""
+    if "exception" in response:
+        return f"Error executing search: {str(response['exception'])}", False
+    if "error" in response:
+        return f"Error retrieving data: {response['error']}", False
+    
+    try:
+        result_content = response.get("result", {}).get("content", [])
+        context_parts = []
+        
+        for item in result_content:
+            if item.get("type") == "text":
+                text = item.get("text")
+                if not isinstance(text, str):
+                    continue
+                try:
+                    data = json.loads(text)
+
+                    if isinstance(data, list):
+                        context_parts.extend(_format_record(chunk) for chunk in data)
+                    elif isinstance(data, dict):
+                        context_parts.append(_format_record(data))
+                    else:
+                        context_parts.append(str(data))
+                except (ValueError, TypeError):
+                    # Not JSON (or not record-shaped) - pass the raw text through
+                    context_parts.append(text)
+        
+        return ("\n\n".join(context_parts) if context_parts else _NO_MATCH_RESULT), True
+    except Exception as e:
+        return f"Error executing search: {str(e)}", False
+
+
+# ==================== CONTEXT-ONLY FAST PATH ====================
+# Questions about the user's own inventory/plan (or small talk) are answered from the
+# summaries already in the prompt, unless they also ask for food nutrition data
+_CONTEXT_ONLY_RE = re.compile(
+    r"\b(inventory|pantry|fridge|meal plan|my plan|my meals?|hi|hello|hey|thanks|thank you)\b",
+    re.IGNORECASE
+)
+_FOOD_LOOKUP_RE = re.compile(
+    r"\b(calories?|kcal|protein|carbs?|carbohydrates?|fats?|fib(?:er|re)|macros?|nutrition(?:al)?|nutrients?)\b",
+    re.IGNORECASE
+)
+
+
+def _is_context_only(user_input: str) -> bool:
+    """Whether the question can skip the search_foods tool entirely"""
+    return bool(_CONTEXT_ONLY_RE.search(user_input)) and not _FOOD_LOOKUP_RE.search(user_input)
+
+
+# ==================== CHAT AGENT ====================
+class ChatAgent:
+    """Agent for handling user chat interactions about meal plans and inventory"""
+
+    def __init__(self, session):
+        # The chat model and MCP client are created on first use, so reruns that
+        # never send a message don't pay for them
+        self.session = session
+
+    @functools.cached_property
+    def chat_model(self):
+        """Cortex chat model (None if it couldn't be initialized)"""
+        try:
+            return get_cortex_chat_model(self.session, "openai-gpt-4.1")
+        except Exception as e:
+            st.warning(f"Chat Agent initialization failed: {e}")
+            return None
+
+    @functools.cached_property
+    def mcp_client(self) -> Optional[MealMindMCPClient]:
+        """MCP client for context retrieval (None without credentials)"""
+        try:
+            account = os.getenv("SNOWFLAKE_ACCOUNT")
+            db = os.getenv("SNOWFLAKE_DATABASE")
+            schema = os.getenv("SNOWFLAKE_SCHEMA")
+            token = self.session.connection.rest.token
+            
+            if all([account, token, db, schema]):
+                return MealMindMCPClient(account, token, db, schema)
+            print("DEBUG: Missing credentials for MCP client in ChatAgent")
+            return None
+        except Exception as e:
+            print(f"DEBUG: Failed to init MCP client in ChatAgent: {e}")
+            return None
+
+    def _retrieve_context(self, query: str) -> str:
+        """Retrieve relevant context using MCP"""
+        return self._retrieve_contexts([query])[0]
+
+    def _retrieve_contexts(self, queries: List[str]) -> List[str]:
+        """Retrieve context for several queries, sending cache misses to MCP as one batch"""
+        if not self.mcp_client:
+            return ["Error: MCP Client not available."] * len(queries)
+        
+        results = {}
+        with _SEARCH_CACHE_LOCK:
+            for query in queries:
+                cached = _SEARCH_CACHE.get((query, _SEARCH_COLUMNS, _SEARCH_LIMIT))
+                if cached is not None:
+                    results[query] = cached
+        
+        misses = [query for query in dict.fromkeys(queries) if query not in results]
+        if misses:
+            try:
+                responses = self.mcp_client.search_foods_batch(
+                    misses, columns=list(_SEARCH_COLUMNS), limit=_SEARCH_LIMIT
+                )
+            except Exception as e:
+                responses = [{"exception": e}] * len(misses)
+            
+            for query, response in zip(misses, responses):
+                result, cacheable = _format_search_response(response)
+                results[query] = result
+                # Only successful searches are cached; errors are retried next time
+                if cacheable:
+                    with _SEARCH_CACHE_LOCK:
+                        _SEARCH_CACHE[(query, _SEARCH_COLUMNS, _SEARCH_LIMIT)] = result
+        
+        return [results[query] for query in queries]
+
+    def get_system_prompt(self, state: ChatState, use_tools: bool = True) -> str:
+        """Construct the system prompt with context"""
+        profile = state.get('user_profile', {})
+        inventory = state.get('inventory_summary', 'No inventory data available.')
+        meal_plan = state.get('meal_plan_summary', 'No meal plan generated yet.')
+        current_date_str = _format_prompt_date(date.today())
+
+        profile_fields = tuple(
+            str(profile.get(field, default)) for field, default in _PROMPT_PROFILE_FIELDS
+        )
+        return _render_system_prompt(profile_fields, inventory, meal_plan, current_date_str, use_tools)
+
+    def _format_messages(self, state: ChatState, use_tools: bool = True) -> List[BaseMessage]:
+        """System prompt + recent history + any tool outputs, ready for the model"""
         messages = state['messages']
-        system_prompt = self.get_system_prompt(state)
+        system_prompt = self.get_system_prompt(state, use_tools)
+        
+        # Keep the last few turns verbatim; older user questions go in a short note
+        # after the system prompt so its cached prefix is untouched
+        older, recent = messages[:-_HISTORY_WINDOW], messages[-_HISTORY_WINDOW:]
+        earlier_questions = [
+            " ".join(str(m.content).split())[:_EARLIER_QUESTION_CHARS]
+            for m in older if isinstance(m, HumanMessage)
+        ]
+        if earlier_questions:
+            system_prompt += "\n        EARLIER IN THIS CONVERSATION THE USER ASKED:\n" + "\n".join(
+                f"        - {question}" for question in earlier_questions
+            )
         
         # Add tool outputs to history if any
         tool_outputs = state.get('tool_outputs', [])
-        history_with_tools = list(messages)
+        history_with_tools = list(recent)
         
         if tool_outputs:
             for output in tool_outputs:
                 history_with_tools.append(AIMessage(content=f"Tool Output: {output['result']}"))
         
+        return [SystemMessage(content=system_prompt)] + history_with_tools
+
+    def _find_tool_calls(self, content: str) -> List[Dict]:
+        """Pull search_foods tool calls out of a model response (supports multiple)"""
+        found_tools = []
+        if '"tool"' not in content:
+            return found_tools
+        # The model often repeats a call verbatim; only parse and keep each one once
+        seen_calls = set()
+        seen_queries = set()
+        for match in _TOOL_RE.finditer(content):
+            raw_call = match.group(0)
+            if raw_call in seen_calls:
+                continue
+            seen_calls.add(raw_call)
+            try:
+                tool_call = json.loads(raw_call)
+            except ValueError:
+                continue
+            query = tool_call.get("query")
+            if (tool_call.get("tool") == "search_foods" and isinstance(query, str)
+                    and query not in seen_queries):
+                print(f"\n*** TOOL CALL DETECTED: {tool_call} ***\n")
+                seen_queries.add(query)
+                found_tools.append(tool_call)
+        return found_tools
+
+    def node_process_message(self, state: ChatState) -> ChatState:
+        """Process the user message and generate a response"""
         # Prepare messages for the model
-        formatted_messages = [SystemMessage(content=system_prompt)] + history_with_tools
+        formatted_messages = self._format_messages(state)
         
         try:
             if self.chat_model:
                 response = self.chat_model.invoke(formatted_messages)
                 content = response.content.strip()
                 
-                # Check for tool calls (support multiple)
-                found_tools = []
-                try:
-                    candidates = re.finditer(r'\{[^{}]*\}', content)
-                    for match in candidates:
-                        try:
-                            tool_call = json.loads(match.group(0))
-                            if tool_call.get("tool") == "search_foods":
-                                print(f"\n*** TOOL CALL DETECTED: {tool_call} ***\n")
-                                found_tools.append(tool_call)
-                        except:
-                            pass
-                except:
-                    pass
-                    
+                found_tools = self._find_tool_calls(content)
                 if found_tools:
                     return {"tool_calls": found_tools}
                 
@@ -200,6 +370,8 @@ class ChatAgent:
         tool_calls = state.get('tool_calls', [])
         current_outputs = state.get('tool_outputs', [])
         outputs = []
+        pending = []  # outputs still waiting on a search result
+        found_data = False
         
         # Create a set of already executed queries to prevent loops
         executed_queries = {
@@ -221,13 +393,27 @@ class ChatAgent:
                     continue
                 
                 print(f"\n*** EXECUTING TOOL: search_foods('{query}') ***\n")
-                result = self._retrieve_context(query)
-                outputs.append({"tool": "search_foods", "query": query, "result": result})
+                outputs.append({"tool": "search_foods", "query": query, "result": None})
+                pending.append(outputs[-1])
                 executed_queries.add(('search_foods', query))
+        
+        # All new searches go to MCP together (one batch request, or concurrent calls)
+        if pending:
+            results = self._retrieve_contexts([output['query'] for output in pending])
+            for output, result in zip(pending, results):
+                output['result'] = result
+                found_data = found_data or result != _NO_MATCH_RESULT
                 
         # Append to existing outputs
         state['tool_outputs'] = current_outputs + outputs
         state['tool_calls'] = []
+        
+        # Nothing but empty results / duplicate notices: another model call would
+        # only apologise, so end the turn with a canned reply instead
+        state['skip_llm_synthesis'] = bool(outputs) and not found_data
+        if state['skip_llm_synthesis']:
+            print("\n*** NO TOOL DATA FOUND, SKIPPING SYNTHESIS ***\n")
+            state['messages'] = state['messages'] + [AIMessage(content=_NO_DATA_MESSAGE)]
         return state
 
     def decide_next_step(self, state: ChatState) -> str:
@@ -236,6 +422,12 @@ class ChatAgent:
             return "execute_tools"
         return END
 
+    def decide_after_tools(self, state: ChatState) -> str:
+        """Go back to the model unless the tools came up empty"""
+        if state.get('skip_llm_synthesis'):
+            return END
+        return "process_message"
+
     def build_graph(self):
         """Build the LangGraph workflow for chat"""
         workflow = StateGraph(ChatState)
@@ -256,40 +448,106 @@ class ChatAgent:
             }
         )
         
-        workflow.add_edge("execute_tools", "process_message")
+        workflow.add_conditional_edges(
+            "execute_tools",
+            self.decide_after_tools,
+            {
+                "process_message": "process_message",
+                END: END
+            }
+        )
         
         return workflow.compile()
 
-    def run_chat(self, user_input: str, history: List[Any], context_data: Dict) -> str:
-        """Main entry point to run the chat"""
-        
-        # Prepare initial state
-        initial_state = {
+    def _initial_state(self, user_input: str, history: List[Any], context_data: Dict) -> ChatState:
+        """Build the starting graph state for a user turn"""
+        return {
             "messages": history + [HumanMessage(content=user_input)],
             "user_profile": context_data.get('user_profile', {}),
             "inventory_summary": context_data.get('inventory_summary', ''),
             "meal_plan_summary": context_data.get('meal_plan_summary', ''),
             "context": "",
             "tool_calls": [],
-            "tool_outputs": []
+            "tool_outputs": [],
+            "skip_llm_synthesis": False
         }
+
+    def run_chat(self, user_input: str, history: List[Any], context_data: Dict) -> str:
+        """Main entry point to run the chat"""
+        
+        # Prepare initial state
+        state = self._initial_state(user_input, history, context_data)
         
-        app = self.build_graph()
-        result = app.invoke(initial_state)
+        # Fast path: one call with the tool instructions left out of the prompt
+        if self.chat_model and _is_context_only(user_input):
+            try:
+                return self.chat_model.invoke(self._format_messages(state, use_tools=False)).content
+            except Exception as e:
+                return f"I encountered an error: {str(e)}"
+        
+        # Drive the process -> tools loop directly; same steps as build_graph() without the graph runtime
+        for _ in range(_MAX_TOOL_ROUNDS):
+            result = self.node_process_message(state)
+            if not result.get('tool_calls'):
+                # Get the last message (AI response)
+                return result['messages'][-1].content
+            
+            state['tool_calls'] = result['tool_calls']
+            state = self.node_execute_tools(state)
+            if state['skip_llm_synthesis']:
+                return _NO_DATA_MESSAGE
         
-        # Get the last message (AI response)
-        last_message = result['messages'][-1]
-        return last_message.content
+        return _TOOL_LIMIT_MESSAGE
 
     def run_chat_stream(self, user_input: str, history: List[Any], context_data: Dict):
-        """Stream the chat response character by character"""
+        """Stream the chat response as the model generates it"""
+        if not self.chat_model:
+            yield self.run_chat(user_input, history, context_data)
+            return
         
-        # Get the full response first
-        full_response = self.run_chat(user_input, history, context_data)
+        state = self._initial_state(user_input, history, context_data)
         
-        # Stream it character by character
-        # Split by words for more natural streaming
-        words = full_response.split()
-        for i, word in enumerate(words):
-            yield word + (" " if i < len(words) - 1 else "")
-
+        try:
+            # Fast path: no tool instructions, so no need to sniff for a tool call
+            if _is_context_only(user_input):
+                for chunk in self.chat_model.stream(self._format_messages(state, use_tools=False)):
+                    yield chunk.content
+                return
+            
+            for _ in range(_MAX_TOOL_ROUNDS):
+                stream = self.chat_model.stream(self._format_messages(state))
+                
+                # Buffer just enough of the response to tell whether it opens with {"tool"
+                buffered = []
+                head = ""
+                is_tool = None
+                for chunk in stream:
+                    buffered.append(chunk.content)
+                    head = "".join(buffered).lstrip()
+                    is_tool = _tool_prefix_state(head)
+                    if is_tool is not None:
+                        break
+                
+                # Plain answer: flush what we peeked at and pass the rest straight through
+                if not is_tool:
+                    yield head
+                    for chunk in stream:
+                        yield chunk.content
+                    return
+                
+                # Possible tool call: needs the whole response before it can be parsed
+                content = (head + "".join(chunk.content for chunk in stream)).strip()
+                tool_calls = self._find_tool_calls(content)
+                if not tool_calls:
+                    yield content
+                    return
+                
+                state['tool_calls'] = tool_calls
+                state = self.node_execute_tools(state)
+                if state['skip_llm_synthesis']:
+                    yield _NO_DATA_MESSAGE
+                    return
+            
+            yield _TOOL_LIMIT_MESSAGE
+        except Exception as e:
+            yield f"I encountered an error: {str(e)}"
@@ -1,66 +1,164 @@
+import atexit
 import json
+import weakref
 from typing import Any, Dict, Iterator, List, Optional, Tuple
 from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointMetadata, CheckpointTuple
 import snowflake.connector
+import threading
 import uuid
+from cachetools import TTLCache
+
+_MISSING = object()
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj: Any, default) -> str:
+        return orjson.dumps(
+            obj, default=default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+except ImportError:  # stdlib fallback
+    _loads = json.loads
+
+    def _dumps(obj: Any, default) -> str:
+        return json.dumps(obj, default=default)
+
+# Savers with possibly unflushed rows, drained at interpreter exit
+_LIVE_SAVERS = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_savers() -> None:
+    for saver in list(_LIVE_SAVERS):
+        saver.flush()
+
 
 class SnowflakeCheckpointSaver(BaseCheckpointSaver):
-    """A checkpoint saver that stores checkpoints in a Snowflake table."""
+    """A checkpoint saver that stores checkpoints in a Snowflake table.
+
+    Writes are buffered and inserted in one statement / one commit. The buffer is
+    flushed when it reaches ``batch_size``, before any read, on ``flush()`` and at
+    interpreter exit. Callers should ``flush()`` once a graph run finishes; a crash
+    before then loses up to ``batch_size - 1`` checkpoints, so use ``batch_size=1``
+    where every checkpoint must be durable.
+
+    Chat runs always start from a fresh state, so nothing is written unless
+    ``persist`` is set here or ``"persist": True`` is passed in the run's
+    ``configurable`` dict.
+    """
 
-    def __init__(self, conn):
+    def __init__(self, conn, batch_size: int = 10, persist: bool = False):
         super().__init__()
         self.conn = conn
+        self.batch_size = batch_size
+        self.persist = persist
+        self._pending: List[Tuple[str, str, str, Optional[str], Optional[str]]] = []
+        self._pending_lock = threading.Lock()
+        # Latest checkpoint per thread_id, briefly reused across graph steps
+        self._latest_checkpoint_cache = TTLCache(maxsize=256, ttl=2)
+        self._cache_lock = threading.Lock()
+        _LIVE_SAVERS.add(self)
+
+    def flush(self) -> None:
+        """Insert all buffered checkpoints in a single round-trip."""
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+
+        values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+        params = [value for row in rows for value in row]
+
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"""
+                    INSERT INTO thread_checkpoints
+                        (checkpoint_id, thread_id, checkpoint_data, parent_checkpoint_id, versions)
+                    SELECT column1, column2, PARSE_JSON(column3), column4, PARSE_JSON(column5)
+                    FROM VALUES {values}
+                """, params)
+                self.conn.commit()
+        except Exception as e:
+            print(f"Error saving checkpoints: {e}")
 
     def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
         """Get a checkpoint tuple from the database."""
         thread_id = config["configurable"]["thread_id"]
         
-        cursor = self.conn.cursor()
+        # Graph steps in the same run re-read the same latest checkpoint
+        with self._cache_lock:
+            cached = self._latest_checkpoint_cache.get(thread_id, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
+        # Make sure buffered writes are visible to the read
+        self.flush()
+        
         try:
+            checkpoint_tuple = self._load_latest(config)
+        except Exception as e:
+            print(f"Error getting checkpoint: {e}")
+            return None
+        
+        with self._cache_lock:
+            self._latest_checkpoint_cache[thread_id] = checkpoint_tuple
+        return checkpoint_tuple
+
+    def _load_latest(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Read the most recent checkpoint for the config's thread."""
+        thread_id = config["configurable"]["thread_id"]
+        
+        with self.conn.cursor() as cursor:
             # Get the latest checkpoint for this thread
             # We order by created_at DESC to get the most recent one
             cursor.execute("""
-                SELECT checkpoint_data, checkpoint_id
+                SELECT checkpoint_data, checkpoint_id, parent_checkpoint_id
                 FROM thread_checkpoints
                 WHERE thread_id = %s
                 ORDER BY created_at DESC
                 LIMIT 1
             """, (thread_id,))
-            
             row = cursor.fetchone()
-            if row:
-                checkpoint_data_str = row[0]
-                checkpoint_id = row[1]
-                
-                if isinstance(checkpoint_data_str, str):
-                    data = json.loads(checkpoint_data_str)
-                else:
-                    data = checkpoint_data_str
-                
-                # Reconstruct Checkpoint object
-                # Note: This assumes a simple serialization. 
-                # In a real production app, you might need more robust serialization/deserialization
-                # compatible with LangGraph's internal format.
-                # For now, we assume 'checkpoint' and 'metadata' are top-level keys in the JSON.
-                
-                checkpoint = data.get("checkpoint")
-                metadata = data.get("metadata", {})
-                parent_config = data.get("parent_config")
-                
-                return CheckpointTuple(
-                    config=config,
-                    checkpoint=checkpoint,
-                    metadata=metadata,
-                    parent_config=parent_config
-                )
-                
-            return None
-        except Exception as e:
-            print(f"Error getting checkpoint: {e}")
+        
+        if not row:
             return None
-        finally:
-            cursor.close()
+        
+        checkpoint_data_str = row[0]
+        
+        if isinstance(checkpoint_data_str, str):
+            data = _loads(checkpoint_data_str)
+        else:
+            data = checkpoint_data_str
+        
+        # Reconstruct Checkpoint object
+        # Note: This assumes a simple serialization. 
+        # In a real production app, you might need more robust serialization/deserialization
+        # compatible with LangGraph's internal format.
+        # For now, we assume 'checkpoint' and 'metadata' are top-level keys in the JSON.
+        
+        checkpoint = data.get("checkpoint")
+        metadata = data.get("metadata", {})
+        parent_checkpoint_id = row[2]
+        if parent_checkpoint_id:
+            parent_config = {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            }
+        else:
+            # Rows written before parent_checkpoint_id existed carry the full config
+            parent_config = data.get("parent_config")
+        
+        return CheckpointTuple(
+            config=config,
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=parent_config
+        )
 
     def list(
         self,
@@ -86,13 +184,21 @@ class SnowflakeCheckpointSaver(BaseCheckpointSaver):
         thread_id = config["configurable"]["thread_id"]
         checkpoint_id = str(uuid.uuid4())
         
-        # Serialize the entire state
+        if not config["configurable"].get("persist", self.persist):
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_id": checkpoint_id,
+                }
+            }
+        
+        # Only the state goes in the JSON blob; the parent is stored as an id and
+        # rebuilt from thread_id on read, versions only when there are any
         data = {
             "checkpoint": checkpoint,
             "metadata": metadata,
-            "parent_config": config,
-            "new_versions": new_versions
         }
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
         
         # Use a custom encoder to handle non-serializable objects if necessary
         # For basic LangGraph state (dicts, lists, strings), default json dump is usually fine
@@ -108,22 +214,21 @@ class SnowflakeCheckpointSaver(BaseCheckpointSaver):
         # We will assume the state is JSON serializable for this specific app (mostly dicts/strings).
         
         try:
-            json_data = json.dumps(data, default=str)
+            json_data = _dumps(data, default=str)
         except Exception as e:
             print(f"Serialization warning: {e}")
-            json_data = json.dumps(data, default=lambda o: f"<{type(o).__name__}>")
+            json_data = _dumps(data, default=lambda o: f"<{type(o).__name__}>")
+        versions_data = _dumps(new_versions, default=str) if new_versions else None
 
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO thread_checkpoints (checkpoint_id, thread_id, checkpoint_data)
-                SELECT %s, %s, PARSE_JSON(%s)
-            """, (checkpoint_id, thread_id, json_data))
-            self.conn.commit()
-        except Exception as e:
-            print(f"Error saving checkpoint: {e}")
-        finally:
-            cursor.close()
+        with self._cache_lock:
+            self._latest_checkpoint_cache.pop(thread_id, None)
+        with self._pending_lock:
+            self._pending.append(
+                (checkpoint_id, thread_id, json_data, parent_checkpoint_id, versions_data)
+            )
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            self.flush()
             
         return {
             "configurable": {
@@ -1,263 +1,413 @@
 import streamlit as st
 import snowflake.connector
 from snowflake.snowpark import Session
+import itertools
+import json
 import os
+import pandas as pd
+import queue
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:  # stdlib fallback
+    _loads = json.loads
+    _dumps = json.dumps
+
+
+def _variant(value, default):
+    """Decode a VARIANT column (JSON text from the connector); NULL gives default"""
+    if value is None:
+        return default
+    return _loads(value) if isinstance(value, (str, bytes)) else value
+
 load_dotenv()
 
+# ==================== SCHEMA ====================
+# CREATE statements keyed by table name, in dependency (foreign key) order
+_TABLE_DDL = {
+    # Users table
+    "users": """
+        CREATE TABLE IF NOT EXISTS users
+        (
+            user_id VARCHAR(50) PRIMARY KEY,
+            username VARCHAR(100) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            email VARCHAR(255),
+            age INT,
+            gender VARCHAR(20),
+            height_cm FLOAT,
+            weight_kg FLOAT,
+            bmi FLOAT,
+            life_stage VARCHAR(50),
+            pregnancy_status VARCHAR(50),
+            lactation_status VARCHAR(50),
+            activity_level VARCHAR(50),
+            health_goal VARCHAR(100),
+            dietary_restrictions TEXT,
+            food_allergies TEXT,
+            preferred_cuisines TEXT,
+            daily_calories INT,
+            daily_protein FLOAT,
+            daily_carbohydrate FLOAT,
+            daily_fat FLOAT,
+            daily_fiber FLOAT,
+            profile_completed BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            last_login TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
+        )
+    """,
+    # Planning Schedule
+    "planning_schedule": """
+        CREATE TABLE IF NOT EXISTS planning_schedule
+        (
+            schedule_id VARCHAR(50) PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            plan_start_date DATE NOT NULL,
+            plan_end_date DATE NOT NULL,
+            next_plan_date DATE NOT NULL,
+            status VARCHAR(20) DEFAULT 'ACTIVE',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    # Inventory
+    "inventory": """
+        CREATE TABLE IF NOT EXISTS inventory
+        (
+            inventory_id VARCHAR(50) PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            item_name VARCHAR(255) NOT NULL,
+            quantity FLOAT NOT NULL,
+            unit VARCHAR(50) NOT NULL,
+            category VARCHAR(100),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    # Meal Plans
+    "meal_plans": """
+        CREATE TABLE IF NOT EXISTS meal_plans
+        (
+            plan_id VARCHAR(50) PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            schedule_id VARCHAR(50),
+            plan_name VARCHAR(255),
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            week_summary VARIANT,
+            status VARCHAR(20) DEFAULT 'ACTIVE',
+            generated_by VARCHAR(50) DEFAULT 'AGENT',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (schedule_id) REFERENCES planning_schedule(schedule_id)
+        )
+    """,
+    # Daily Meals
+    "daily_meals": """
+        CREATE TABLE IF NOT EXISTS daily_meals
+        (
+            meal_id VARCHAR(50) PRIMARY KEY,
+            plan_id VARCHAR(50) NOT NULL,
+            user_id VARCHAR(50) NOT NULL,
+            day_number INT NOT NULL,
+            day_name VARCHAR(20),
+            meal_date DATE,
+            total_nutrition VARIANT,
+            inventory_impact VARIANT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            FOREIGN KEY (plan_id) REFERENCES meal_plans(plan_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    # Meal Details
+    "meal_details": """
+        CREATE TABLE IF NOT EXISTS meal_details
+        (
+            detail_id VARCHAR(50) PRIMARY KEY,
+            meal_id VARCHAR(50) NOT NULL,
+            meal_type VARCHAR(20) NOT NULL,
+            meal_name VARCHAR(255) NOT NULL,
+            ingredients_with_quantities VARIANT,
+            recipe VARIANT,
+            nutrition VARIANT,
+            preparation_time INT,
+            cooking_time INT,
+            servings INT,
+            serving_size VARCHAR(100),
+            difficulty_level VARCHAR(20),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            FOREIGN KEY (meal_id) REFERENCES daily_meals(meal_id)
+        )
+    """,
+    # Shopping Lists
+    "shopping_lists": """
+        CREATE TABLE IF NOT EXISTS shopping_lists
+        (
+            list_id VARCHAR(50) PRIMARY KEY,
+            plan_id VARCHAR(50) NOT NULL,
+            user_id VARCHAR(50) NOT NULL,
+            shopping_data VARIANT,
+            total_estimated_cost FLOAT,
+            total_items_from_inventory INT,
+            total_items_to_purchase INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            FOREIGN KEY (plan_id) REFERENCES meal_plans(plan_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    # Conversation Threads for Memory System
+    "conversation_threads": """
+        CREATE TABLE IF NOT EXISTS conversation_threads
+        (
+            thread_id VARCHAR(50) PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            title VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            last_message_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            message_count INT DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE,
+            summary TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    # Thread Messages
+    "thread_messages": """
+        CREATE TABLE IF NOT EXISTS thread_messages
+        (
+            message_id VARCHAR(50) PRIMARY KEY,
+            thread_id VARCHAR(50) NOT NULL,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            metadata VARIANT,
+            FOREIGN KEY (thread_id) REFERENCES conversation_threads(thread_id)
+        )
+    """,
+    # Thread Checkpoints for LangGraph
+    "thread_checkpoints": """
+        CREATE TABLE IF NOT EXISTS thread_checkpoints
+        (
+            checkpoint_id VARCHAR(50) PRIMARY KEY,
+            thread_id VARCHAR(50) NOT NULL,
+            checkpoint_data VARIANT,
+            parent_checkpoint_id VARCHAR(50),
+            versions VARIANT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            FOREIGN KEY (thread_id) REFERENCES conversation_threads(thread_id)
+        )
+    """,
+    # User Feedback (Likes/Dislikes)
+    "user_feedback": """
+        CREATE TABLE IF NOT EXISTS user_feedback
+        (
+            feedback_id VARCHAR(50) PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            feedback_type VARCHAR(50),
+            entity_type VARCHAR(50),
+            entity_id VARCHAR(50),
+            entity_name VARCHAR(255),
+            sentiment VARCHAR(20),
+            intensity INT,
+            context TEXT,
+            extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            source VARCHAR(50),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    # User Preferences (Long-term Memory)
+    "user_preferences": """
+        CREATE TABLE IF NOT EXISTS user_preferences
+        (
+            preference_id VARCHAR(50) PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            preference_type VARCHAR(50),
+            preference_key VARCHAR(255),
+            preference_value TEXT,
+            confidence_score FLOAT,
+            frequency INT DEFAULT 1,
+            last_mentioned TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+            expires_at TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+}
+
+# Clustering keys matching the hot filter/join predicates of the read helpers
+_CLUSTERING_KEYS = {
+    "daily_meals": "(user_id, meal_date)",
+    "meal_plans": "(user_id, status, start_date)",
+    "meal_details": "(meal_id)",
+    "thread_messages": "(thread_id, timestamp)",
+}
+
+# Columns added after their table first shipped: (table, column, type)
+_COLUMN_MIGRATIONS = (
+    ("users", "preferred_cuisines", "TEXT"),
+    # Slim checkpoint rows keep parent id / versions in their own columns
+    ("thread_checkpoints", "parent_checkpoint_id", "VARCHAR(50)"),
+    ("thread_checkpoints", "versions", "VARIANT"),
+)
+
+# Set once this process has confirmed every table and column exists
+_SCHEMA_VERIFIED = False
+
+
+def _existing_columns(conn):
+    """(table, column) pairs, lower-cased, that already exist for the app's tables"""
+    placeholders = ", ".join(["%s"] * len(_TABLE_DDL))
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT LOWER(table_name), LOWER(column_name)
+            FROM information_schema.columns
+            WHERE table_schema = CURRENT_SCHEMA()
+            AND LOWER(table_name) IN ({placeholders})
+        """, tuple(_TABLE_DDL))
+        return set(cursor.fetchall())
+
+
+def _migrate_columns(conn, existing_columns):
+    """Add any migration columns missing from existing_columns"""
+    with conn.cursor() as cursor:
+        for table, column, column_type in _COLUMN_MIGRATIONS:
+            if (table, column) not in existing_columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type}")
+
+
 def create_tables(conn):
     """Create all necessary tables if they don't exist"""
     cursor = conn.cursor()
 
     try:
-        # Users table
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS users
-                       (
-                           user_id VARCHAR(50) PRIMARY KEY,
-                           username VARCHAR(100) UNIQUE NOT NULL,
-                           password_hash VARCHAR(255) NOT NULL,
-                           email VARCHAR(255),
-                           age INT,
-                           gender VARCHAR(20),
-                           height_cm FLOAT,
-                           weight_kg FLOAT,
-                           bmi FLOAT,
-                           life_stage VARCHAR(50),
-                           pregnancy_status VARCHAR(50),
-                           lactation_status VARCHAR(50),
-                           activity_level VARCHAR(50),
-                           health_goal VARCHAR(100),
-                           dietary_restrictions TEXT,
-                           food_allergies TEXT,
-                           preferred_cuisines TEXT,
-                           daily_calories INT,
-                           daily_protein FLOAT,
-                           daily_carbohydrate FLOAT,
-                           daily_fat FLOAT,
-                           daily_fiber FLOAT,
-                           profile_completed BOOLEAN DEFAULT FALSE,
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           last_login TIMESTAMP,
-                           updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP()
-                       )
-                       """)
-
-        # Planning Schedule
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS planning_schedule
-                       (
-                           schedule_id VARCHAR(50) PRIMARY KEY,
-                           user_id VARCHAR(50) NOT NULL,
-                           plan_start_date DATE NOT NULL,
-                           plan_end_date DATE NOT NULL,
-                           next_plan_date DATE NOT NULL,
-                           status VARCHAR(20) DEFAULT 'ACTIVE',
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           FOREIGN KEY (user_id) REFERENCES users(user_id)
-                       )
-                       """)
-
-        # Inventory
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS inventory
-                       (
-                           inventory_id VARCHAR(50) PRIMARY KEY,
-                           user_id VARCHAR(50) NOT NULL,
-                           item_name VARCHAR(255) NOT NULL,
-                           quantity FLOAT NOT NULL,
-                           unit VARCHAR(50) NOT NULL,
-                           category VARCHAR(100),
-                           notes TEXT,
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           FOREIGN KEY (user_id) REFERENCES users(user_id)
-                       )
-                       """)
-
-        # Meal Plans
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS meal_plans
-                       (
-                           plan_id VARCHAR(50) PRIMARY KEY,
-                           user_id VARCHAR(50) NOT NULL,
-                           schedule_id VARCHAR(50),
-                           plan_name VARCHAR(255),
-                           start_date DATE NOT NULL,
-                           end_date DATE NOT NULL,
-                           week_summary VARIANT,
-                           status VARCHAR(20) DEFAULT 'ACTIVE',
-                           generated_by VARCHAR(50) DEFAULT 'AGENT',
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           FOREIGN KEY (user_id) REFERENCES users(user_id),
-                           FOREIGN KEY (schedule_id) REFERENCES planning_schedule(schedule_id)
-                       )
-                       """)
-
-        # Daily Meals
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS daily_meals
-                       (
-                           meal_id VARCHAR(50) PRIMARY KEY,
-                           plan_id VARCHAR(50) NOT NULL,
-                           user_id VARCHAR(50) NOT NULL,
-                           day_number INT NOT NULL,
-                           day_name VARCHAR(20),
-                           meal_date DATE,
-                           total_nutrition VARIANT,
-                           inventory_impact VARIANT,
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           FOREIGN KEY (plan_id) REFERENCES meal_plans(plan_id),
-                           FOREIGN KEY (user_id) REFERENCES users(user_id)
-                       )
-                       """)
-
-        # Meal Details
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS meal_details
-                       (
-                           detail_id VARCHAR(50) PRIMARY KEY,
-                           meal_id VARCHAR(50) NOT NULL,
-                           meal_type VARCHAR(20) NOT NULL,
-                           meal_name VARCHAR(255) NOT NULL,
-                           ingredients_with_quantities VARIANT,
-                           recipe VARIANT,
-                           nutrition VARIANT,
-                           preparation_time INT,
-                           cooking_time INT,
-                           servings INT,
-                           serving_size VARCHAR(100),
-                           difficulty_level VARCHAR(20),
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           FOREIGN KEY (meal_id) REFERENCES daily_meals(meal_id)
-                       )
-                       """)
-
-        # Shopping Lists
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS shopping_lists
-                       (
-                           list_id VARCHAR(50) PRIMARY KEY,
-                           plan_id VARCHAR(50) NOT NULL,
-                           user_id VARCHAR(50) NOT NULL,
-                           shopping_data VARIANT,
-                           total_estimated_cost FLOAT,
-                           total_items_from_inventory INT,
-                           total_items_to_purchase INT,
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           FOREIGN KEY (plan_id) REFERENCES meal_plans(plan_id),
-                           FOREIGN KEY (user_id) REFERENCES users(user_id)
-                       )
-                       """)
-
-        # Conversation Threads for Memory System
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS conversation_threads
-                       (
-                           thread_id VARCHAR(50) PRIMARY KEY,
-                           user_id VARCHAR(50) NOT NULL,
-                           title VARCHAR(255),
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           last_message_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           message_count INT DEFAULT 0,
-                           is_active BOOLEAN DEFAULT TRUE,
-                           summary TEXT,
-                           FOREIGN KEY (user_id) REFERENCES users(user_id)
-                       )
-                       """)
-
-        # Thread Messages
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS thread_messages
-                       (
-                           message_id VARCHAR(50) PRIMARY KEY,
-                           thread_id VARCHAR(50) NOT NULL,
-                           role VARCHAR(20) NOT NULL,
-                           content TEXT NOT NULL,
-                           timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           metadata VARIANT,
-                           FOREIGN KEY (thread_id) REFERENCES conversation_threads(thread_id)
-                       )
-                       """)
-
-        # Thread Checkpoints for LangGraph
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS thread_checkpoints
-                       (
-                           checkpoint_id VARCHAR(50) PRIMARY KEY,
-                           thread_id VARCHAR(50) NOT NULL,
-                           checkpoint_data VARIANT,
-                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           FOREIGN KEY (thread_id) REFERENCES conversation_threads(thread_id)
-                       )
-                       """)
-
-        # User Feedback (Likes/Dislikes)
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS user_feedback
-                       (
-                           feedback_id VARCHAR(50) PRIMARY KEY,
-                           user_id VARCHAR(50) NOT NULL,
-                           feedback_type VARCHAR(50),
-                           entity_type VARCHAR(50),
-                           entity_id VARCHAR(50),
-                           entity_name VARCHAR(255),
-                           sentiment VARCHAR(20),
-                           intensity INT,
-                           context TEXT,
-                           extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           source VARCHAR(50),
-                           FOREIGN KEY (user_id) REFERENCES users(user_id)
-                       )
-                       """)
-
-        # User Preferences (Long-term Memory)
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS user_preferences
-                       (
-                           preference_id VARCHAR(50) PRIMARY KEY,
-                           user_id VARCHAR(50) NOT NULL,
-                           preference_type VARCHAR(50),
-                           preference_key VARCHAR(255),
-                           preference_value TEXT,
-                           confidence_score FLOAT,
-                           frequency INT DEFAULT 1,
-                           last_mentioned TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
-                           expires_at TIMESTAMP,
-                           is_active BOOLEAN DEFAULT TRUE,
-                           FOREIGN KEY (user_id) REFERENCES users(user_id)
-                       )
-                       """)
-
-        conn.commit()
+        # All CREATEs (and clustering keys) go to Snowflake as one multi-statement
+        # request. DDL commits implicitly, so there is no separate commit round-trip.
+        statements = list(_TABLE_DDL.values()) + [
+            f"ALTER TABLE {table} CLUSTER BY {key}" for table, key in _CLUSTERING_KEYS.items()
+        ]
+        cursor.execute(";\n".join(statements), num_statements=len(statements))
         
-        # Migration: Add preferred_cuisines if not exists
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN preferred_cuisines TEXT")
-            conn.commit()
-        except:
-            pass # Column likely exists
+        _migrate_columns(conn, _existing_columns(conn))
+        return True
 
     except Exception as e:
         st.error(f"Error creating tables: {e}")
+        return False
     finally:
         cursor.close()
 
 
+def ensure_schema(conn):
+    """Create missing tables/columns, checking information_schema once per process"""
+    global _SCHEMA_VERIFIED
+    if _SCHEMA_VERIFIED:
+        return
+    
+    try:
+        existing_columns = _existing_columns(conn)
+    except Exception as e:
+        print(f"Schema check failed, creating tables: {e}")
+        existing_columns = set()
+    
+    existing_tables = {table for table, _ in existing_columns}
+    if not existing_tables.issuperset(_TABLE_DDL):
+        _SCHEMA_VERIFIED = create_tables(conn)
+        return
+    
+    try:
+        _migrate_columns(conn, existing_columns)
+        _SCHEMA_VERIFIED = True
+    except Exception as e:
+        st.error(f"Error migrating tables: {e}")
+
+
+# Keep idle sessions alive between user interactions instead of re-authenticating,
+# and fail fast rather than hang the UI on a bad network
+_SESSION_PARAMS = {
+    "client_session_keep_alive": True,
+    "client_session_keep_alive_heartbeat_frequency": 900,
+    "network_timeout": 60,
+    "login_timeout": 20,
+    # Tagged at login (no extra ALTER SESSION round-trip) so app queries can be
+    # picked out in QUERY_HISTORY when checking result-cache reuse
+    "session_parameters": {"QUERY_TAG": "meal_mind_streamlit"},
+}
+
+
+def _connect():
+    """Open a new Snowflake connection"""
+    return snowflake.connector.connect(
+        user=os.getenv('SNOWFLAKE_USER'),
+        account=os.getenv('SNOWFLAKE_ACCOUNT'),
+        password=os.getenv('SNOWFLAKE_PASSWORD'),
+        warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
+        database=os.getenv('SNOWFLAKE_DATABASE'),
+        schema=os.getenv('SNOWFLAKE_SCHEMA'),
+        **_SESSION_PARAMS
+    )
+
+
+# ==================== CONNECTION POOL ====================
+# Read helpers borrow from a small pool so concurrent sessions/threads don't
+# queue up behind one connection. Connections are opened lazily.
+_POOL_SIZE = int(os.getenv('SNOWFLAKE_POOL_SIZE', '8'))
+_pool = queue.LifoQueue(maxsize=_POOL_SIZE)
+_pool_lock = threading.Lock()
+_pool_opened = 0
+
+
+def _acquire_conn():
+    """Take an idle pooled connection, open a new one, or wait for one to be returned"""
+    global _pool_opened
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+    
+    with _pool_lock:
+        can_open = _pool_opened < _POOL_SIZE
+        if can_open:
+            _pool_opened += 1
+    if not can_open:
+        return _pool.get()
+    
+    try:
+        conn = _connect()
+        ensure_schema(conn)
+        return conn
+    except Exception:
+        with _pool_lock:
+            _pool_opened -= 1
+        raise
+
+
+@contextmanager
+def get_conn():
+    """Borrow a pooled Snowflake connection for the duration of a with-block"""
+    conn = _acquire_conn()
+    try:
+        if conn.is_closed():
+            conn = _connect()
+        yield conn
+    finally:
+        _pool.put(conn)
+
+
 @st.cache_resource
 def get_snowflake_connection():
     """Get Snowflake connection"""
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv('SNOWFLAKE_USER'),
-            account=os.getenv('SNOWFLAKE_ACCOUNT'),
-            password=os.getenv('SNOWFLAKE_PASSWORD'),
-            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-            database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA')
-        )
-        create_tables(conn)
+        conn = _connect()
+        ensure_schema(conn)
         return conn
     except Exception as e:
         st.error(f"Failed to connect to Snowflake: {e}")
@@ -275,7 +425,8 @@ def get_snowpark_session():
             "warehouse": os.getenv('SNOWFLAKE_WAREHOUSE'),
             "database": os.getenv('SNOWFLAKE_DATABASE'),
             "schema": os.getenv('SNOWFLAKE_SCHEMA'),
-            "role": os.getenv('SNOWFLAKE_ROLE')
+            "role": os.getenv('SNOWFLAKE_ROLE'),
+            **_SESSION_PARAMS
         }
         session = Session.builder.configs(connection_params).create()
         return session
@@ -284,179 +435,217 @@ def get_snowpark_session():
         st.stop()
 
 
+# ==================== READ QUERIES ====================
+# Shared by the single-purpose helpers below and get_meal_plan_bundle
+_PROFILE_SQL = """
+    SELECT username, age, gender, height_cm, weight_kg, bmi, activity_level, 
+           health_goal, dietary_restrictions, food_allergies, daily_calories,
+           daily_protein, daily_carbohydrate, daily_fat, daily_fiber, updated_at
+    FROM users 
+    WHERE user_id = %s
+"""
+
+_PLAN_OVERVIEW_COLUMNS = """
+    SELECT p.plan_id,
+           p.plan_name,
+           p.start_date,
+           p.end_date,
+           p.week_summary,
+           p.created_at,
+           p.status
+    FROM meal_plans p
+"""
+
+_PLAN_OVERVIEW_BY_ID_SQL = _PLAN_OVERVIEW_COLUMNS + """
+    WHERE p.plan_id = %s AND p.user_id = %s
+"""
+
+_ACTIVE_PLAN_OVERVIEW_SQL = _PLAN_OVERVIEW_COLUMNS + """
+    WHERE p.user_id = %s AND p.status = 'ACTIVE'
+    ORDER BY p.created_at DESC
+    LIMIT 1
+"""
+
+_PLAN_HISTORY_SQL = """
+    SELECT plan_id, plan_name, start_date, end_date, status, created_at
+    FROM meal_plans
+    WHERE user_id = %s
+    ORDER BY created_at DESC
+    LIMIT %s
+"""
+
+_FUTURE_PLAN_SQL = """
+    SELECT plan_id, start_date
+    FROM meal_plans
+    WHERE user_id = %s
+    AND start_date > CURRENT_DATE()
+    ORDER BY start_date ASC
+    LIMIT 1
+"""
+
+
+def _plan_overview_from_row(row):
+    """Meal plan overview dict from a _PLAN_OVERVIEW_COLUMNS row"""
+    return {
+        "plan_id": row[0],
+        "plan_name": row[1],
+        "start_date": row[2],
+        "end_date": row[3],
+        "week_summary": _variant(row[4], None),
+        "created_at": row[5],
+        "status": row[6]
+    }
+
+
+def _plan_history_from_rows(rows):
+    """Plan history dicts from _PLAN_HISTORY_SQL rows"""
+    return [
+        {
+            "plan_id": row[0],
+            "plan_name": row[1],
+            "start_date": row[2],
+            "end_date": row[3],
+            "status": row[4],
+            "created_at": row[5]
+        }
+        for row in rows
+    ]
+
+
 @st.cache_data(ttl=600)
-def get_user_profile(_conn, user_id):
+def get_user_profile(user_id):
     """Fetch user profile as a dictionary"""
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT username, age, gender, height_cm, weight_kg, bmi, activity_level, 
-                   health_goal, dietary_restrictions, food_allergies, daily_calories,
-                   daily_protein, daily_carbohydrate, daily_fat, daily_fiber, updated_at
-            FROM users 
-            WHERE user_id = %s
-        """, (user_id,))
-        
-        row = cursor.fetchone()
-        if row:
-            columns = [col[0].lower() for col in cursor.description]
-            return dict(zip(columns, row))
-        return {}
-    except Exception as e:
-        st.error(f"Error fetching profile: {e}")
-        return {}
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(_PROFILE_SQL, (user_id,))
+            
+            row = cursor.fetchone()
+            if row:
+                columns = [col[0].lower() for col in cursor.description]
+                return dict(zip(columns, row))
+            return {}
+        except Exception as e:
+            st.error(f"Error fetching profile: {e}")
+            return {}
+        finally:
+            cursor.close()
 
 
 
 @st.cache_data(ttl=60)
-def get_user_inventory(_conn, user_id):
+def get_user_inventory(user_id):
     """Fetch user inventory as a DataFrame-like string or list"""
-    import pandas as pd
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT item_name, quantity, unit, category
-            FROM inventory
-            WHERE user_id = %s
-            ORDER BY category, item_name
-        """, (user_id,))
-        
-        rows = cursor.fetchall()
-        if rows:
-            df = pd.DataFrame(rows, columns=['Item', 'Qty', 'Unit', 'Category'])
-            return df
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Error fetching inventory: {e}")
-        return pd.DataFrame()
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT item_name AS "Item", quantity AS "Qty", unit AS "Unit", category AS "Category"
+                FROM inventory
+                WHERE user_id = %s
+                ORDER BY category, item_name
+            """, (user_id,))
+            
+            # Built straight from the Arrow result batches, no per-row tuples
+            df = cursor.fetch_pandas_all()
+            if not df.empty:
+                return df
+            return pd.DataFrame()
+        except Exception as e:
+            st.error(f"Error fetching inventory: {e}")
+            return pd.DataFrame()
+        finally:
+            cursor.close()
 
 
 
 @st.cache_data(ttl=60)
-def get_latest_meal_plan(_conn, user_id):
+def get_latest_meal_plan(user_id):
     """Fetch the latest active meal plan"""
-    import json
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT week_summary, plan_name, start_date, end_date
-            FROM meal_plans
-            WHERE user_id = %s AND status = 'ACTIVE'
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (user_id,))
-        
-        row = cursor.fetchone()
-        if row:
-            # week_summary is a VARIANT (JSON)
-            week_summary_json = row[0]
-            if isinstance(week_summary_json, str):
-                try:
-                    week_summary = json.loads(week_summary_json)
-                except:
-                    week_summary = week_summary_json
-            else:
-                week_summary = week_summary_json
-
-            return {
-                "meal_plan": {
-                    "week_summary": week_summary,
-                    "days": "See daily_meals table for details" # Simplified for summary
-                },
-                "plan_name": row[1],
-                "start_date": str(row[2]),
-                "end_date": str(row[3])
-            }
-        return None
-    except Exception as e:
-        st.error(f"Error fetching meal plan: {e}")
-        return None
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT week_summary, plan_name, start_date, end_date
+                FROM meal_plans
+                WHERE user_id = %s AND status = 'ACTIVE'
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (user_id,))
+            
+            row = cursor.fetchone()
+            if row:
+                return {
+                    "meal_plan": {
+                        "week_summary": _variant(row[0], None),
+                        "days": "See daily_meals table for details" # Simplified for summary
+                    },
+                    "plan_name": row[1],
+                    "start_date": str(row[2]),
+                    "end_date": str(row[3])
+                }
+            return None
+        except Exception as e:
+            st.error(f"Error fetching meal plan: {e}")
+            return None
+        finally:
+            cursor.close()
+
+
+_CRITERIA_BASE_SQL = """
+    SELECT 
+        dm.day_number,
+        dm.day_name,
+        dm.meal_date,
+        md.meal_type,
+        md.meal_name,
+        md.ingredients_with_quantities,
+        md.nutrition,
+        md.recipe,
+        md.preparation_time,
+        md.cooking_time
+    FROM daily_meals dm
+    JOIN meal_details md ON dm.meal_id = md.meal_id
+    JOIN meal_plans mp ON dm.plan_id = mp.plan_id
+    WHERE dm.user_id = %s 
+    AND mp.status = 'ACTIVE'
+"""
+# Optional filters, in the order their params are passed
+_CRITERIA_FILTERS = (" AND dm.day_number = %s", " AND dm.meal_date = %s", " AND md.meal_type = %s")
+
+# Full SQL for each (day_number, meal_date, meal_type) present/absent combination
+_CRITERIA_SQL = {
+    shape: _CRITERIA_BASE_SQL
+    + "".join(clause for clause, present in zip(_CRITERIA_FILTERS, shape) if present)
+    + " ORDER BY dm.day_number, md.meal_type"
+    for shape in itertools.product((False, True), repeat=len(_CRITERIA_FILTERS))
+}
 
 
 def get_meals_by_criteria(conn, user_id, day_number=None, meal_type=None, meal_date=None):
     """Retrieve meals based on day and/or meal type from the latest active meal plan"""
-    import json
     try:
         cursor = conn.cursor()
         
-        # Build dynamic query
-        query = """
-            SELECT 
-                dm.day_number,
-                dm.day_name,
-                dm.meal_date,
-                md.meal_type,
-                md.meal_name,
-                md.ingredients_with_quantities,
-                md.nutrition,
-                md.recipe,
-                md.preparation_time,
-                md.cooking_time
-            FROM daily_meals dm
-            JOIN meal_details md ON dm.meal_id = md.meal_id
-            JOIN meal_plans mp ON dm.plan_id = mp.plan_id
-            WHERE dm.user_id = %s 
-            AND mp.status = 'ACTIVE'
-        """
-        
-        params = [user_id]
+        filters = (day_number, meal_date, meal_type)
+        query = _CRITERIA_SQL[tuple(value is not None for value in filters)]
+        params = (user_id,) + tuple(value for value in filters if value is not None)
         
-        if day_number is not None:
-            query += " AND dm.day_number = %s"
-            params.append(day_number)
-            
-        if meal_date is not None:
-            query += " AND dm.meal_date = %s"
-            params.append(meal_date)
-        
-        if meal_type is not None:
-            query += " AND md.meal_type = %s"
-            params.append(meal_type)
-        
-        query += " ORDER BY dm.day_number, md.meal_type"
-        
-        cursor.execute(query, tuple(params))
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         
         meals = []
         for row in rows:
-            # Parse JSON fields
-            ingredients = row[5]
-            if isinstance(ingredients, str):
-                try:
-                    ingredients = json.loads(ingredients)
-                except:
-                    ingredients = []
-            
-            nutrition = row[6]
-            if isinstance(nutrition, str):
-                try:
-                    nutrition = json.loads(nutrition)
-                except:
-                    nutrition = {}
-            
-            recipe = row[7]
-            if isinstance(recipe, str):
-                try:
-                    recipe = json.loads(recipe)
-                except:
-                    recipe = {}
-            
+            # VARIANT columns arrive as JSON text Snowflake has already validated
             meal_data = {
                 'day_number': row[0],
                 'day_name': row[1],
                 'meal_date': str(row[2]) if row[2] else None,
                 'meal_type': row[3],
                 'meal_name': row[4],
-                'ingredients_with_quantities': ingredients,
-                'nutrition': nutrition,
-                'recipe': recipe,
+                'ingredients_with_quantities': _variant(row[5], []),
+                'nutrition': _variant(row[6], {}),
+                'recipe': _variant(row[7], {}),
                 'preparation_time': row[8],
                 'cooking_time': row[9]
             }
@@ -489,7 +678,6 @@ def get_meals_by_date(conn, user_id, meal_date=None, meal_type=None):
     Returns:
         List of meal dictionaries with full details
     """
-    import json
     cursor = conn.cursor()
     try:
         query = """
@@ -534,9 +722,9 @@ def get_meals_by_date(conn, user_id, meal_date=None, meal_type=None):
             meal = {
                 'meal_type': row[0],
                 'meal_name': row[1],
-                'ingredients': json.loads(row[2]) if row[2] else [],
-                'recipe': json.loads(row[3]) if row[3] else {},
-                'nutrition': json.loads(row[4]) if row[4] else {},
+                'ingredients': _variant(row[2], []),
+                'recipe': _variant(row[3], {}),
+                'nutrition': _variant(row[4], {}),
                 'preparation_time': row[5],
                 'cooking_time': row[6],
                 'servings': row[7],
@@ -557,47 +745,38 @@ def get_meals_by_date(conn, user_id, meal_date=None, meal_type=None):
 
 def search_meals_by_ingredient(conn, user_id, ingredient_name):
     """Search for meals containing a specific ingredient"""
-    import json
     try:
         cursor = conn.cursor()
         
+        # Match inside the ingredients VARIANT server-side; one row per meal
+        # (its first matching ingredient), so only matches come back
         query = """
             SELECT 
                 dm.day_name,
                 md.meal_type,
                 md.meal_name,
-                md.ingredients_with_quantities
+                f.value:ingredient::STRING AS matching_ingredient
             FROM daily_meals dm
             JOIN meal_details md ON dm.meal_id = md.meal_id
-            JOIN meal_plans mp ON dm.plan_id = mp.plan_id
+            JOIN meal_plans mp ON dm.plan_id = mp.plan_id,
+            LATERAL FLATTEN(input => md.ingredients_with_quantities) f
             WHERE dm.user_id = %s 
             AND mp.status = 'ACTIVE'
+            AND CONTAINS(LOWER(f.value:ingredient::STRING), %s)
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY md.detail_id ORDER BY f.index) = 1
         """
         
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall()
-        
-        matching_meals = []
-        for row in rows:
-            ingredients = row[3]
-            if isinstance(ingredients, str):
-                try:
-                    ingredients = json.loads(ingredients)
-                except:
-                    ingredients = []
-            
-            # Check if ingredient is in this meal
-            for ing in ingredients:
-                if ingredient_name.lower() in ing.get('ingredient', '').lower():
-                    matching_meals.append({
-                        'day_name': row[0],
-                        'meal_type': row[1],
-                        'meal_name': row[2],
-                        'matching_ingredient': ing.get('ingredient')
-                    })
-                    break
+        cursor.execute(query, (user_id, ingredient_name.lower()))
         
-        return matching_meals
+        return [
+            {
+                'day_name': row[0],
+                'meal_type': row[1],
+                'meal_name': row[2],
+                'matching_ingredient': row[3]
+            }
+            for row in cursor.fetchall()
+        ]
     
     except Exception as e:
         st.error(f"Error searching meals by ingredient: {e}")
@@ -641,9 +820,22 @@ def get_meal_detail_id(conn, daily_meal_id, meal_type):
     finally:
         cursor.close()
 
+def _meal_detail_from_row(row):
+    """Meal detail dict from (meal_name, ingredients, recipe, nutrition, prep, cook, servings, difficulty)"""
+    return {
+        'meal_name': row[0],
+        'ingredients_with_quantities': _variant(row[1], []),
+        'recipe': _variant(row[2], {}),
+        'nutrition': _variant(row[3], {}),
+        'preparation_time': row[4],
+        'cooking_time': row[5],
+        'servings': row[6],
+        'difficulty_level': row[7]
+    }
+
+
 def get_meal_detail_by_id(conn, detail_id):
     """Get full meal details by detail_id"""
-    import json
     cursor = conn.cursor()
     try:
         cursor.execute("""
@@ -662,16 +854,7 @@ def get_meal_detail_by_id(conn, detail_id):
         row = cursor.fetchone()
         
         if row:
-            return {
-                'meal_name': row[0],
-                'ingredients_with_quantities': json.loads(row[1]) if row[1] else [],
-                'recipe': json.loads(row[2]) if row[2] else {},
-                'nutrition': json.loads(row[3]) if row[3] else {},
-                'preparation_time': row[4],
-                'cooking_time': row[5],
-                'servings': row[6],
-                'difficulty_level': row[7]
-            }
+            return _meal_detail_from_row(row)
         return None
     except Exception as e:
         st.error(f"Error fetching meal detail: {e}")
@@ -680,9 +863,54 @@ def get_meal_detail_by_id(conn, detail_id):
         cursor.close()
 
 
+def get_meal_detail_by_date_and_type(conn, user_id, date, meal_type):
+    """
+    Look up a day's meal of one type in a single query (instead of
+    get_daily_meal_id -> get_meal_detail_id -> get_meal_detail_by_id).
+    
+    Returns:
+        None if the user has no daily record for the date, otherwise
+        {'daily_meal_id', 'detail_id', 'meal'} where detail_id/meal are None
+        when that day has no meal of this type
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT 
+                dm.meal_id,
+                md.detail_id,
+                md.meal_name,
+                md.ingredients_with_quantities,
+                md.recipe,
+                md.nutrition,
+                md.preparation_time,
+                md.cooking_time,
+                md.servings,
+                md.difficulty_level
+            FROM daily_meals dm
+            LEFT JOIN meal_details md ON md.meal_id = dm.meal_id AND md.meal_type = %s
+            WHERE dm.user_id = %s AND dm.meal_date = %s
+            ORDER BY md.detail_id IS NULL
+            LIMIT 1
+        """, (meal_type, user_id, date))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        return {
+            'daily_meal_id': row[0],
+            'detail_id': row[1],
+            'meal': _meal_detail_from_row(row[2:]) if row[1] else None
+        }
+    except Exception as e:
+        st.error(f"Error fetching meal detail: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
 def update_meal_detail(conn, detail_id, meal_data):
     """Update a specific meal's details (recipe, nutrition, etc.)"""
-    import json
     cursor = conn.cursor()
     try:
         cursor.execute("""
@@ -698,9 +926,9 @@ def update_meal_detail(conn, detail_id, meal_data):
             WHERE detail_id = %s
         """, (
             meal_data.get('meal_name'),
-            json.dumps(meal_data.get('ingredients_with_quantities', [])),
-            json.dumps(meal_data.get('recipe', {})),
-            json.dumps(meal_data.get('nutrition', {})),
+            _dumps(meal_data.get('ingredients_with_quantities', [])),
+            _dumps(meal_data.get('recipe', {})),
+            _dumps(meal_data.get('nutrition', {})),
             meal_data.get('preparation_time', 0),
             meal_data.get('cooking_time', 0),
             meal_data.get('servings', 1),
@@ -713,7 +941,7 @@ def update_meal_detail(conn, detail_id, meal_data):
             print(f"WARNING: update_meal_detail updated 0 rows for detail_id {detail_id}")
             return False
             
-        conn.commit()
+        # Connections run with autocommit on (the connector default)
         return True
     except Exception as e:
         st.error(f"Error updating meal detail: {e}")
@@ -722,268 +950,248 @@ def update_meal_detail(conn, detail_id, meal_data):
         cursor.close()
 
 
-def get_all_meal_details_for_day(conn, daily_meal_id):
-    """Get all meal details for a specific day to recalculate totals"""
-    import json
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT nutrition 
-            FROM meal_details 
-            WHERE meal_id = %s
-        """, (daily_meal_id,))
-        rows = cursor.fetchall()
-        
-        meals_nutrition = []
-        for row in rows:
-            if row[0]:
-                try:
-                    meals_nutrition.append(json.loads(row[0]) if isinstance(row[0], str) else row[0])
-                except:
-                    pass
-        return meals_nutrition
-    except Exception as e:
-        st.error(f"Error fetching daily meals for recalculation: {e}")
-        return []
-    finally:
-        cursor.close()
+# Daily totals are the sum of each meal's nutrition, rounded to 0.1
+_DAILY_NUTRITION_KEYS = ("calories", "protein_g", "carbohydrates_g", "fat_g", "fiber_g")
 
 
-def update_daily_nutrition(conn, daily_meal_id, total_nutrition):
-    """Update the total nutrition for a day"""
-    import json
+def recalculate_daily_nutrition(conn, daily_meal_id):
+    """
+    Recompute a day's total_nutrition from its meal_details in Snowflake.
+    
+    The sum and the write happen in one UPDATE; the new totals are read back in
+    the same request. Returns the totals dict, or None on failure.
+    """
+    totals = ",\n".join(
+        f"'{key}', ROUND(COALESCE(SUM(md.nutrition:{key}::FLOAT), 0), 1)"
+        for key in _DAILY_NUTRITION_KEYS
+    )
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            UPDATE daily_meals 
-            SET total_nutrition = PARSE_JSON(%s)
-            WHERE meal_id = %s
-        """, (json.dumps(total_nutrition), daily_meal_id))
-        conn.commit()
-        return True
+        cursor.execute(f"""
+            UPDATE daily_meals
+            SET total_nutrition = (
+                SELECT OBJECT_CONSTRUCT({totals})
+                FROM meal_details md
+                WHERE md.meal_id = %s
+            )
+            WHERE meal_id = %s;
+            SELECT total_nutrition FROM daily_meals WHERE meal_id = %s
+        """, (daily_meal_id, daily_meal_id, daily_meal_id), num_statements=2)
+        
+        cursor.nextset()
+        row = cursor.fetchone()
+        return _variant(row[0], None) if row else None
     except Exception as e:
         st.error(f"Error updating daily nutrition: {e}")
-        return False
+        return None
     finally:
         cursor.close()
-@st.cache_data(ttl=600)
-def get_dashboard_stats(_conn, user_id):
-    """Fetch dashboard stats efficiently"""
-    return get_user_profile(_conn, user_id)
+
 
 @st.cache_data(ttl=600)
-def get_meal_plan_overview(_conn, user_id, specific_plan_id=None):
+def get_meal_plan_overview(user_id, specific_plan_id=None):
     """Fetch active meal plan overview"""
-    import json
-    try:
-        cursor = _conn.cursor()
-        
-        if specific_plan_id:
-            cursor.execute("""
-                SELECT p.plan_id,
-                       p.plan_name,
-                       p.start_date,
-                       p.end_date,
-                       p.week_summary,
-                       p.created_at,
-                       p.status
-                FROM meal_plans p
-                WHERE p.plan_id = %s AND p.user_id = %s
-            """, (specific_plan_id, user_id))
-        else:
-            cursor.execute("""
-                       p.week_summary,
-                       p.created_at,
-                       p.status
-                FROM meal_plans p
-                WHERE p.user_id = %s AND p.status = 'ACTIVE'
-                ORDER BY p.created_at DESC
-                LIMIT 1
-            """, (user_id,))
-        
-        row = cursor.fetchone()
-        if row:
-            # week_summary is a VARIANT (JSON)
-            week_summary_json = row[4]
-            if isinstance(week_summary_json, str):
-                try:
-                    week_summary = json.loads(week_summary_json)
-                except:
-                    week_summary = week_summary_json
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            
+            if specific_plan_id:
+                cursor.execute(_PLAN_OVERVIEW_BY_ID_SQL, (specific_plan_id, user_id))
             else:
-                week_summary = week_summary_json
-
-            return {
-                "plan_id": row[0],
-                "plan_name": row[1],
-                "start_date": row[2],
-                "end_date": row[3],
-                "week_summary": week_summary,
-                "created_at": row[5],
-                "status": row[6]
-            }
-        return None
-    except Exception as e:
-        st.error(f"Error fetching meal plan: {e}")
-        return None
-    finally:
-        cursor.close()
+                cursor.execute(_ACTIVE_PLAN_OVERVIEW_SQL, (user_id,))
+            
+            row = cursor.fetchone()
+            if row:
+                return _plan_overview_from_row(row)
+            return None
+        except Exception as e:
+            st.error(f"Error fetching meal plan: {e}")
+            return None
+        finally:
+            cursor.close()
 
 
 @st.cache_data(ttl=60)
-def get_meal_plan_history(_conn, user_id, limit=5):
+def get_meal_plan_history(user_id, limit=5):
     """Fetch recent meal plans for history selection"""
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT plan_id, plan_name, start_date, end_date, status, created_at
-            FROM meal_plans
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT %s
-        """, (user_id, limit))
-        
-        plans = []
-        for row in cursor.fetchall():
-            plans.append({
-                "plan_id": row[0],
-                "plan_name": row[1],
-                "start_date": row[2],
-                "end_date": row[3],
-                "status": row[4],
-                "created_at": row[5]
-            })
-        return plans
-    except Exception as e:
-        st.error(f"Error fetching plan history: {e}")
-        return []
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(_PLAN_HISTORY_SQL, (user_id, limit))
+            return _plan_history_from_rows(cursor.fetchall())
+        except Exception as e:
+            st.error(f"Error fetching plan history: {e}")
+            return []
+        finally:
+            cursor.close()
 
 
-def get_future_meal_plan(_conn, user_id):
+def get_future_meal_plan(user_id):
     """Check if a future meal plan exists"""
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT plan_id, start_date
-            FROM meal_plans
-            WHERE user_id = %s
-            AND start_date > CURRENT_DATE()
-            ORDER BY start_date ASC
-            LIMIT 1
-        """, (user_id,))
-        row = cursor.fetchone()
-        if row:
-            return {'plan_id': row[0], 'start_date': row[1]}
-        return None
-    except Exception as e:
-        return None
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(_FUTURE_PLAN_SQL, (user_id,))
+            row = cursor.fetchone()
+            if row:
+                return {'plan_id': row[0], 'start_date': row[1]}
+            return None
+        except Exception as e:
+            return None
+        finally:
+            cursor.close()
+
+@st.cache_data(ttl=60)
+def get_meal_plan_bundle(user_id, history_limit=5):
+    """
+    Fetch everything the meal plan page needs up front in one multi-statement request:
+    profile, plan history, next future plan and the active plan overview.
+    """
+    bundle = {"profile": {}, "history": [], "future_plan": None, "active_plan": None}
+    statements = (
+        (_PROFILE_SQL, (user_id,)),
+        (_PLAN_HISTORY_SQL, (user_id, history_limit)),
+        (_FUTURE_PLAN_SQL, (user_id,)),
+        (_ACTIVE_PLAN_OVERVIEW_SQL, (user_id,)),
+    )
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                ";\n".join(sql for sql, _ in statements),
+                tuple(param for _, params in statements for param in params),
+                num_statements=len(statements)
+            )
+            
+            row = cursor.fetchone()
+            if row:
+                columns = [col[0].lower() for col in cursor.description]
+                bundle["profile"] = dict(zip(columns, row))
+            
+            cursor.nextset()
+            bundle["history"] = _plan_history_from_rows(cursor.fetchall())
+            
+            cursor.nextset()
+            row = cursor.fetchone()
+            if row:
+                bundle["future_plan"] = {'plan_id': row[0], 'start_date': row[1]}
+            
+            cursor.nextset()
+            row = cursor.fetchone()
+            if row:
+                bundle["active_plan"] = _plan_overview_from_row(row)
+            return bundle
+        except Exception as e:
+            st.error(f"Error fetching meal plan data: {e}")
+            return bundle
+        finally:
+            cursor.close()
 
 @st.cache_data(ttl=600)
-def get_daily_meals_for_plan(_conn, plan_id):
+def get_daily_meals_for_plan(plan_id):
     """Fetch daily meals for a specific plan"""
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT meal_id,
-                   day_number,
-                   day_name,
-                   meal_date,
-                   total_nutrition,
-                   inventory_impact
-            FROM daily_meals
-            WHERE plan_id = %s
-            ORDER BY day_number
-        """, (plan_id,))
-        
-        rows = cursor.fetchall()
-        if rows:
-            columns = [col[0].lower() for col in cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
-        return []
-    except Exception as e:
-        st.error(f"Error fetching daily meals: {e}")
-        return []
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT meal_id,
+                       day_number,
+                       day_name,
+                       meal_date,
+                       total_nutrition,
+                       inventory_impact
+                FROM daily_meals
+                WHERE plan_id = %s
+                ORDER BY day_number
+            """, (plan_id,))
+            
+            rows = cursor.fetchall()
+            if rows:
+                columns = [col[0].lower() for col in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+            return []
+        except Exception as e:
+            st.error(f"Error fetching daily meals: {e}")
+            return []
+        finally:
+            cursor.close()
 
 @st.cache_data(ttl=600)
-def get_meal_details_for_day_view(_conn, meal_id):
+def get_meal_details_for_day_view(meal_id):
     """Fetch meal details for a specific day"""
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT meal_type,
-                   meal_name,
-                   ingredients_with_quantities,
-                   recipe,
-                   nutrition,
-                   preparation_time,
-                   cooking_time,
-                   servings,
-                   serving_size,
-                   difficulty_level
-            FROM meal_details
-            WHERE meal_id = %s
-            ORDER BY CASE meal_type
-                         WHEN 'breakfast' THEN 1
-                         WHEN 'lunch' THEN 2
-                         WHEN 'snacks' THEN 3
-                         WHEN 'dinner' THEN 4
-                         END
-        """, (meal_id,))
-        
-        rows = cursor.fetchall()
-        if rows:
-            columns = [col[0].lower() for col in cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
-        return []
-    except Exception as e:
-        st.error(f"Error fetching meal details: {e}")
-        return []
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT meal_type,
+                       meal_name,
+                       ingredients_with_quantities,
+                       recipe,
+                       nutrition,
+                       preparation_time,
+                       cooking_time,
+                       servings,
+                       serving_size,
+                       difficulty_level
+                FROM meal_details
+                WHERE meal_id = %s
+                ORDER BY CASE meal_type
+                             WHEN 'breakfast' THEN 1
+                             WHEN 'lunch' THEN 2
+                             WHEN 'snacks' THEN 3
+                             WHEN 'dinner' THEN 4
+                             END
+            """, (meal_id,))
+            
+            rows = cursor.fetchall()
+            if rows:
+                columns = [col[0].lower() for col in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+            return []
+        except Exception as e:
+            st.error(f"Error fetching meal details: {e}")
+            return []
+        finally:
+            cursor.close()
 
 @st.cache_data(ttl=600)
-def get_weekly_meal_details(_conn, plan_id):
+def get_weekly_meal_details(plan_id):
     """Fetch ALL meal details for a specific plan (optimized for fast day switching)"""
-    try:
-        cursor = _conn.cursor()
-        cursor.execute("""
-            SELECT dm.day_number,
-                   dm.meal_id,
-                   md.meal_type,
-                   md.meal_name,
-                   md.ingredients_with_quantities,
-                   md.recipe,
-                   md.nutrition,
-                   md.preparation_time,
-                   md.cooking_time,
-                   md.servings,
-                   md.serving_size,
-                   md.difficulty_level
-            FROM daily_meals dm
-            JOIN meal_details md ON dm.meal_id = md.meal_id
-            WHERE dm.plan_id = %s
-            ORDER BY dm.day_number, 
-                     CASE md.meal_type
-                         WHEN 'breakfast' THEN 1
-                         WHEN 'lunch' THEN 2
-                         WHEN 'snacks' THEN 3
-                         WHEN 'dinner' THEN 4
-                     END
-        """, (plan_id,))
-        
-        rows = cursor.fetchall()
-        if rows:
-            columns = [col[0].lower() for col in cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
-        return []
-    except Exception as e:
-        st.error(f"Error fetching weekly meal details: {e}")
-        return []
-    finally:
-        cursor.close()
+    with get_conn() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT dm.day_number,
+                       dm.meal_id,
+                       md.meal_type,
+                       md.meal_name,
+                       md.ingredients_with_quantities,
+                       md.recipe,
+                       md.nutrition,
+                       md.preparation_time,
+                       md.cooking_time,
+                       md.servings,
+                       md.serving_size,
+                       md.difficulty_level
+                FROM daily_meals dm
+                JOIN meal_details md ON dm.meal_id = md.meal_id
+                WHERE dm.plan_id = %s
+                ORDER BY dm.day_number, 
+                         CASE md.meal_type
+                             WHEN 'breakfast' THEN 1
+                             WHEN 'lunch' THEN 2
+                             WHEN 'snacks' THEN 3
+                             WHEN 'dinner' THEN 4
+                         END
+            """, (plan_id,))
+            
+            rows = cursor.fetchall()
+            if rows:
+                columns = [col[0].lower() for col in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+            return []
+        except Exception as e:
+            st.error(f"Error fetching weekly meal details: {e}")
+            return []
+        finally:
+            cursor.close()
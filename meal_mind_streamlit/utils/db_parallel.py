@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+from utils.db import get_conn, _POOL_SIZE
+
+
+def parallel_reads(tasks: Dict[str, Tuple[Callable, tuple]], max_workers: int = _POOL_SIZE) -> Dict[str, Any]:
+    """
+    Run independent read helpers concurrently.
+    
+    Args:
+        tasks: {name: (fn, args)}; each runs as fn(conn, *args) on its own pooled connection
+        max_workers: Upper bound on concurrent queries (defaults to the pool size)
+    
+    Returns:
+        {name: result} for every task
+    """
+    if not tasks:
+        return {}
+    
+    def run(fn, args):
+        with get_conn() as conn:
+            return fn(conn, *args)
+    
+    with ThreadPoolExecutor(max_workers=min(len(tasks), max_workers)) as executor:
+        futures = {name: executor.submit(run, fn, args) for name, (fn, args) in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
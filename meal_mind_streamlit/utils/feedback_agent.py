@@ -1,6 +1,7 @@
 import streamlit as st
 import uuid
 import json
+from itertools import islice
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from langchain_community.chat_models import ChatSnowflakeCortex
@@ -182,6 +183,41 @@ Each preference must have: type, entity, entity_type, and optionally sentiment,
         finally:
             cursor.close()
     
+    @staticmethod
+    def _empty_preferences() -> Dict[str, List]:
+        return {
+            'likes': [],
+            'dislikes': [],
+            'cuisines': [],
+            'dietary': [],
+            'temporal': [],
+            'other': []
+        }
+    
+    @staticmethod
+    def _add_preference(preferences: Dict[str, List], pref_type, key, value, confidence, freq, last_mentioned):
+        """File one user_preferences row under its bucket"""
+        pref_data = {
+            'name': key,
+            'type': value,
+            'confidence': confidence,
+            'frequency': freq,
+            'last_mentioned': last_mentioned
+        }
+        
+        if pref_type == 'like':
+            preferences['likes'].append(pref_data)
+        elif pref_type == 'dislike':
+            preferences['dislikes'].append(pref_data)
+        elif pref_type == 'temporal_preference' and value == 'cuisine':
+            preferences['cuisines'].append(pref_data)
+        elif 'dietary' in pref_type:
+            preferences['dietary'].append(pref_data)
+        elif 'temporal' in pref_type:
+            preferences['temporal'].append(pref_data)
+        else:
+            preferences['other'].append(pref_data)
+    
     def get_user_preferences(self, user_id: str) -> Dict[str, List]:
         """Retrieve all active user preferences (long-term memory)"""
         
@@ -197,40 +233,10 @@ Each preference must have: type, entity, entity_type, and optionally sentiment,
                 ORDER BY frequency DESC, last_mentioned DESC
             """, (user_id,))
             
-            rows = cursor.fetchall()
-            
             # Organize by type
-            preferences = {
-                'likes': [],
-                'dislikes': [],
-                'cuisines': [],
-                'dietary': [],
-                'temporal': [],
-                'other': []
-            }
-            
-            for row in rows:
-                pref_type, key, value, confidence, freq, last_mentioned = row
-                pref_data = {
-                    'name': key,
-                    'type': value,
-                    'confidence': confidence,
-                    'frequency': freq,
-                    'last_mentioned': last_mentioned
-                }
-                
-                if pref_type == 'like':
-                    preferences['likes'].append(pref_data)
-                elif pref_type == 'dislike':
-                    preferences['dislikes'].append(pref_data)
-                elif pref_type == 'temporal_preference' and value == 'cuisine':
-                    preferences['cuisines'].append(pref_data)
-                elif 'dietary' in pref_type:
-                    preferences['dietary'].append(pref_data)
-                elif 'temporal' in pref_type:
-                    preferences['temporal'].append(pref_data)
-                else:
-                    preferences['other'].append(pref_data)
+            preferences = self._empty_preferences()
+            for row in cursor.fetchall():
+                self._add_preference(preferences, *row)
             
             return preferences
             
@@ -240,21 +246,51 @@ Each preference must have: type, entity, entity_type, and optionally sentiment,
         finally:
             cursor.close()
     
+    def get_user_preferences_bulk(self, user_ids: List[str]) -> Dict[str, Dict[str, List]]:
+        """get_user_preferences for many users in one query, keyed by user_id"""
+        if not user_ids:
+            return {}
+        
+        cursor = self.conn.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(user_ids))
+            cursor.execute(f"""
+                SELECT user_id, preference_type, preference_key, preference_value, 
+                       confidence_score, frequency, last_mentioned
+                FROM user_preferences
+                WHERE user_id IN ({placeholders})
+                AND is_active = TRUE
+                AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP())
+                ORDER BY frequency DESC, last_mentioned DESC
+            """, tuple(user_ids))
+            
+            preferences_by_uid = {user_id: self._empty_preferences() for user_id in user_ids}
+            for row in cursor.fetchall():
+                self._add_preference(preferences_by_uid[row[0]], *row[1:])
+            
+            return preferences_by_uid
+            
+        except Exception as e:
+            print(f"Error fetching preferences: {e}")
+            return {}
+        finally:
+            cursor.close()
+    
     def format_preferences_for_prompt(self, preferences: Dict) -> str:
         """Format preferences for inclusion in LLM prompt"""
         
         prompt = ""
         
         if preferences.get('likes'):
-            likes = [p['name'] for p in preferences['likes'][:5]]
+            likes = [p['name'] for p in islice(preferences['likes'], 5)]
             prompt += f"User Likes: {', '.join(likes)}\n"
         
         if preferences.get('dislikes'):
-            dislikes = [p['name'] for p in preferences['dislikes'][:5]]
+            dislikes = [p['name'] for p in islice(preferences['dislikes'], 5)]
             prompt += f"User Dislikes (AVOID): {', '.join(dislikes)}\n"
         
         if preferences.get('cuisines'):
-            cuisines = [p['name'] for p in preferences['cuisines'][:3]]
+            cuisines = [p['name'] for p in islice(preferences['cuisines'], 3)]
             prompt += f"Preferred Cuisines: {', '.join(cuisines)}\n"
         
         if preferences.get('dietary'):
@@ -1,35 +1,24 @@
 import streamlit as st
 import json
 import uuid
+import functools
 import pandas as pd
 from datetime import datetime, timedelta
-from utils.agent import MealPlanAgentWithExtraction, MealPlanState
+from utils.agent import get_meal_plan_agent, MealPlanState, canonicalize_profile
 from utils.db import get_snowpark_session
 
-def generate_comprehensive_meal_plan_prompt(user_profile, inventory_df, start_day=1, num_days=7, previous_plan_context=None, start_date_obj=None):
-    """Generate comprehensive prompt for the agent"""
+try:
+    import orjson
 
-    inventory_by_category = {}
-    if not inventory_df.empty:
-        for _, item in inventory_df.iterrows():
-            category = item['category'] or 'Other'
-            if category not in inventory_by_category:
-                inventory_by_category[category] = []
-            inventory_by_category[category].append({
-                'item': item['item_name'],
-                'quantity': item['quantity'],
-                'unit': item['unit']
-            })
+    def _dumps_indented(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:  # stdlib fallback - compact output also means fewer prompt tokens
+    def _dumps_indented(obj) -> str:
+        return json.dumps(obj, separators=(',', ':'))
 
-    # Calculate dates for the prompt
-    base_date = start_date_obj if start_date_obj else datetime.now().date()
-    start_date = base_date + timedelta(days=start_day-1)
-    end_date = start_date + timedelta(days=num_days-1)
-    
-    # Context section if provided
-    context_section = ""
-    if previous_plan_context:
-        context_section = f"""
+# Static meal plan prompt scaffold, parsed once; generate_comprehensive_meal_plan_prompt
+# only fills in the per-user fields
+_PREVIOUS_PLAN_CONTEXT_TEMPLATE = """
 CONTEXT FROM PREVIOUS DAYS (ALREADY PLANNED):
 {previous_plan_context}
 IMPORTANT: 
@@ -37,45 +26,45 @@ IMPORTANT:
 - Note the inventory items already used above; ensure we don't exceed available quantities if possible.
 """
 
-    prompt = f"""Generate a detailed meal plan for {num_days} days, from Day {start_day} to Day {start_day + num_days - 1}.
+_MEAL_PLAN_PROMPT_TEMPLATE = """Generate a detailed meal plan for {num_days} days, from Day {start_day} to Day {end_day}.
 
-IMPORTANT: The plan starts on {start_date.strftime('%A, %B %d, %Y')} (Day {start_day}) and ends on {end_date.strftime('%A, %B %d, %Y')}.
+IMPORTANT: The plan starts on {start_date_long} (Day {start_day}) and ends on {end_date_long}.
 Ensure day names match these actual calendar dates.
 {context_section}
 USER PROFILE:
-- User ID: {user_profile['user_id']}
-- Age: {user_profile['age']} years
-- Gender: {user_profile['gender']}
-- Height: {user_profile['height_cm']} cm
-- Weight: {user_profile['weight_kg']} kg
-- BMI: {user_profile['bmi']:.1f}
-- Activity Level: {user_profile['activity_level']}
-- Health Goal: {user_profile['health_goal']}
-- Dietary Restrictions: {user_profile['dietary_restrictions']}
-- Food Allergies: {user_profile['food_allergies']}
-- Preferred Cuisines: {user_profile.get('preferred_cuisines', 'Any')}
+- User ID: {user_id}
+- Age: {age} years
+- Gender: {gender}
+- Height: {height_cm} cm
+- Weight: {weight_kg} kg
+- BMI: {bmi:.1f}
+- Activity Level: {activity_level}
+- Health Goal: {health_goal}
+- Dietary Restrictions: {dietary_restrictions}
+- Food Allergies: {food_allergies}
+- Preferred Cuisines: {preferred_cuisines}
 
 DAILY NUTRITIONAL TARGETS:
-- Calories: {user_profile['daily_calories']} kcal
-- Protein: {user_profile['daily_protein']:.1f}g
-- Carbohydrates: {user_profile['daily_carbohydrate']:.1f}g
-- Fat: {user_profile['daily_fat']:.1f}g
-- Fiber: {user_profile['daily_fiber']:.1f}g
+- Calories: {daily_calories} kcal
+- Protein: {daily_protein:.1f}g
+- Carbohydrates: {daily_carbohydrate:.1f}g
+- Fat: {daily_fat:.1f}g
+- Fiber: {daily_fiber:.1f}g
 
 CURRENT INVENTORY:
-{json.dumps(inventory_by_category, indent=2)}
+{inventory_json}
 
 Create a detailed meal plan for these {num_days} days with complete recipes and inventory optimization.
 Generate plans based ONLY on available inventory where possible.
 If a critical item (like protein source) is missing from inventory, explicitly mention it as a REQUIRED PURCHASE.
 Strictly follow dietary restrictions and allergies.
-Prioritize recipes from the user's preferred cuisines ({user_profile.get('preferred_cuisines', 'Any')}) where possible.
+Prioritize recipes from the user's preferred cuisines ({preferred_cuisines}) where possible.
 
 Return the meal plan in valid JSON format with this EXACT structure:
 {{
   "user_summary": {{
-    "user_id": "{user_profile['user_id']}",
-    "health_goal": "{user_profile['health_goal']}",
+    "user_id": "{user_id}",
+    "health_goal": "{health_goal}",
     ...
   }},
   "meal_plan": {{
@@ -87,7 +76,7 @@ Return the meal plan in valid JSON format with this EXACT structure:
     "days": [
       {{
         "day": {start_day},
-        "day_name": "{start_date.strftime('%A')}",
+        "day_name": "{start_day_name}",
         "total_nutrition": {{ "calories": 0, "protein_g": 0, "carbohydrates_g": 0, "fat_g": 0, "fiber_g": 0 }},
         "inventory_impact": {{ "items_used": 0, "new_purchases_needed": 0 }},
         "meals": {{
@@ -116,9 +105,54 @@ Return the meal plan in valid JSON format with this EXACT structure:
 }}
 """
 
-    return prompt
 
-    return prompt
+@functools.lru_cache(maxsize=64)
+def _date_labels(day):
+    """('Monday, January 05, 2026', 'Monday') - most users in a batch share plan dates"""
+    return day.strftime('%A, %B %d, %Y'), day.strftime('%A')
+
+
+def generate_comprehensive_meal_plan_prompt(user_profile, inventory_df, start_day=1, num_days=7, previous_plan_context=None, start_date_obj=None):
+    """Generate comprehensive prompt for the agent"""
+    user_profile = canonicalize_profile(user_profile)
+
+    inventory_by_category = {}
+    if not inventory_df.empty:
+        for _, item in inventory_df.iterrows():
+            category = item['category'] or 'Other'
+            if category not in inventory_by_category:
+                inventory_by_category[category] = []
+            inventory_by_category[category].append({
+                'item': item['item_name'],
+                'quantity': item['quantity'],
+                'unit': item['unit']
+            })
+
+    # Calculate dates for the prompt
+    base_date = start_date_obj if start_date_obj else datetime.now().date()
+    start_date = base_date + timedelta(days=start_day-1)
+    end_date = start_date + timedelta(days=num_days-1)
+    
+    # Context section if provided
+    context_section = ""
+    if previous_plan_context:
+        context_section = _PREVIOUS_PLAN_CONTEXT_TEMPLATE.format(previous_plan_context=previous_plan_context)
+
+    start_date_long, start_day_name = _date_labels(start_date)
+    end_date_long, _ = _date_labels(end_date)
+
+    fields = {'preferred_cuisines': 'Any', **user_profile}
+    fields.update(
+        num_days=num_days,
+        start_day=start_day,
+        end_day=start_day + num_days - 1,
+        start_date_long=start_date_long,
+        end_date_long=end_date_long,
+        start_day_name=start_day_name,
+        context_section=context_section,
+        inventory_json=_dumps_indented(inventory_by_category),
+    )
+    return _MEAL_PLAN_PROMPT_TEMPLATE.format_map(fields)
 
 
 def save_meal_plan(conn, user_id, schedule_id, meal_plan_data, start_date=None):
@@ -131,6 +165,10 @@ def save_meal_plan(conn, user_id, schedule_id, meal_plan_data, start_date=None):
         start_date = datetime.now().date()
 
     try:
+        # Connections run with autocommit on, so open an explicit transaction:
+        # a failed save must not leave a partial plan behind for a retry to duplicate
+        cursor.execute("BEGIN")
+
         # Save main meal plan
         cursor.execute("""
                        INSERT INTO meal_plans (plan_id, user_id, schedule_id, plan_name,
@@ -222,6 +260,10 @@ def save_meal_plan(conn, user_id, schedule_id, meal_plan_data, start_date=None):
         cursor.close()
         return plan_id
     except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
         cursor.close()
         st.error(f"Error saving meal plan: {e}")
         return None
@@ -359,7 +401,7 @@ def generate_new_meal_plan(conn, user_id):
 
             # Call agent with LangGraph
             session = get_snowpark_session()
-            agent = MealPlanAgentWithExtraction(session)
+            agent = get_meal_plan_agent(session)
             
             # Initialize state
             initial_state = MealPlanState(
@@ -368,12 +410,12 @@ def generate_new_meal_plan(conn, user_id):
                 prompt=prompt,
                 meal_plan_json=None,
                 suggestions_json=None,
-                error=None
+                error=None,
+                use_cache=False # explicit user request, always ask the agent afresh
             )
             
-            # Build and invoke graph
-            workflow = agent.build_graph()
-            final_state = workflow.invoke(initial_state)
+            # Invoke the agent's compiled graph
+            final_state = agent.app.invoke(initial_state)
             
             meal_plan_data = final_state.get('meal_plan_json')
             suggestions = final_state.get('suggestions_json')
@@ -1,12 +1,18 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+
+REQUEST_TIMEOUT = 10  # seconds
+MAX_POOL_CONNECTIONS = 20
 
 class MealMindMCPClient:
     """
     Client for interacting with the Meal Mind MCP Server running on Snowflake.
     """
-    def __init__(self, account: str, token: str, db: str, schema: str):
+    def __init__(self, account: str, token: str, db: str, schema: str,
+                 http_session: Optional[requests.Session] = None):
         """
         Initialize the MCP Client.
         
@@ -15,6 +21,7 @@ class MealMindMCPClient:
             token: OAuth or Session token
             db: Database name where the MCP server is located
             schema: Schema name where the MCP server is located
+            http_session: Optional requests session to share; one is created if omitted
         """
         self.base_url = f"https://{account}.snowflakecomputing.com"
         self.endpoint = f"/api/v2/databases/{db}/schemas/{schema}/mcp-servers/MEAL_MIND_MCP_SERVER"
@@ -23,6 +30,15 @@ class MealMindMCPClient:
             "Content-Type": "application/json"
         }
         self.request_id = 0
+        # Keep-alive connections are reused across calls, so only the first call
+        # pays for the TCP + TLS handshake
+        if http_session is None:
+            http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_POOL_CONNECTIONS)
+            http_session.mount("https://", adapter)
+        self.http = http_session
+        # None until the first batch request tells us whether JSON-RPC batching works
+        self.batch_supported: Optional[bool] = None
     
     def _call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Make a JSON-RPC call to the MCP server."""
@@ -35,10 +51,11 @@ class MealMindMCPClient:
         }
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}{self.endpoint}",
                 headers=self.headers,
-                json=payload
+                json=payload,
+                timeout=REQUEST_TIMEOUT
             )
             response.raise_for_status()
             return response.json()
@@ -46,6 +63,55 @@ class MealMindMCPClient:
             print(f"MCP Request Failed: {e}")
             return {"error": {"code": -1, "message": str(e)}}
     
+    def _call_batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Send several JSON-RPC calls as one batch request.
+        
+        Returns the responses in call order, or None if the server rejects batches
+        (a 4xx status or a body that isn't a JSON list). Transport errors and 5xx
+        responses come back as one error response per call.
+        """
+        payload = []
+        for method, params in calls:
+            self.request_id += 1
+            payload.append({
+                "jsonrpc": "2.0",
+                "id": self.request_id,
+                "method": method,
+                "params": params
+            })
+        
+        try:
+            response = self.http.post(
+                f"{self.base_url}{self.endpoint}",
+                headers=self.headers,
+                json=payload,
+                timeout=REQUEST_TIMEOUT
+            )
+            if 400 <= response.status_code < 500:
+                print(f"MCP Batch Request Rejected: HTTP {response.status_code}")
+                return None
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"MCP Batch Request Failed: {e}")
+            return [{"error": {"code": -1, "message": str(e)}} for _ in payload]
+        
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        
+        if not isinstance(body, list):
+            return None
+        
+        by_id = {item.get("id"): item for item in body if isinstance(item, dict)}
+        missing = {"error": {"code": -1, "message": "No response for request in batch"}}
+        return [by_id.get(call["id"], missing) for call in payload]
+    
+    def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        self.http.close()
+    
     def initialize(self) -> Dict[str, Any]:
         """Initialize the MCP connection."""
         return self._call("initialize", {"protocolVersion": "2025-06-18"})
@@ -64,13 +130,40 @@ class MealMindMCPClient:
             limit: Number of results to return
             filter_obj: Optional filter object
         """
+        return self._call("tools/call", self._search_params(query, columns, limit, filter_obj))
+    
+    def search_foods_batch(self, queries: List[str], columns: Optional[list] = None, limit: int = 10, filter_obj: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """
+        Call the 'meal-mind-search' tool for several queries at once.
+        
+        Uses a single JSON-RPC batch request when the server supports it, otherwise
+        falls back to concurrent individual calls. Responses are in query order.
+        """
+        calls = [("tools/call", self._search_params(query, columns, limit, filter_obj)) for query in queries]
+        if len(calls) > 1 and self.batch_supported is not False:
+            responses = self._call_batch(calls)
+            if responses is not None:
+                # A transport failure says nothing about batch support, so only a
+                # definitive rejection (None) turns batching off
+                self.batch_supported = True
+                return responses
+            self.batch_supported = False
+        
+        if len(calls) == 1:
+            return [self._call(*calls[0])]
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            return list(executor.map(lambda call: self._call(*call), calls))
+    
+    @staticmethod
+    def _search_params(query: str, columns: Optional[list], limit: int, filter_obj: Optional[Dict]) -> Dict[str, Any]:
+        """JSON-RPC params for a 'meal-mind-search' tools/call."""
         args = {"query": query, "limit": limit}
         if columns:
             args["columns"] = columns
         if filter_obj:
             args["filter"] = filter_obj
             
-        return self._call("tools/call", {
+        return {
             "name": "meal-mind-search",
             "arguments": args
-        })
+        }
@@ -9,12 +9,9 @@ from utils.mcp_client import MealMindMCPClient
 # Suppress the specific warning from ChatSnowflakeCortex about default parameters
 warnings.filterwarnings("ignore", message=".*is not default parameter.*")
 from utils.db import (
-    get_daily_meal_id, 
-    get_meal_detail_id, 
-    get_meal_detail_by_id,
+    get_meal_detail_by_date_and_type,
     update_meal_detail, 
-    get_all_meal_details_for_day, 
-    update_daily_nutrition
+    recalculate_daily_nutrition
 )
 
 class MealAdjustmentAgent:
@@ -121,16 +118,17 @@ class MealAdjustmentAgent:
         if not self.llm:
             return {"status": "error", "message": "Agent offline"}
 
-        # 1. Fetch Current Meal Context FIRST
-        daily_meal_id = get_daily_meal_id(self.conn, user_id, date)
-        if not daily_meal_id:
+        # 1. Fetch Current Meal Context FIRST (day, meal id and details in one query)
+        found = get_meal_detail_by_date_and_type(self.conn, user_id, date, meal_type)
+        if not found:
             return {"status": "error", "message": "No meal plan found for this date."}
         
-        detail_id = get_meal_detail_id(self.conn, daily_meal_id, meal_type)
+        daily_meal_id = found['daily_meal_id']
+        detail_id = found['detail_id']
         if not detail_id:
             return {"status": "error", "message": f"No {meal_type} found for this date."}
             
-        current_meal = get_meal_detail_by_id(self.conn, detail_id)
+        current_meal = found['meal']
         current_meal_context = json.dumps(current_meal, indent=2) if current_meal else "No existing meal data."
 
         # 2. Retrieve Relevant Food Data via MCP
@@ -250,29 +248,8 @@ class MealAdjustmentAgent:
             if not success:
                 return {"status": "error", "message": "Failed to update meal in database."}
             
-            # 3. Recalculate Daily Totals
-            all_meals = get_all_meal_details_for_day(self.conn, daily_meal_id)
-            
-            total_nutrition = {
-                "calories": 0,
-                "protein_g": 0,
-                "carbohydrates_g": 0,
-                "fat_g": 0,
-                "fiber_g": 0
-            }
-            
-            for meal in all_meals:
-                total_nutrition["calories"] += meal.get("calories", 0)
-                total_nutrition["protein_g"] += meal.get("protein_g", 0)
-                total_nutrition["carbohydrates_g"] += meal.get("carbohydrates_g", 0)
-                total_nutrition["fat_g"] += meal.get("fat_g", 0)
-                total_nutrition["fiber_g"] += meal.get("fiber_g", 0)
-            
-            # Round values
-            for k, v in total_nutrition.items():
-                total_nutrition[k] = round(v, 1)
-                
-            update_daily_nutrition(self.conn, daily_meal_id, total_nutrition)
+            # 3. Recalculate Daily Totals (summed and saved in Snowflake)
+            total_nutrition = recalculate_daily_nutrition(self.conn, daily_meal_id)
             
             msg_action = "added to" if meal_data.get('intent') == 'append' else "updated"
             
@@ -4,7 +4,9 @@ Handles automated weekly meal plan generation with intelligent retry logic
 """
 import sys
 import os
-from typing import TypedDict, Dict, List, Optional, Any
+import asyncio
+import time
+from typing import TypedDict, Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from langgraph.graph import StateGraph, END
 import json
@@ -16,10 +18,28 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from utils.db import get_snowflake_connection, get_snowpark_session
+from utils.db import get_snowflake_connection, get_snowpark_session, get_conn
 from utils.agent import MealPlanAgentWithExtraction
 from utils.feedback_agent import FeedbackAgent
 
+# Users are independent and their LLM calls are I/O-bound, so several are
+# processed at once; this caps concurrent LLM/Snowflake load
+MAX_PARALLEL_USERS = 5
+
+# Persist-only retries wait RETRY_BACKOFF_BASE ** attempt seconds (2s, 4s, 8s)
+RETRY_BACKOFF_BASE = 2
+
+_last_iso = (None, "")
+
+
+def _now_iso() -> str:
+    """Current time as ISO text, reused within the same second (for error timestamps)"""
+    global _last_iso
+    second = int(time.time())
+    if _last_iso[0] != second:
+        _last_iso = (second, datetime.now().isoformat(timespec='seconds'))
+    return _last_iso[1]
+
 
 # ==================== HELPER FUNCTION ====================
 def fix_day_names_with_start_date(meal_plan_data: Dict[str, Any], start_date) -> Dict[str, Any]:
@@ -58,43 +78,65 @@ class MealPlanGenerationState(TypedDict):
     failure_count: int
     errors: List[Dict]
     retry_count: int
+    retry_phase: Optional[str]  # 'generate' or 'persist' - which step a retry restarts from
+    completed_persists: List[Tuple]  # (user_id, schedule_id, next_plan_date) awaiting the schedule update
 
 
 # ==================== MULTI-AGENT WORKFLOW ====================
 class MealPlanWorkflow:
     """LangGraph-based multi-agent workflow for meal plan generation"""
     
-    def __init__(self):
+    def __init__(self, max_parallel: int = MAX_PARALLEL_USERS):
         self.conn = get_snowflake_connection()
         self.session = get_snowpark_session()
+        # Reused by the sequential steps (fetch + bulk load); concurrent per-user
+        # steps borrow their own pooled connection instead
+        self.cursor = self.conn.cursor()
+        # Built once per workflow (it sets up its own LLM client) and reused for every run
+        self.feedback_agent = FeedbackAgent(self.conn, self.session)
         self.max_retries = 3
+        # Refreshed at the start of each run(); every user in a batch shares it
+        self._today = datetime.now().date()
+        self.max_parallel = max_parallel
+        # Filled by agent_bulk_load, keyed by user_id
+        self._profiles: Dict[str, Dict] = {}
+        self._inventory: Dict[str, Dict[str, List]] = {}
+        self._inventory_lists: Dict[str, List[Dict]] = {}
+        self._previous_meals: Dict[str, List[str]] = {}
+        self._preferences: Dict[str, Dict] = {}
+    
+    def close(self):
+        """Close the shared cursor"""
+        self.cursor.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     # ==================== AGENT 1: USER FETCHER ====================
     def agent_fetch_users(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
         """Fetch all users needing meal plans today"""
         print(f"[AGENT 1] Fetching users needing plans for {state['current_date']}")
         
-        cursor = self.conn.cursor()
+        cursor = self.cursor
         try:
             # Removed username from query as it's not in planning_schedule
+            # One row per user (their earliest due schedule) even if several are due
             cursor.execute("""
-                SELECT DISTINCT user_id, next_plan_date, schedule_id
+                SELECT user_id, next_plan_date, schedule_id
                 FROM planning_schedule
                 WHERE next_plan_date <= %s
                 AND status = 'ACTIVE'
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY next_plan_date, schedule_id) = 1
                 ORDER BY user_id
             """, (state['current_date'],))
             
-            users = []
-            seen_users = set()
-            for row in cursor.fetchall():
-                if row[0] not in seen_users:
-                    users.append({
-                        'user_id': row[0],
-                        'next_plan_date': row[1],
-                        'schedule_id': row[2]
-                    })
-                    seen_users.add(row[0])
+            users = [
+                {'user_id': row[0], 'next_plan_date': row[1], 'schedule_id': row[2]}
+                for row in cursor.fetchall()
+            ]
             
             state['users_to_process'] = users
             state['current_user_index'] = 0
@@ -107,112 +149,140 @@ class MealPlanWorkflow:
             state['errors'].append({
                 'agent': 'fetch_users',
                 'error': str(e),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': _now_iso()
             })
             return state
-        finally:
-            cursor.close()
     
-    # ==================== AGENT 2: DATA AGGREGATOR ====================
-    def agent_aggregate_user_data(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
-        """Gather all user data: profile, preferences, feedback, inventory"""
-        if not state['users_to_process'] or state['current_user_index'] >= len(state['users_to_process']):
+    # ==================== AGENT 1.5: BULK LOADER ====================
+    def agent_bulk_load(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+        """Load profiles, inventory, recent meals and preferences for every user at once"""
+        user_ids = [user['user_id'] for user in state['users_to_process']]
+        if not user_ids:
             return state
         
-        user = state['users_to_process'][state['current_user_index']]
-        user_id = user['user_id']
+        print(f"[AGENT 1.5] Bulk loading data for {len(user_ids)} users")
         
-        print(f"[AGENT 2] Aggregating data for user {user_id}")
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        params = tuple(user_ids)
         
-        cursor = self.conn.cursor()
+        cursor = self.cursor
         try:
-            # Get user profile
-            cursor.execute("""
-                SELECT username, age, gender, height_cm, weight_kg, 
+            # User profiles
+            cursor.execute(f"""
+                SELECT user_id, username, age, gender, height_cm, weight_kg, 
                        health_goal, dietary_restrictions, food_allergies,
                        daily_calories, daily_protein, daily_carbohydrate, daily_fat, daily_fiber,
                        preferred_cuisines, bmi, activity_level
                 FROM users
-                WHERE user_id = %s
-            """, (user_id,))
-            
-            profile_row = cursor.fetchone()
-            if not profile_row:
-                raise Exception(f"User {user_id} not found")
-            
-            profile = {
-                'username': profile_row[0],
-                'age': profile_row[1],
-                'gender': profile_row[2],
-                'height_cm': profile_row[3],
-                'weight_kg': profile_row[4],
-                'health_goal': profile_row[5],
-                'dietary_restrictions': profile_row[6],
-                'food_allergies': profile_row[7],
-                'daily_calories': profile_row[8],
-                'daily_protein': profile_row[9],
-                'daily_carbohydrate': profile_row[10],
-                'daily_fat': profile_row[11],
-                'daily_fiber': profile_row[12],
-                'preferred_cuisines': profile_row[13],
-                'bmi': profile_row[14],
-                'activity_level': profile_row[15],
-                'user_id': user_id
+                WHERE user_id IN ({placeholders})
+            """, params)
+            
+            self._profiles = {
+                row[0]: {
+                    'username': row[1],
+                    'age': row[2],
+                    'gender': row[3],
+                    'height_cm': row[4],
+                    'weight_kg': row[5],
+                    'health_goal': row[6],
+                    'dietary_restrictions': row[7],
+                    'food_allergies': row[8],
+                    'daily_calories': row[9],
+                    'daily_protein': row[10],
+                    'daily_carbohydrate': row[11],
+                    'daily_fat': row[12],
+                    'daily_fiber': row[13],
+                    'preferred_cuisines': row[14],
+                    'bmi': row[15],
+                    'activity_level': row[16],
+                    'user_id': row[0]
+                }
+                for row in cursor.fetchall()
             }
             
-            # Get inventory
-            cursor.execute("""
-                SELECT item_name, quantity, unit, category
+            # Inventory, grouped by category for the prompt and flat for the DataFrame
+            cursor.execute(f"""
+                SELECT user_id, item_name, quantity, unit, category
                 FROM inventory
-                WHERE user_id = %s AND quantity > 0
-            """, (user_id,))
-            
-            inventory_by_category = {}
-            inventory_list = []
-            for row in cursor.fetchall():
-                category = row[3] or 'Other'
-                if category not in inventory_by_category:
-                    inventory_by_category[category] = []
-                
-                item_data = {
-                    'item': row[0],
-                    'quantity': row[1],
-                    'unit': row[2]
-                }
-                inventory_by_category[category].append(item_data)
-                
-                # Also store flat list for DataFrame
-                inventory_list.append({
-                    'item_name': row[0],
-                    'quantity': row[1],
-                    'unit': row[2],
+                WHERE user_id IN ({placeholders}) AND quantity > 0
+            """, params)
+            
+            self._inventory = {user_id: {} for user_id in user_ids}
+            self._inventory_lists = {user_id: [] for user_id in user_ids}
+            for user_id, item_name, quantity, unit, category in cursor.fetchall():
+                category = category or 'Other'
+                self._inventory[user_id].setdefault(category, []).append({
+                    'item': item_name,
+                    'quantity': quantity,
+                    'unit': unit
+                })
+                self._inventory_lists[user_id].append({
+                    'item_name': item_name,
+                    'quantity': quantity,
+                    'unit': unit,
                     'category': category
                 })
             
-            # Get previous week's meals for variety
-            cursor.execute("""
-                SELECT md.meal_type, md.meal_name
+            # Previous week's meals for variety (latest 28 per user)
+            cursor.execute(f"""
+                SELECT mp.user_id AS user_id, md.meal_type AS meal_type, md.meal_name AS meal_name
                 FROM meal_details md
                 JOIN daily_meals dm ON md.meal_id = dm.meal_id
                 JOIN meal_plans mp ON dm.plan_id = mp.plan_id
-                WHERE mp.user_id = %s
+                WHERE mp.user_id IN ({placeholders})
                 AND mp.status = 'ACTIVE'
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY mp.user_id ORDER BY mp.created_at DESC) <= 28
                 ORDER BY mp.created_at DESC
-                LIMIT 28
-            """, (user_id,))
-            
-            previous_meals = []
-            for row in cursor.fetchall():
-                previous_meals.append(f"{row[0].title()}: {row[1]}")
+            """, params)
+            
+            # Read column-wise from Arrow instead of building a Python tuple per row
+            self._previous_meals = {user_id: [] for user_id in user_ids}
+            table = cursor.fetch_arrow_all()
+            if table is not None:
+                for user_id, meal_type, meal_name in zip(
+                    table.column('USER_ID').to_pylist(),
+                    table.column('MEAL_TYPE').to_pylist(),
+                    table.column('MEAL_NAME').to_pylist(),
+                ):
+                    self._previous_meals[user_id].append(f"{meal_type.title()}: {meal_name}")
+            
+            # User preferences (learned from feedback)
+            self._preferences = self.feedback_agent.get_user_preferences_bulk(user_ids)
+            
+            print(f"[AGENT 1.5] Loaded {len(self._profiles)} profiles")
+            return state
             
-            # Get user preferences (learned from feedback)
-            feedback_agent = FeedbackAgent(self.conn, self.session)
-            preferences = feedback_agent.get_user_preferences(user_id)
+        except Exception as e:
+            # Users without loaded data fail individually in agent_aggregate_user_data
+            print(f"[AGENT 1.5] Error bulk loading user data: {e}")
+            state['errors'].append({
+                'agent': 'bulk_load',
+                'error': str(e),
+                'timestamp': _now_iso()
+            })
+            return state
+    
+    # ==================== AGENT 2: DATA AGGREGATOR ====================
+    def agent_aggregate_user_data(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+        """Gather all user data: profile, preferences, feedback, inventory"""
+        if not state['users_to_process'] or state['current_user_index'] >= len(state['users_to_process']):
+            return state
+        
+        user = state['users_to_process'][state['current_user_index']]
+        user_id = user['user_id']
+        
+        print(f"[AGENT 2] Aggregating data for user {user_id}")
+        
+        try:
+            # Everything was loaded up front by agent_bulk_load
+            profile = self._profiles.get(user_id)
+            if not profile:
+                raise Exception(f"User {user_id} not found")
             
-            # Format preferences for prompt
-            likes = [p['name'] for p in preferences.get('likes', [])[:5]]
-            dislikes = [p['name'] for p in preferences.get('dislikes', [])[:5]]
-            cuisines = [p['name'] for p in preferences.get('cuisines', [])[:3]]
+            inventory_by_category = self._inventory.get(user_id, {})
+            inventory_list = self._inventory_lists.get(user_id, [])
+            previous_meals = self._previous_meals.get(user_id, [])
+            preferences = self._preferences.get(user_id, {})
             
             # Compile all data
             state['current_user'] = user
@@ -238,7 +308,7 @@ class MealPlanWorkflow:
                 'agent': 'aggregate_data',
                 'user_id': user_id,
                 'error': str(e),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': _now_iso()
             })
             return state
 
@@ -272,7 +342,7 @@ class MealPlanWorkflow:
                 # Get strict start date from schedule
                 start_date_obj = state.get('current_user', {}).get('next_plan_date')
                 if not start_date_obj:
-                    start_date_obj = datetime.now().date()
+                    start_date_obj = self._today
                 
                 prompt_1 = generate_comprehensive_meal_plan_prompt(profile, inventory_df, start_day=1, num_days=4, start_date_obj=start_date_obj)
                 response_1 = agent.agent.invoke({"input": prompt_1})
@@ -426,7 +496,7 @@ class MealPlanWorkflow:
                 'agent': 'generate_plan',
                 'user_id': user_id,
                 'error': str(e),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': _now_iso()
             })
             # Fallback to mock on error
             try:
@@ -496,6 +566,7 @@ class MealPlanWorkflow:
             return state
 
         if not state['generated_plan'] or not state['user_data']:
+            state['retry_phase'] = 'generate'
             state['retry_count'] += 1
             if state['retry_count'] <= self.max_retries:
                 print(f"[AGENT 4] Retry {state['retry_count']}/{self.max_retries}")
@@ -510,7 +581,15 @@ class MealPlanWorkflow:
         
         print(f"[AGENT 4] Persisting plan for {user_id}")
         
-        cursor = self.conn.cursor()
+        # Users persist concurrently, so each borrows its own connection and
+        # commits/rolls back independently
+        with get_conn() as conn:
+            self._persist_user_plan(conn, state, user_id, plan)
+        
+        return state
+    
+    def _persist_user_plan(self, conn, state: MealPlanGenerationState, user_id: str, plan: Dict):
+        """Save one user's plan on the given connection and queue their schedule update"""
         try:
             # Save meal plan (using existing helpers)
             from utils.helpers import save_meal_plan
@@ -519,41 +598,31 @@ class MealPlanWorkflow:
             schedule_id = state['current_user'].get('schedule_id')
             next_plan_date = state['current_user'].get('next_plan_date')
             
-            save_meal_plan(
-                conn=self.conn,
+            plan_id = save_meal_plan(
+                conn=conn,
                 user_id=user_id,
                 schedule_id=schedule_id,
                 meal_plan_data=plan,
                 start_date=next_plan_date
             )
+            # save_meal_plan rolls back and returns None rather than raising
+            if not plan_id:
+                raise RuntimeError("save_meal_plan did not save the plan")
             
-            # Update planning_schedule
-            next_date = datetime.now().date() + timedelta(days=7)
-            
-            # Deactivate OTHER schedules to ensure no duplicates
-            cursor.execute("""
-                UPDATE planning_schedule 
-                SET status = 'INACTIVE' 
-                WHERE user_id = %s AND schedule_id != %s
-            """, (user_id, schedule_id))
-            
-            # Update current schedule
-            cursor.execute("""
-                UPDATE planning_schedule
-                SET next_plan_date = %s
-                WHERE schedule_id = %s
-            """, (next_date, schedule_id))
-            
-            self.conn.commit()
+            # planning_schedule is updated for all users at once by agent_run_batch
+            next_date = self._today + timedelta(days=7)
+            state['completed_persists'].append((user_id, schedule_id, next_date))
             
             state['success_count'] += 1
             state['retry_count'] = 0
+            state['retry_phase'] = None
             print(f"[AGENT 4] Successfully saved plan for {user_id}")
             
         except Exception as e:
             print(f"[AGENT 4] Error saving plan for {user_id}: {e}")
-            self.conn.rollback()
             
+            # The plan itself is fine - only the write needs repeating
+            state['retry_phase'] = 'persist'
             state['retry_count'] += 1
             if state['retry_count'] > self.max_retries:
                 state['failure_count'] += 1
@@ -562,13 +631,9 @@ class MealPlanWorkflow:
                     'user_id': user_id,
                     'error': str(e),
                     'retries': self.max_retries,
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': _now_iso()
                 })
                 state['retry_count'] = 0
-        finally:
-            cursor.close()
-        
-        return state
     
     # ==================== ROUTING LOGIC ====================
     def check_users_available(self, state: MealPlanGenerationState) -> str:
@@ -578,22 +643,113 @@ class MealPlanWorkflow:
         return 'end'
 
     def route_next_step(self, state: MealPlanGenerationState) -> str:
-        """Decide next step: retry, next user, or end"""
-        # Check for retry
-        if state['retry_count'] > 0 and state['retry_count'] <= self.max_retries:
-            return 'retry'
+        """Decide the current user's next step: retry persist only, retry generation, or done"""
+        if not 0 < state['retry_count'] <= self.max_retries:
+            return 'complete'
+        if state.get('retry_phase') == 'persist':
+            return 'retry_persist'
+        return 'retry'
+    
+    # ==================== PER-USER PIPELINE ====================
+    def _user_state(self, state: MealPlanGenerationState, user: Dict) -> MealPlanGenerationState:
+        """Fresh state for one user so concurrent runs don't share counters or errors"""
+        return MealPlanGenerationState(
+            current_date=state['current_date'],
+            users_to_process=[user],
+            current_user_index=0,
+            current_user=None,
+            user_data=None,
+            generated_plan=None,
+            success_count=0,
+            failure_count=0,
+            errors=[],
+            retry_count=0,
+            retry_phase=None,
+            completed_persists=[]
+        )
+    
+    def _run_user_pipeline(self, user_state: MealPlanGenerationState) -> MealPlanGenerationState:
+        """aggregate -> generate -> consolidate -> persist for one user, with retries"""
+        next_step = 'retry'  # first pass runs the whole pipeline
+        while next_step != 'complete':
+            if next_step == 'retry_persist':
+                # Transient write failure - back off, then save the same plan again
+                time.sleep(RETRY_BACKOFF_BASE ** user_state['retry_count'])
+            else:
+                user_state = self.agent_aggregate_user_data(user_state)
+                user_state = self.agent_generate_meal_plan(user_state)
+                user_state = self.agent_consolidate_shopping_list(user_state)
+            user_state = self.agent_persist_plan(user_state)
+            next_step = self.route_next_step(user_state)
+        return user_state
+    
+    async def _process_user(self, user: Dict, state: MealPlanGenerationState,
+                            semaphore: asyncio.Semaphore) -> MealPlanGenerationState:
+        """Run one user's pipeline in a worker thread (the agents and connector are sync)"""
+        async with semaphore:
+            return await asyncio.to_thread(self._run_user_pipeline, self._user_state(state, user))
+    
+    async def _process_users(self, state: MealPlanGenerationState) -> List[MealPlanGenerationState]:
+        """Fan users out, at most max_parallel at a time"""
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        return await asyncio.gather(*[
+            self._process_user(user, state, semaphore)
+            for user in state['users_to_process']
+        ])
+    
+    # ==================== AGENT 5: BATCH RUNNER ====================
+    def agent_run_batch(self, state: MealPlanGenerationState) -> MealPlanGenerationState:
+        """Process every fetched user and fold their results into the run state"""
+        users = state['users_to_process']
+        print(f"[AGENT 5] Processing {len(users)} users, up to {self.max_parallel} at a time")
         
-        # Move to next user
-        state['current_user_index'] += 1
-        state['retry_count'] = 0 # Reset retry count for next user
-        state['current_user'] = None # Clear current user
-        state['user_data'] = None # Clear user data
-        state['generated_plan'] = None # Clear plan
+        if len(users) == 1:
+            # Nothing to overlap - stay on the calling thread (keeps Streamlit output working)
+            results = [self._run_user_pipeline(self._user_state(state, users[0]))]
+        else:
+            results = asyncio.run(self._process_users(state))
         
-        if state['current_user_index'] < len(state['users_to_process']):
-            return 'next_user'
+        for result in results:
+            state['success_count'] += result['success_count']
+            state['failure_count'] += result['failure_count']
+            state['errors'].extend(result['errors'])
+            state['completed_persists'].extend(result['completed_persists'])
         
-        return 'complete'
+        self._advance_schedules(state)
+        return state
+    
+    def _advance_schedules(self, state: MealPlanGenerationState):
+        """Move every saved user's schedule forward and deactivate their other schedules, in one commit"""
+        completed = state['completed_persists']
+        if not completed:
+            return
+        
+        values = ", ".join(["(%s, %s, %s)"] * len(completed))
+        params = [value for row in completed for value in row]
+        try:
+            # Per user: the schedule that was planned gets its next date, any
+            # other schedule is deactivated to ensure no duplicates
+            self.cursor.execute(f"""
+                UPDATE planning_schedule ps
+                SET status = IFF(ps.schedule_id = done.schedule_id, ps.status, 'INACTIVE'),
+                    next_plan_date = IFF(ps.schedule_id = done.schedule_id, done.next_date, ps.next_plan_date)
+                FROM (
+                    SELECT column1 AS user_id, column2 AS schedule_id, column3::DATE AS next_date
+                    FROM VALUES {values}
+                ) done
+                WHERE ps.user_id = done.user_id
+            """, params)
+            self.conn.commit()
+            print(f"[AGENT 5] Advanced schedules for {len(completed)} users")
+        except Exception as e:
+            print(f"[AGENT 5] Error updating planning schedules: {e}")
+            self.conn.rollback()
+            state['errors'].append({
+                'agent': 'update_schedules',
+                'user_ids': [row[0] for row in completed],
+                'error': str(e),
+                'timestamp': _now_iso()
+            })
     
     # ==================== BUILD WORKFLOW ====================
     def build_workflow(self):
@@ -602,10 +758,8 @@ class MealPlanWorkflow:
         
         # Add nodes
         workflow.add_node("fetch_users", self.agent_fetch_users)
-        workflow.add_node("aggregate_data", self.agent_aggregate_user_data)
-        workflow.add_node("generate_plan", self.agent_generate_meal_plan)
-        workflow.add_node("consolidate_list", self.agent_consolidate_shopping_list)
-        workflow.add_node("persist_plan", self.agent_persist_plan)
+        workflow.add_node("bulk_load", self.agent_bulk_load)
+        workflow.add_node("run_batch", self.agent_run_batch)
         
         # Define edges
         workflow.set_entry_point("fetch_users")
@@ -615,33 +769,22 @@ class MealPlanWorkflow:
             "fetch_users",
             self.check_users_available,
             {
-                "process": "aggregate_data",
+                "process": "bulk_load",
                 "end": END
             }
         )
         
-        workflow.add_edge("aggregate_data", "generate_plan")
-        workflow.add_edge("generate_plan", "consolidate_list")
-        workflow.add_edge("consolidate_list", "persist_plan")
-        
-        # Conditional routing from persist
-        workflow.add_conditional_edges(
-            "persist_plan",
-            self.route_next_step,
-            {
-                "retry": "aggregate_data",  # Retry for same user
-                "next_user": "aggregate_data",  # Process next user
-                "complete": END
-            }
-        )
+        workflow.add_edge("bulk_load", "run_batch")
+        workflow.add_edge("run_batch", END)
         
         return workflow.compile()
     
     # ==================== RUN METHOD ====================
     def run(self, target_date: str = None):
         """Execute the workflow"""
+        self._today = datetime.now().date()
         if not target_date:
-            target_date = datetime.now().date().isoformat()
+            target_date = self._today.isoformat()
         
         initial_state = MealPlanGenerationState(
             current_date=target_date,
@@ -653,7 +796,9 @@ class MealPlanWorkflow:
             success_count=0,
             failure_count=0,
             errors=[],
-            retry_count=0
+            retry_count=0,
+            retry_phase=None,
+            completed_persists=[]
         )
         
         app = self.build_workflow()
@@ -1,7 +1,6 @@
 import streamlit as st
 import warnings
 from typing import Dict, TypedDict, Annotated, List, Union, Any, Optional, Literal
-from langchain_community.chat_models import ChatSnowflakeCortex
 from langchain.schema import SystemMessage, HumanMessage, AIMessage, BaseMessage
 # Suppress the specific warning from ChatSnowflakeCortex about default parameters
 warnings.filterwarnings("ignore", message=".*is not default parameter.*")
@@ -11,6 +10,7 @@ import os
 import re
 from datetime import datetime
 from utils.mcp_client import MealMindMCPClient
+from utils.agent import get_cortex_chat_model
 
 # ==================== LANGGRAPH STATE ====================
 class ChatRouterState(TypedDict):
@@ -48,10 +48,7 @@ class MealRouterAgent:
         
         # Initialize LLM
         try:
-            self.chat_model = ChatSnowflakeCortex(
-                session=self.session,
-                model="openai-gpt-4.1"
-            )
+            self.chat_model = get_cortex_chat_model(self.session, "openai-gpt-4.1")
             
             # Initialize MCP Client for Context Retrieval
             try:
@@ -741,7 +738,7 @@ INSTRUCTIONS:
         if state.get('adjustment_result'):
             res = state['adjustment_result']
             response_text += f"{res['message']}\n\n"
-            if 'new_daily_total' in res:
+            if res.get('new_daily_total'):
                 totals = res['new_daily_total']
                 response_text += "**New Daily Total:**\n"
                 response_text += f"- Calories: {totals['calories']} kcal\n"
@@ -21,7 +21,7 @@ class MonitoringAgent:
         """
         try:
             # 1. Get User Goals
-            profile = get_user_profile(self.conn, user_id)
+            profile = get_user_profile(user_id)
             if not profile:
                 return []
             
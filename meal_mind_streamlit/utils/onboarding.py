@@ -1,7 +1,7 @@
 import streamlit as st
 from utils.api import get_nutrition_info_from_api, parse_macro_value, calculate_manual, calculate_nutrition_targets, get_bmi_category
 from utils.helpers import add_inventory_item, generate_comprehensive_meal_plan_prompt, save_meal_plan
-from utils.agent import MealPlanAgentWithExtraction, MealPlanState
+from utils.agent import get_meal_plan_agent, MealPlanState
 from utils.db import get_snowpark_session
 import pandas as pd
 import uuid
@@ -468,7 +468,7 @@ def profile_setup_wizard(conn, user_id):
 
                             # 4. Initialize Agent
                             session = get_snowpark_session()
-                            agent = MealPlanAgentWithExtraction(session)
+                            agent = get_meal_plan_agent(session)
                             
                             # 5. Build & Invoke Workflow
                             status.write("🤖 **AI Chef is cooking up your plan... (This is the magic part!)**")
@@ -481,8 +481,7 @@ def profile_setup_wizard(conn, user_id):
                                 error=None
                             )
                             
-                            workflow = agent.build_graph()
-                            final_state = workflow.invoke(initial_state)
+                            final_state = agent.app.invoke(initial_state)
                             
                             meal_plan_data = final_state.get('meal_plan_json')
                             suggestions = final_state.get('suggestions_json')
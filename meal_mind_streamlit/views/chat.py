@@ -177,9 +177,9 @@ def render_chat(conn, user_id):
                 return agent.get_user_preferences(uid)
 
             with ThreadPoolExecutor(max_workers=4) as executor:
-                future_profile = executor.submit(get_user_profile, conn, user_id)
-                future_inventory = executor.submit(get_user_inventory, conn, user_id)
-                future_meal_plan = executor.submit(get_latest_meal_plan, conn, user_id)
+                future_profile = executor.submit(get_user_profile, user_id)
+                future_inventory = executor.submit(get_user_inventory, user_id)
+                future_meal_plan = executor.submit(get_latest_meal_plan, user_id)
                 # Pass the agent instance directly, don't access st.session_state inside thread
                 future_prefs = executor.submit(get_prefs, st.session_state.feedback_agent, user_id)
                 # Fetch detailed meals for the week
@@ -3,6 +3,7 @@ import pandas as pd
 import json
 from datetime import datetime, timedelta
 from utils.api import get_bmi_category
+from utils.db_parallel import parallel_reads
 
 def get_weekly_nutrition_history(conn, user_id, num_weeks=4):
     """Fetch nutrition data for the past N weeks"""
@@ -87,11 +88,27 @@ def get_weekly_averages(conn, user_id):
     finally:
         cursor.close()
 
+def get_plan_count(conn, user_id):
+    """Count distinct active/completed meal plans"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(DISTINCT mp.plan_id) 
+            FROM meal_plans mp
+            WHERE mp.user_id = %s
+            AND mp.status IN ('ACTIVE', 'COMPLETED')
+        """, (user_id,))
+        return cursor.fetchone()[0]
+    except:
+        return 0
+    finally:
+        cursor.close()
+
 def render_dashboard(conn, user_id):
     st.header("📊 Nutrition Dashboard")
 
-    from utils.db import get_dashboard_stats
-    profile = get_dashboard_stats(conn, user_id)
+    from utils.db import get_user_profile
+    profile = get_user_profile(user_id)
 
     if profile:
         st.subheader("Your Nutrition Stats")
@@ -118,24 +135,16 @@ def render_dashboard(conn, user_id):
         st.subheader("📈 Nutrition Analytics")
         
         
-        # Fetch weekly averages
-        weekly_df = get_weekly_averages(conn, user_id)
-        daily_df = get_weekly_nutrition_history(conn, user_id)
-        
-        # Count distinct meal plans to determine if we have enough data for comparison
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT COUNT(DISTINCT mp.plan_id) 
-                FROM meal_plans mp
-                WHERE mp.user_id = %s
-                AND mp.status IN ('ACTIVE', 'COMPLETED')
-            """, (user_id,))
-            plan_count = cursor.fetchone()[0]
-        except:
-            plan_count = 0
-        finally:
-            cursor.close()
+        # Weekly averages, daily history and the plan count (to decide if there's
+        # enough data for comparison) are independent - fetch them concurrently
+        results = parallel_reads({
+            "weekly": (get_weekly_averages, (user_id,)),
+            "daily": (get_weekly_nutrition_history, (user_id,)),
+            "plan_count": (get_plan_count, (user_id,)),
+        })
+        weekly_df = results["weekly"]
+        daily_df = results["daily"]
+        plan_count = results["plan_count"]
         
         if not weekly_df.empty and plan_count >= 2:
             # Charts side by side
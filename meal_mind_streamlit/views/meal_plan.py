@@ -10,10 +10,13 @@ from utils.db import get_snowpark_session
 def render_meal_plan(conn, user_id):
     """Enhanced meal plan viewer"""
     
-    from utils.db import get_meal_plan_overview, get_daily_meals_for_plan, get_weekly_meal_details, get_future_meal_plan, get_meal_plan_history
+    from utils.db import get_meal_plan_bundle, get_meal_plan_overview, get_daily_meals_for_plan, get_weekly_meal_details
+    
+    # Profile, history, future and active plan in one round-trip
+    bundle = get_meal_plan_bundle(user_id)
     
     # Check for future plan
-    future_plan = get_future_meal_plan(conn, user_id)
+    future_plan = bundle['future_plan']
     view_plan_id = None
     
     # Header with Select Week aligned on same row
@@ -23,7 +26,7 @@ def render_meal_plan(conn, user_id):
         st.header("🍽️ My Weekly Meal Plan")
     
     with col_selector:
-        history = get_meal_plan_history(conn, user_id)
+        history = bundle['history']
         if history:
             # Format options for dropdown
             plan_options = {p['plan_id']: f"{p['start_date'].strftime('%b %d')} - {p['end_date'].strftime('%b %d')}" for p in history}
@@ -44,7 +47,9 @@ def render_meal_plan(conn, user_id):
 
     # Future plan viewing disabled
     
-    active_plan = get_meal_plan_overview(conn, user_id, specific_plan_id=view_plan_id)
+    active_plan = bundle['active_plan']
+    if view_plan_id and (not active_plan or active_plan['plan_id'] != view_plan_id):
+        active_plan = get_meal_plan_overview(user_id, specific_plan_id=view_plan_id)
 
     if not active_plan:
         # No plan - offer to generate
@@ -72,13 +77,14 @@ def render_meal_plan(conn, user_id):
     col_spacer, col_refresh = st.columns([4, 1])
     with col_refresh:
         if st.button("🔄 Refresh"):
+            get_meal_plan_bundle.clear()
             get_meal_plan_overview.clear()
             get_daily_meals_for_plan.clear()
             get_weekly_meal_details.clear()
             st.rerun()
 
     # Get daily meals first to calculate dynamic averages
-    daily_meals = get_daily_meals_for_plan(conn, plan_id)
+    daily_meals = get_daily_meals_for_plan(plan_id)
     
     # Calculate dynamic averages from current daily data
     current_stats = {
@@ -103,9 +109,8 @@ def render_meal_plan(conn, user_id):
         for k in current_stats:
             current_stats[k] = current_stats[k] / days_count
 
-    # Get user profile for targets
-    from utils.db import get_user_profile
-    user_profile = get_user_profile(conn, user_id)
+    # User profile for targets (fetched with the bundle)
+    user_profile = bundle['profile']
     
     # Week overview
     st.markdown("### 📊 Week Overview (Avg / Target)")
@@ -122,7 +127,7 @@ def render_meal_plan(conn, user_id):
         day_tabs = st.tabs([f"{m['day_name'][:3]} {m['meal_date'].strftime('%d')}" for m in daily_meals])
         
         # Get all meal details once
-        all_weekly_details = get_weekly_meal_details(conn, plan_id)
+        all_weekly_details = get_weekly_meal_details(plan_id)
 
         for i, tab in enumerate(day_tabs):
             with tab:
@@ -12,7 +12,7 @@ def render_shopping_list(conn, user_id):
     selected_plan_id = None
     
     with col_hist2:
-        history = get_meal_plan_history(conn, user_id)
+        history = get_meal_plan_history(user_id)
         if history:
             # Format options for dropdown
             plan_options = {p['plan_id']: f"{p['start_date'].strftime('%b %d')} - {p['end_date'].strftime('%b %d')}" for p in history}
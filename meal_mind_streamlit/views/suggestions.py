@@ -2,7 +2,7 @@ import streamlit as st
 import json
 from utils.db import get_snowpark_session
 from utils.helpers import add_inventory_item, update_plan_suggestions
-from utils.agent import MealPlanAgentWithExtraction
+from utils.agent import get_meal_plan_agent
 
 def render_suggestions(conn, user_id):
     """View suggestions for next week"""
@@ -52,8 +52,8 @@ def render_suggestions(conn, user_id):
                 
                 # Call agent
                 session = get_snowpark_session()
-                agent = MealPlanAgentWithExtraction(session)
-                new_suggestions = agent.generate_standalone_suggestions(user_profile, plan_summary)
+                agent = get_meal_plan_agent(session)
+                new_suggestions = agent.generate_standalone_suggestions(user_profile, plan_summary, use_cache=False)
                 
                 if new_suggestions:
                     if update_plan_suggestions(conn, plan_id, new_suggestions):